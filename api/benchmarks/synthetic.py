@@ -0,0 +1,100 @@
+"""
+Deterministic generator of synthetic OpenFoodFacts documents for benchmarks.
+
+The documents exercise the expensive paths of the normalizers: multipack and
+mg quantities, noisy brand spellings (company suffixes, typos, casing, several
+brands in one field), long category tag lists and multilingual names.
+"""
+import gzip
+import json
+import random
+from typing import Iterator, List
+
+
+BASE_BRANDS = [
+    "Barilla", "Mulino Bianco", "Ferrero", "Lavazza", "Granarolo", "Parmalat",
+    "Galbani", "De Cecco", "Rummo", "Voiello", "Garofalo", "Esselunga", "Coop",
+    "Conad", "Divella", "Mutti", "Cirio", "Star", "Findus", "Balocco", "Loacker",
+    "Valsoia", "Zuegg", "Saclà", "Rio Mare", "Nostromo", "Santal", "Yoga",
+    "San Benedetto", "Levissima", "Peroni", "Menabrea", "Despar", "Carrefour",
+]
+BRAND_SUFFIXES = ["", "", "", " S.p.A.", " spa", " srl", " S.r.l.", " s.p.a"]
+QUANTITIES = [
+    "500 g", "1 kg", "1,5 L", "750 ml", "33 cl", "6 x 33 cl", "4x125g", "2 x 500 g",
+    "250 mg", "500mg", "12 x 1,5 l", "10 pz", "3 pcs", "75cl", "0,5 l", "", "circa 1 kg",
+]
+NAME_WORDS = [
+    "Pasta", "Spaghetti", "Penne", "Biscotti", "Latte", "Yogurt", "Caffè", "Passata",
+    "Tonno", "Acqua", "Birra", "Succo", "Crackers", "Formaggio", "Mozzarella", "Olio",
+]
+NOISE_WORDS = ["", "", "cassa", "confezione", "bottiglia", "bott.", "pezzi"]
+CATEGORY_TAGS = [f"en:category-{i}" for i in range(300)] + [f"it:categoria-{i}" for i in range(100)]
+COUNTRIES = [["en:italy"], ["en:france"], ["en:germany", "en:italy"], ["en:spain"], ["en:belgium"]]
+
+
+def _ean(rng: random.Random, index: int) -> str:
+    if rng.random() < 0.03:
+        return "12x"  # rejected by is_valid_ean
+    return str(8000000000000 + index)
+
+
+def _brand(rng: random.Random) -> str:
+    brand = rng.choice(BASE_BRANDS)
+    if rng.random() < 0.2 and len(brand) > 4:
+        position = rng.randrange(1, len(brand) - 1)
+        brand = brand[:position] + brand[position + 1:]  # typo
+    if rng.random() < 0.2:
+        brand = brand.upper()
+    brand += rng.choice(BRAND_SUFFIXES)
+    if rng.random() < 0.3:
+        brand += ", " + rng.choice(BASE_BRANDS)
+    return brand
+
+
+def synthetic_document(rng: random.Random, index: int, italy_ratio: float = 0.6) -> dict:
+    name = f"{rng.choice(NAME_WORDS)} {rng.choice(NAME_WORDS).lower()} {rng.choice(NOISE_WORDS)} {index}"
+    countries = ["en:italy"] if rng.random() < italy_ratio else rng.choice(COUNTRIES[1:])
+    return {
+        "code": _ean(rng, index),
+        "product_name": name if rng.random() > 0.03 else "",
+        "product_name_it": name if rng.random() < 0.7 else None,
+        "product_name_en": f"Product {index}" if rng.random() < 0.4 else None,
+        "product_name_fr": f"Produit {index}" if rng.random() < 0.2 else None,
+        "generic_name_it": "Prodotto alimentare" if rng.random() < 0.3 else None,
+        "brands": _brand(rng),
+        "quantity": rng.choice(QUANTITIES),
+        "countries_tags": countries,
+        "countries": "Italia" if "en:italy" in countries else "France",
+        "categories_tags": rng.sample(CATEGORY_TAGS, k=rng.randint(3, 15)),
+        "packaging_tags": ["en:plastic", "en:bag"],
+        "labels_tags": ["en:organic"] if rng.random() < 0.2 else [],
+        "allergens_tags": ["en:gluten"] if rng.random() < 0.5 else [],
+        "additives_tags": [],
+        "origins_tags": ["en:italy"],
+        "ingredients_text": "Semola di grano duro, acqua",
+        "ingredients": [{"id": "en:durum-wheat-semolina", "text": "Semola di grano duro"}],
+        "nutriments": {"energy-kcal_100g": rng.randint(10, 600), "fat_100g": rng.random() * 30},
+        "image_front_url": f"//images.example.org/{index}.jpg",
+        "nova_group": rng.choice([1, "2", 3, 4, None, "x"]),
+        "ecoscore_grade": rng.choice(["a", "b", "c", "d", None]),
+        "nutrition_grade": rng.choice(["a", "b", "c", "d", "e"]),
+    }
+
+
+def synthetic_documents(count: int, seed: int = 42, italy_ratio: float = 0.6) -> Iterator[dict]:
+    rng = random.Random(seed)
+    for index in range(count):
+        yield synthetic_document(rng, index, italy_ratio)
+
+
+def synthetic_brands(count: int, seed: int = 42) -> List[str]:
+    rng = random.Random(seed)
+    return [_brand(rng) for _ in range(count)]
+
+
+def write_dump(path: str, count: int, seed: int = 42, italy_ratio: float = 0.6) -> None:
+    """Write `count` documents as a .jsonl.gz dump like the OFF export."""
+    with gzip.open(path, "wt", encoding="utf-8") as file_handle:
+        for doc in synthetic_documents(count, seed, italy_ratio):
+            file_handle.write(json.dumps(doc, ensure_ascii=False))
+            file_handle.write("\n")
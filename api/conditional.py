@@ -0,0 +1,45 @@
+# conditional.py
+
+import hashlib
+
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils.http import http_date, quote_etag
+
+
+# 🔹 GET condizionali (ETag / Last-Modified) per i ViewSet
+#    La vista implementa conditional_validators(request, **kwargs) e restituisce
+#    (token, last_modified) con una query leggera, oppure None per servire la risposta normale.
+#    Con If-None-Match / If-Modified-Since corrispondenti si risponde 304 senza queryset né serializer.
+#    L'ETag include anche percorso con query string, staff/pubblico e formato della risposta.
+class ConditionalGetMixin:
+    def conditional_validators(self, request, **kwargs):
+        return None
+
+    def _etag(self, request, token):
+        user = request.user
+        staff = bool(user and user.is_authenticated and user.is_staff)
+        variant = f'{token}|{int(staff)}|{request.get_full_path()}|{getattr(request, "accepted_media_type", "")}'
+        return quote_etag(hashlib.md5(variant.encode()).hexdigest())
+
+    def _conditional(self, handler, request, *args, **kwargs):
+        validators = self.conditional_validators(request, **kwargs) if request.method in ('GET', 'HEAD') else None
+        if validators is None:
+            return handler(request, *args, **kwargs)
+
+        token, last_modified = validators
+        etag = self._etag(request, token)
+        timestamp = int(last_modified.timestamp()) if last_modified else None
+        not_modified = get_conditional_response(request, etag=etag, last_modified=timestamp)
+        response = not_modified if not_modified is not None else handler(request, *args, **kwargs)
+        if response.status_code in (200, 304):
+            response['ETag'] = etag
+            if timestamp is not None:
+                response['Last-Modified'] = http_date(timestamp)
+            patch_vary_headers(response, ['Authorization'])  # Staff e pubblico hanno ETag diversi
+        return response
+
+    def list(self, request, *args, **kwargs):
+        return self._conditional(super().list, request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self._conditional(super().retrieve, request, *args, **kwargs)
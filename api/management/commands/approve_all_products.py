@@ -1,10 +1,14 @@
 from django.core.management.base import BaseCommand
+from django.utils.timezone import now
 from api.models import Product
+from api.services import versions
 
 class Command(BaseCommand):
     help = "Approva tutti i prodotti in attesa"
 
     def handle(self, *args, **options):
         prodotti_in_attesa = Product.objects.filter(is_approved=False)
-        count = prodotti_in_attesa.update(is_approved=True)
+        ids = list(prodotti_in_attesa.values_list('id', flat=True))
+        count = Product.objects.filter(id__in=ids).update(is_approved=True, last_synced_at=now())  # update() non aggiorna auto_now (ETag)
+        versions.bump(versions.product_names(ids))  # update() non invia post_save: invalida le risposte in cache
         self.stdout.write(self.style.SUCCESS(f"✅ {count} prodotti approvati con successo."))
@@ -0,0 +1,201 @@
+import json
+import os
+import platform
+import random
+import subprocess
+import tempfile
+import time
+import timeit
+from datetime import datetime, timezone
+from io import StringIO
+
+import django
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import setup_databases, teardown_databases
+
+from api.benchmarks.synthetic import synthetic_brands, synthetic_documents, write_dump
+from api.utils import normalizers
+from api.utils.brand_index import BrandIndex
+
+
+def _git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "HEAD"],
+            capture_output=True, text=True, check=True, timeout=5,
+        ).stdout.strip()
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def _measure(func, inputs, min_seconds):
+    """Esegue func su tutti gli input finché non passano almeno min_seconds."""
+    def run():
+        for value in inputs:
+            func(value)
+
+    timer = timeit.Timer(run)
+    rounds = 1
+    while True:
+        seconds = timer.timeit(number=rounds)
+        if seconds >= min_seconds:
+            break
+        rounds *= 2
+    ops = rounds * len(inputs)
+    return {
+        "ops": ops,
+        "seconds": round(seconds, 6),
+        "ops_per_sec": round(ops / seconds, 1),
+        "us_per_op": round(seconds / ops * 1e6, 3),
+    }
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark di normalizzazione e import OFF su dati sintetici; "
+        "scrive i risultati in JSON per confrontare commit diversi."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--output", default="bench_import.json", help="File JSON dei risultati.")
+        parser.add_argument("--compare", default=None, help="JSON di un run precedente da confrontare.")
+        parser.add_argument("--seed", type=int, default=42)
+        parser.add_argument("--samples", type=int, default=2000, help="Input per i micro-benchmark.")
+        parser.add_argument("--brands", type=int, default=5000, help="Brand noti per _find_similar_brand.")
+        parser.add_argument("--min-seconds", type=float, default=0.5, help="Durata minima di ogni micro-benchmark.")
+        parser.add_argument("--products", type=int, default=5000, help="Righe del dump sintetico end-to-end.")
+        parser.add_argument("--workers", type=int, default=1, help="--workers passato a import_off_italy.")
+        parser.add_argument("--skip-e2e", action="store_true", help="Esegue solo i micro-benchmark.")
+
+    def handle(self, *args, **options):
+        results = {
+            "meta": {
+                "commit": _git_commit(),
+                "timestamp": datetime.now(timezone.utc).isoformat(),
+                "python": platform.python_version(),
+                "django": django.get_version(),
+                "platform": platform.platform(),
+                "seed": options["seed"],
+            },
+            "micro": self._micro(options),
+        }
+        if not options["skip_e2e"]:
+            results["end_to_end"] = self._end_to_end(options)
+
+        with open(options["output"], "w", encoding="utf-8") as file_handle:
+            json.dump(results, file_handle, indent=2)
+        self.stdout.write(f"📁 Risultati salvati in {options['output']}")
+
+        if options["compare"]:
+            self._compare(options["compare"], results)
+
+    def _micro(self, options):
+        seed = options["seed"]
+        samples = options["samples"]
+        min_seconds = options["min_seconds"]
+        docs = list(synthetic_documents(samples, seed=seed))
+        rng = random.Random(seed)
+
+        quantities = [doc["quantity"] for doc in docs]
+        raw_brands = [doc["brands"] for doc in docs]
+        brands = [normalizers.canonicalize_brand(brand) for brand in raw_brands]
+        names = [
+            (doc["product_name"] or "Prodotto", brand, *normalizers.parse_quantity_unit(doc["quantity"]))
+            for doc, brand in zip(docs, brands)
+        ]
+        known_brands = [normalizers.canonicalize_brand(b) for b in synthetic_brands(options["brands"], seed + 1)]
+        rng.shuffle(known_brands)
+
+        def fresh_index():
+            # L'indice cresce con i brand nuovi: ogni misura riparte dallo stesso stato
+            normalizers._BRAND_INDEX = BrandIndex(known_brands)
+
+        results = {
+            "parse_quantity_unit": _measure(normalizers.parse_quantity_unit, quantities, min_seconds),
+            "canonicalize_brand": _measure(normalizers.canonicalize_brand, raw_brands, min_seconds),
+            "normalize_name": _measure(lambda args: normalizers.normalize_name(*args), names, min_seconds),
+        }
+
+        # Primo passaggio a freddo (indice senza memo), poi ripetizioni con memo già popolata
+        fresh_index()
+        started = time.perf_counter()
+        for brand in brands:
+            normalizers._find_similar_brand(brand)
+        seconds = time.perf_counter() - started
+        results["_find_similar_brand_cold"] = {
+            "ops": len(brands),
+            "seconds": round(seconds, 6),
+            "ops_per_sec": round(len(brands) / seconds, 1),
+            "us_per_op": round(seconds / len(brands) * 1e6, 3),
+            "known_brands": len(known_brands),
+        }
+        results["_find_similar_brand"] = _measure(normalizers._find_similar_brand, brands, min_seconds)
+        results["_find_similar_brand"]["known_brands"] = len(known_brands)
+
+        fresh_index()
+        results["normalize_off_product"] = _measure(normalizers.normalize_off_product, docs, min_seconds)
+
+        normalizers._BRAND_INDEX = None
+        for name, values in results.items():
+            self.stdout.write(f"⏱️ {name}: {values['ops_per_sec']:,.0f} op/s ({values['us_per_op']} µs/op)")
+        return results
+
+    def _end_to_end(self, options):
+        """
+        Import completo di un dump sintetico su un database di test (SQLite in
+        memoria con la configurazione di default), eseguito due volte: il
+        secondo passaggio misura il percorso dei prodotti invariati.
+        """
+        old_config = setup_databases(verbosity=0, interactive=False)
+        try:
+            if connection.vendor != "sqlite":
+                raise CommandError(
+                    "Il benchmark end-to-end richiede SQLite: rilancia con DATABASE_URL=sqlite:///bench.sqlite3"
+                )
+            normalizers._BRAND_INDEX = None
+            with tempfile.TemporaryDirectory() as tmp_dir:
+                path = os.path.join(tmp_dir, "off-synthetic.jsonl.gz")
+                write_dump(path, options["products"], seed=options["seed"])
+
+                runs = {}
+                for label in ("first_run", "second_run"):
+                    output = StringIO()
+                    started = time.perf_counter()
+                    call_command("import_off_italy", path=path, workers=options["workers"], stdout=output)
+                    seconds = time.perf_counter() - started
+                    runs[label] = {
+                        "seconds": round(seconds, 4),
+                        "lines_per_sec": round(options["products"] / seconds, 1),
+                        "summary": [line for line in output.getvalue().splitlines() if line.startswith(("Prodotti", "Pre-filtro", "Parsing"))],
+                    }
+                    self.stdout.write(f"🏁 {label}: {seconds:.2f} s ({runs[label]['lines_per_sec']:,.0f} righe/s)")
+        finally:
+            normalizers._BRAND_INDEX = None
+            teardown_databases(old_config, verbosity=0)
+
+        return {
+            "database": "sqlite",
+            "lines": options["products"],
+            "workers": options["workers"],
+            **runs,
+        }
+
+    def _compare(self, path, results):
+        with open(path, encoding="utf-8") as file_handle:
+            baseline = json.load(file_handle)
+
+        self.stdout.write(f"\n📊 Confronto con {path} (commit {baseline.get('meta', {}).get('commit')}):")
+        pairs = [
+            (f"micro.{name}", values.get("ops_per_sec"), results["micro"].get(name, {}).get("ops_per_sec"))
+            for name, values in baseline.get("micro", {}).items()
+        ]
+        for label in ("first_run", "second_run"):
+            before = baseline.get("end_to_end", {}).get(label, {}).get("lines_per_sec")
+            after = results.get("end_to_end", {}).get(label, {}).get("lines_per_sec")
+            pairs.append((f"end_to_end.{label}", before, after))
+
+        for name, before, after in pairs:
+            if before and after:
+                self.stdout.write(f"{name}: {before:,.0f} → {after:,.0f} ({(after - before) / before * 100:+.1f}%)")
@@ -1,5 +1,6 @@
 from django.core.management.base import BaseCommand
 from api.models import Category
+from api.services import category_tree
 
 class Command(BaseCommand):
     help = "Cancella tutte le categorie presenti nel database"
@@ -7,4 +8,5 @@ class Command(BaseCommand):
     def handle(self, *args, **kwargs):
         count = Category.objects.count()
         Category.objects.all().delete()
+        category_tree.invalidate()  # 🔹 Nuova versione dell'albero anche per ETag e risposte in cache
         self.stdout.write(self.style.SUCCESS(f"🗑️ Cancellate {count} categorie dal database."))
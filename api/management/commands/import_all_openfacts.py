@@ -1,8 +1,22 @@
-import requests
 import csv
 import time
 from django.core.management.base import BaseCommand
-from api.services.openfacts_importer import import_product_by_ean
+from api.services.openfacts_client import DEFAULT_URL_TEMPLATE, OpenFactsClient
+from api.services.openfacts_lookup_cache import stats as lookup_stats
+from api.services.openfacts_crawler import (
+    DEFAULT_PAGE_SIZE,
+    DEFAULT_RATE,
+    DEFAULT_WORKERS,
+    DATASET,
+    FAILED,
+    IMPORTED,
+    NOT_FOUND,
+    PAGE_ERROR,
+    RETRY,
+    SKIPPED,
+    DomainRateLimiter,
+    OpenFactsCrawler,
+)
 
 DATASETS = [
     "https://world.openfoodfacts.org",
@@ -11,100 +25,143 @@ DATASETS = [
 ]
 
 MAX_RETRIES = 3
-RETRY_DELAY = 2  # secondi
+RETRY_DELAY = 2  # secondi, raddoppiati a ogni tentativo
 
 class Command(BaseCommand):
     help = "Importa tutti i prodotti disponibili con EAN da OpenFoodFacts, BeautyFacts, PetFoodFacts"
 
+    def add_arguments(self, parser):
+        parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS, help="EAN importati in parallelo")
+        parser.add_argument(
+            "--rate",
+            type=float,
+            default=DEFAULT_RATE,
+            help="Richieste al secondo per dominio (0 = nessun limite)",
+        )
+        parser.add_argument("--prefetch-pages", type=int, default=2, help="Pagine di ricerca scaricate in anticipo")
+        parser.add_argument("--page-size", type=int, default=DEFAULT_PAGE_SIZE)
+        parser.add_argument("--max-pages", type=int, default=None, help="Pagine massime per dataset")
+        parser.add_argument(
+            "--base-url",
+            action="append",
+            dest="base_urls",
+            help="Dataset da scorrere al posto dei predefiniti (ripetibile, es. server di test locale)",
+        )
+        parser.add_argument(
+            "--api-url-template",
+            default=DEFAULT_URL_TEMPLATE,
+            help="Template URL delle API prodotto, con {domain} ed {ean}",
+        )
+
     def handle(self, *args, **options):
-        failed_eans = []
-        total_attempted = 0
-        total_success = 0
-        total_skipped = 0
+        self.failed_eans = []
+        self.total_attempted = 0
+        self.total_success = 0
+        self.total_not_found = 0
+        self.total_skipped = 0
+        started = time.monotonic()
+
+        client = OpenFactsClient(
+            url_template=options["api_url_template"],
+            pool_size=max(16, options["workers"] * 4),
+            rate_limiter=DomainRateLimiter(options["rate"]),
+        )
 
         log_file = open("import_log.csv", "w", newline="", encoding="utf-8")
-        csv_writer = csv.writer(log_file)
-        csv_writer.writerow(["ean", "status", "message"])
-
-        for base_url in DATASETS:
-            self.stdout.write(f"\n🔍 Inizio importazione da {base_url}")
-            page = 1
-            while True:
-                url = f"{base_url}/cgi/search.pl?search_simple=1&action=process&json=1&page_size=1000&page={page}"
-                response = requests.get(url)
-                if response.status_code != 200:
-                    error_msg = f"Errore nella richiesta a {url}"
-                    self.stderr.write(error_msg)
-                    csv_writer.writerow(["-", "ERROR", error_msg])
-                    break
-
-                data = response.json()
-                products = data.get("products", [])
-                if not products:
-                    break
-
-                for p in products:
-                    ean = p.get("code")
-                    if not ean or len(ean) < 8:
-                        msg = "EAN mancante o troppo corto"
-                        self.stderr.write(f"⛔ Skippato: {ean} – {msg}")
-                        csv_writer.writerow([ean or "-", "SKIPPED", msg])
-                        total_skipped += 1
-                        continue
-
-                    total_attempted += 1
-                    success = False
-                    for attempt in range(1, MAX_RETRIES + 1):
-                        try:
-                            import_product_by_ean(ean, verbose=False)
-                            self.stdout.write(f"✔️ Importato {ean} (tentativo {attempt})")
-                            csv_writer.writerow([ean, "OK", f"Importato correttamente (tentativo {attempt})"])
-                            total_success += 1
-                            success = True
-                            break
-                        except Exception as e:
-                            msg = f"{type(e).__name__} – {e}"
-                            self.stderr.write(f"❌ Tentativo {attempt} fallito per {ean}: {msg}")
-                            if attempt == MAX_RETRIES:
-                                csv_writer.writerow([ean, "ERROR", msg])
-                                failed_eans.append((ean, msg))
-                            else:
-                                time.sleep(RETRY_DELAY)
-
-                page += 1
-
-        log_file.close()
+        self.csv_writer = csv.writer(log_file)
+        self.csv_writer.writerow(["ean", "status", "message"])
+
+        crawler = OpenFactsCrawler(
+            client,
+            self._on_crawl_event,
+            workers=options["workers"],
+            max_retries=MAX_RETRIES,
+            retry_delay=RETRY_DELAY,
+            page_size=options["page_size"],
+            prefetch_pages=options["prefetch_pages"],
+            max_pages=options["max_pages"],
+        )
+        try:
+            crawler.crawl(options["base_urls"] or DATASETS)
+        finally:
+            log_file.close()
 
         # 🔁 Retry finale per gli EAN falliti nei 3 tentativi
-        retry_success = 0
-        retry_fail = 0
+        self.retry_success = 0
+        self.retry_fail = 0
 
-        if failed_eans:
+        if self.failed_eans:
             self.stdout.write("\n🔁 Retry finale per EAN falliti nei 3 tentativi iniziali")
             retry_file = open("import_retry_final.csv", "w", newline="", encoding="utf-8")
-            retry_writer = csv.writer(retry_file)
-            retry_writer.writerow(["ean", "status", "message"])
+            self.retry_writer = csv.writer(retry_file)
+            self.retry_writer.writerow(["ean", "status", "message"])
 
-            for ean, old_msg in failed_eans:
-                try:
-                    import_product_by_ean(ean, verbose=False)
-                    self.stdout.write(f"✅ Recuperato {ean} nel retry finale")
-                    retry_writer.writerow([ean, "OK", "Importato correttamente nel retry finale"])
-                    retry_success += 1
-                except Exception as e:
-                    msg = f"{type(e).__name__} – {e}"
-                    self.stderr.write(f"❌ Ancora errore su {ean} nel retry finale: {msg}")
-                    retry_writer.writerow([ean, "ERROR", msg])
-                    retry_fail += 1
+            crawler.on_event = self._on_retry_event
+            crawler.max_retries = 1
+            try:
+                crawler.import_eans(ean for ean, old_msg in self.failed_eans)
+            finally:
+                retry_file.close()
 
-            retry_file.close()
+        client.close()
+        elapsed = time.monotonic() - started
 
         # 📊 Riepilogo finale a schermo
         self.stdout.write("\n📊 RIEPILOGO FINALE:")
-        self.stdout.write(f"🔢 Prodotti totali validi processati: {total_attempted}")
-        self.stdout.write(f"✅ Importati correttamente al primo giro: {total_success}")
-        self.stdout.write(f"🔄 Importati nel retry finale: {retry_success}")
-        self.stdout.write(f"❌ Falliti definitivamente: {retry_fail}")
-        self.stdout.write(f"⛔ Skippati (EAN assente o invalido): {total_skipped}")
+        self.stdout.write(f"🔢 Prodotti totali validi processati: {self.total_attempted}")
+        self.stdout.write(f"✅ Importati correttamente al primo giro: {self.total_success}")
+        self.stdout.write(f"🔎 Non trovati su nessun dominio: {self.total_not_found}")
+        self.stdout.write(f"🔄 Importati nel retry finale: {self.retry_success}")
+        self.stdout.write(f"❌ Falliti definitivamente: {self.retry_fail}")
+        self.stdout.write(f"⛔ Skippati (EAN assente o invalido): {self.total_skipped}")
+        self.stdout.write(
+            f"⏱️ Durata: {elapsed:.1f}s ({self.total_attempted / elapsed if elapsed else 0:.1f} EAN/s)"
+        )
+        cache = lookup_stats.snapshot()
+        self.stdout.write(
+            f"🗃️ Cache EAN: {cache['hits']} trovati, {cache['negative_hits']} non trovati, "
+            f"{cache['misses']} richiesti alle API"
+        )
         self.stdout.write("\n📁 Log principale: import_log.csv")
         self.stdout.write("📁 Log retry finale: import_retry_final.csv")
+
+    def _on_crawl_event(self, kind, ean, message, attempt):
+        if kind == DATASET:
+            self.stdout.write(f"\n🔍 Inizio importazione da {message}")
+        elif kind == PAGE_ERROR:
+            self.stderr.write(message)
+            self.csv_writer.writerow(["-", "ERROR", message])
+        elif kind == SKIPPED:
+            self.stderr.write(f"⛔ Skippato: {ean} – {message}")
+            self.csv_writer.writerow([ean or "-", "SKIPPED", message])
+            self.total_skipped += 1
+        elif kind == IMPORTED:
+            self.stdout.write(f"✔️ Importato {ean} (tentativo {attempt})")
+            self.csv_writer.writerow([ean, "OK", f"Importato correttamente (tentativo {attempt})"])
+            self.total_attempted += 1
+            self.total_success += 1
+        elif kind == NOT_FOUND:
+            self.stderr.write(f"🔎 Non trovato {ean} su nessun dominio")
+            self.csv_writer.writerow([ean, "NOT_FOUND", message])
+            self.total_attempted += 1
+            self.total_not_found += 1
+        elif kind in (RETRY, FAILED):
+            self.stderr.write(f"❌ Tentativo {attempt} fallito per {ean}: {message}")
+            if kind == FAILED:
+                self.csv_writer.writerow([ean, "ERROR", message])
+                self.failed_eans.append((ean, message))
+                self.total_attempted += 1
+
+    def _on_retry_event(self, kind, ean, message, attempt):
+        if kind == IMPORTED:
+            self.stdout.write(f"✅ Recuperato {ean} nel retry finale")
+            self.retry_writer.writerow([ean, "OK", "Importato correttamente nel retry finale"])
+            self.retry_success += 1
+        elif kind == NOT_FOUND:
+            self.stderr.write(f"🔎 {ean} non trovato nel retry finale")
+            self.retry_writer.writerow([ean, "NOT_FOUND", message])
+            self.retry_fail += 1
+        elif kind == FAILED:
+            self.stderr.write(f"❌ Ancora errore su {ean} nel retry finale: {message}")
+            self.retry_writer.writerow([ean, "ERROR", message])
+            self.retry_fail += 1
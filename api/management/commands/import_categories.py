@@ -3,6 +3,7 @@ import os
 
 from django.core.management.base import BaseCommand
 from api.models import Category
+from api.services import category_tree
 
 
 class Command(BaseCommand):
@@ -47,4 +48,5 @@ class Command(BaseCommand):
             tag_to_category[entry["tag"]] = category
             self.stdout.write(f"✅ Categoria creata: {category.name} (tag: {category.tag})")
 
+        category_tree.invalidate()  # 🔹 Nuova versione dell'albero anche per ETag e risposte in cache
         self.stdout.write(self.style.SUCCESS("✔ Importazione categorie completata."))
@@ -1,11 +1,126 @@
 import gzip
 import json
-from typing import List
+import os
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+from typing import Iterable, Iterator, List, Optional, Tuple
 
-from django.core.management.base import BaseCommand
+try:
+    import orjson  # decoder JSON più veloce, opzionale
+except ImportError:
+    orjson = None
 
-from api.models import Category, Product
-from api.utils.normalizers import normalize_off_product, safe_list
+import django
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from api.models import ImportCheckpoint
+from api.services.category_resolver import CategoryResolver, sync_imported_categories
+from api.services.product_upsert import DEFAULT_BATCH_SIZE, bulk_upsert_products
+from api.utils.normalizers import match_normalized_brand, normalize_off_product, safe_list
+
+
+# Esito di una riga del dump: (indice nel batch, tipo, riga normalizzata)
+#   "invalid" → JSON non valido, "discard" → italiano ma non normalizzabile,
+#   "row" → prodotto pronto per la scrittura. Le righe non italiane non compaiono.
+LineResult = Tuple[int, str, Optional[dict]]
+
+COUNTERS = ("read", "italy", "created", "updated", "unchanged", "discarded")
+
+
+def is_italian(doc: dict) -> bool:
+    country_tags = doc.get("countries_tags")
+    if isinstance(country_tags, list):
+        lowered = [str(c).lower() for c in country_tags]
+        if "en:italy" in lowered or "it:italia" in lowered:
+            return True
+
+    countries = doc.get("countries")
+    if isinstance(countries, str):
+        countries_lower = countries.lower()
+        if "italia" in countries_lower or "italy" in countries_lower:
+            return True
+
+    return False
+
+
+def may_be_italian(line: bytes) -> bool:
+    """
+    Pre-filtro sui byte grezzi, senza decodificare il JSON.
+
+    Tutti i marcatori accettati da is_italian() ("en:italy", "it:italia",
+    "italia", "italy") contengono "ital" senza distinzione di maiuscole; l'unico
+    carattere non ASCII che in minuscolo diventa una di quelle lettere (U+0130)
+    produce "i" + accento combinante, quindi non forma "ital". Le righe con
+    escape \\uXXXX passano sempre al parsing completo. Rifiuta quindi solo
+    righe che is_italian() rifiuterebbe comunque.
+    """
+    return b"ital" in line.lower() or b"\\u" in line
+
+
+def loads(line: bytes):
+    if orjson is not None:
+        try:
+            return orjson.loads(line)
+        except orjson.JSONDecodeError:
+            pass  # es. NaN/Infinity o interi enormi: li accetta solo il modulo json
+    return json.loads(line)
+
+
+def process_lines(lines: List[bytes], prefilter: bool = True) -> Tuple[int, List[LineResult], dict]:
+    """
+    Pre-filtro, parsing JSON, filtro Italia e normalizzazione di un batch di righe.
+    Non accede al database: viene eseguita anche nei processi worker.
+    Restituisce anche i tempi delle fasi di pre-filtro e parsing.
+    """
+    started = time.perf_counter()
+    if prefilter:
+        candidates = [(index, line) for index, line in enumerate(lines) if may_be_italian(line)]
+    else:
+        candidates = list(enumerate(lines))
+    filtered = time.perf_counter()
+
+    docs = []
+    for index, line in candidates:
+        try:
+            docs.append((index, loads(line)))
+        except ValueError:
+            docs.append((index, None))
+    parsed = time.perf_counter()
+
+    results: List[LineResult] = []
+    for index, doc in docs:
+        if doc is None:
+            results.append((index, "invalid", None))
+            continue
+
+        if not is_italian(doc):
+            continue
+
+        normalized = normalize_off_product(doc, match_brand=False)
+        if not normalized:
+            results.append((index, "discard", None))
+            continue
+
+        results.append((index, "row", normalized))
+
+    timings = {
+        "filter_seconds": filtered - started,
+        "parse_seconds": parsed - filtered,
+        "parsed_lines": len(candidates),
+    }
+    return len(lines), results, timings
+
+
+def read_batches(file_handle: Iterable[bytes], size: int) -> Iterator[List[bytes]]:
+    iterator = iter(file_handle)
+    while True:
+        batch = list(islice(iterator, size))
+        if not batch:
+            return
+        yield batch
 
 
 class Command(BaseCommand):
@@ -27,99 +142,228 @@ class Command(BaseCommand):
             default=None,
             help="Numero massimo di prodotti da importare (solo per test).",
         )
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=1,
+            help="Processi per parsing, filtro e normalizzazione (1 = tutto nel processo principale).",
+        )
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            default=2000,
+            help="Righe del dump inviate a ogni worker per volta.",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=DEFAULT_BATCH_SIZE,
+            help="Prodotti scritti nel database con un singolo upsert.",
+        )
+        parser.add_argument(
+            "--checkpoint-every",
+            type=int,
+            default=5000,
+            help="Prodotti salvati per transazione; ogni transazione registra anche il checkpoint.",
+        )
+        parser.add_argument(
+            "--resume",
+            action="store_true",
+            help="Riprende dall'ultimo checkpoint salvato per questo dump.",
+        )
+        parser.add_argument(
+            "--no-prefilter",
+            action="store_true",
+            help="Esegue il parsing JSON di ogni riga, senza il pre-filtro sui byte.",
+        )
 
     def handle(self, *args, **options):
         path = options["path"]
         limit = options.get("limit")
+        workers = options["workers"]
+        chunk_size = options["chunk_size"]
+        batch_size = options["batch_size"]
+        checkpoint_every = options["checkpoint_every"]
+
+        if workers < 1:
+            raise CommandError("--workers deve essere almeno 1.")
+        if chunk_size < 1:
+            raise CommandError("--chunk-size deve essere almeno 1.")
+        if batch_size < 1:
+            raise CommandError("--batch-size deve essere almeno 1.")
+        if checkpoint_every < 1:
+            raise CommandError("--checkpoint-every deve essere almeno 1.")
+
+        self.source = os.path.abspath(path)
+        stat = os.stat(self.source)
+        self.dump_identity = {"dump_size": stat.st_size, "dump_mtime": stat.st_mtime}
+        self.batch_size = batch_size
+        self.category_resolver = CategoryResolver()
 
-        total_read = 0
-        italy_considered = 0
-        created_count = 0
-        updated_count = 0
-        discarded_count = 0
-
-        with gzip.open(path, "rt", encoding="utf-8") as file_handle:
-            for line in file_handle:
-                total_read += 1
-
-                try:
-                    doc = json.loads(line)
-                except json.JSONDecodeError:
-                    discarded_count += 1
-                    continue
-
-                if not self._is_italian(doc):
-                    continue
-
-                italy_considered += 1
-                normalized = normalize_off_product(doc)
-                if not normalized:
-                    discarded_count += 1
-                    continue
-
-                ean = normalized.pop("ean")
-                product, created = Product.objects.update_or_create(
-                    ean=ean,
-                    defaults=normalized,
-                )
-                self._sync_imported_categories(product, doc.get("categories_tags"))
-
-                if created:
-                    created_count += 1
-                else:
-                    updated_count += 1
-
-                processed = created_count + updated_count
-                if processed % 1000 == 0:
-                    self.stdout.write(
-                        f"Elaborati {processed} prodotti (creati {created_count}, aggiornati {updated_count})."
-                    )
-
-                if limit and processed >= limit:
+        counters = dict.fromkeys(COUNTERS, 0)
+        if options["resume"]:
+            counters = self._load_checkpoint(counters)
+        start_line = counters["read"]
+        pending: List[dict] = []
+        finished = False
+        prefilter = not options["no_prefilter"]
+        timings = {"filter_seconds": 0.0, "parse_seconds": 0.0, "parsed_lines": 0}
+
+        with gzip.open(self.source, "rb") as file_handle:
+            batches = read_batches(islice(file_handle, start_line, None), chunk_size)
+            if workers > 1:
+                results = self._process_parallel(batches, workers, prefilter)
+            else:
+                results = (process_lines(batch, prefilter) for batch in batches)
+
+            limit_reached = False
+            for line_count, entries, batch_timings in results:
+                for key, value in batch_timings.items():
+                    timings[key] += value
+                chunk_start = counters["read"]
+                for index, kind, normalized in entries:
+                    if kind == "invalid":
+                        counters["discarded"] += 1
+                        continue
+
+                    counters["italy"] += 1
+                    if kind == "discard":
+                        counters["discarded"] += 1
+                        continue
+
+                    pending.append(match_normalized_brand(normalized))
+                    counters["read"] = chunk_start + index + 1
+                    if len(pending) >= checkpoint_every:
+                        self._commit(pending, counters)
+                        pending = []
+
+                    processed = counters["created"] + counters["updated"] + counters["unchanged"] + len(pending)
+                    if limit and processed >= limit:
+                        limit_reached = True
+                        break
+
+                if limit_reached:
+                    results.close()
                     break
+                counters["read"] = chunk_start + line_count
+            else:
+                finished = True
+
+        self._commit(pending, counters)
+        if finished:
+            # Dump completato: il prossimo --resume ripartirà da capo
+            ImportCheckpoint.objects.filter(source=self.source).delete()
 
         self.stdout.write("")
-        self.stdout.write(f"Prodotti totali letti: {total_read}")
-        self.stdout.write(f"Prodotti Italia considerati: {italy_considered}")
-        self.stdout.write(f"Prodotti creati: {created_count}")
-        self.stdout.write(f"Prodotti aggiornati: {updated_count}")
-        self.stdout.write(f"Prodotti scartati: {discarded_count}")
-
-    def _is_italian(self, doc: dict) -> bool:
-        country_tags = doc.get("countries_tags")
-        if isinstance(country_tags, list):
-            lowered = [str(c).lower() for c in country_tags]
-            if "en:italy" in lowered or "it:italia" in lowered:
-                return True
-
-        countries = doc.get("countries")
-        if isinstance(countries, str):
-            countries_lower = countries.lower()
-            if "italia" in countries_lower or "italy" in countries_lower:
-                return True
-
-        return False
-
-    def _sync_imported_categories(self, product: Product, categories_raw) -> None:
-        categories: List[Category] = []
-        for tag in safe_list(categories_raw):
-            tag_value = str(tag).strip()
-            if not tag_value:
-                continue
+        self.stdout.write(f"Prodotti totali letti: {counters['read']}")
+        self.stdout.write(f"Prodotti Italia considerati: {counters['italy']}")
+        self.stdout.write(f"Prodotti creati: {counters['created']}")
+        self.stdout.write(f"Prodotti aggiornati: {counters['updated']}")
+        self.stdout.write(f"Prodotti invariati (saltati): {counters['unchanged']}")
+        self.stdout.write(f"Prodotti scartati: {counters['discarded']}")
+        self._report_throughput(counters["read"] - start_line, timings)
 
-            base_name = tag_value.split(":", 1)[-1] if ":" in tag_value else tag_value
-            category, _ = Category.objects.get_or_create(
-                tag=tag_value,
+    def _load_checkpoint(self, counters: dict) -> dict:
+        checkpoint = ImportCheckpoint.objects.filter(source=self.source).first()
+        if checkpoint is None:
+            self.stdout.write("Nessun checkpoint trovato: import dall'inizio.")
+            return counters
+
+        identity = {"dump_size": checkpoint.dump_size, "dump_mtime": checkpoint.dump_mtime}
+        if identity != self.dump_identity:
+            raise CommandError(
+                "Il dump è cambiato dall'ultimo checkpoint (dimensione o data di modifica): "
+                "rilancia senza --resume."
+            )
+
+        counters.update(checkpoint.counters)
+        counters["read"] = checkpoint.line_number
+        self.stdout.write(f"Ripresa dalla riga {checkpoint.line_number}.")
+        return counters
+
+    def _commit(self, rows: List[dict], counters: dict) -> None:
+        """
+        Scrive i prodotti in sospeso e il checkpoint in un'unica transazione:
+        dopo un'interruzione --resume riparte esattamente dopo l'ultima riga salvata.
+        """
+        with transaction.atomic():
+            for start in range(0, len(rows), self.batch_size):
+                created, updated, unchanged = self._flush(rows[start:start + self.batch_size])
+                counters["created"] += created
+                counters["updated"] += updated
+                counters["unchanged"] += unchanged
+
+            ImportCheckpoint.objects.update_or_create(
+                source=self.source,
                 defaults={
-                    "name": base_name,
-                    "translations": None,
-                    "parent": None,
-                    "is_approved": False,
+                    **self.dump_identity,
+                    "line_number": counters["read"],
+                    "counters": counters,
                 },
             )
-            categories.append(category)
 
-        if categories:
-            product.imported_categories.set(categories)
-        else:
-            product.imported_categories.clear()
+        if rows:
+            self.stdout.write(
+                f"Elaborati {counters['created'] + counters['updated'] + counters['unchanged']} prodotti "
+                f"(creati {counters['created']}, aggiornati {counters['updated']}, "
+                f"invariati {counters['unchanged']})."
+            )
+
+    def _report_throughput(self, lines: int, timings: dict) -> None:
+        """Righe/s delle fasi di pre-filtro e parsing (tempo CPU sommato sui worker)."""
+        filter_rate = lines / timings["filter_seconds"] if timings["filter_seconds"] else 0
+        parse_rate = timings["parsed_lines"] / timings["parse_seconds"] if timings["parse_seconds"] else 0
+        self.stdout.write(
+            f"Pre-filtro: {lines} righe, {lines - timings['parsed_lines']} scartate senza parsing "
+            f"({filter_rate:,.0f} righe/s)"
+        )
+        self.stdout.write(
+            f"Parsing JSON ({'orjson' if orjson is not None else 'json'}): "
+            f"{timings['parsed_lines']} righe ({parse_rate:,.0f} righe/s)"
+        )
+
+    def _process_parallel(self, batches: Iterator[List[bytes]], workers: int, prefilter: bool):
+        """
+        Distribuisce i batch a un pool di processi mantenendo l'ordine del dump.
+        Al massimo 2 batch per worker sono in volo, così il file non viene
+        caricato tutto in memoria.
+        """
+        executor = ProcessPoolExecutor(max_workers=workers, initializer=django.setup)
+        pending = deque()
+        try:
+            for batch in batches:
+                pending.append(executor.submit(process_lines, batch, prefilter))
+                if len(pending) >= workers * 2:
+                    yield pending.popleft().result()
+            while pending:
+                yield pending.popleft().result()
+        finally:
+            executor.shutdown(wait=True, cancel_futures=True)
+
+    def _flush(self, rows: List[dict]) -> Tuple[int, int, int]:
+        result = bulk_upsert_products(rows)
+
+        # I prodotti invariati hanno anche le stesse categorie: raw_data fa parte dell'impronta
+        tags_by_ean = {
+            row["ean"]: self._category_tags(row["raw_data"].get("categories_tags"))
+            for row in rows
+            if row["ean"] in result.ids
+        }
+        tag_ids = self.category_resolver.resolve_tags(
+            tag for tags in tags_by_ean.values() for tag in tags
+        )
+        sync_imported_categories(
+            {
+                result.ids[ean]: [tag_ids[tag] for tag in tags]
+                for ean, tags in tags_by_ean.items()
+            }
+        )
+        return result.created, result.updated, result.unchanged
+
+    def _category_tags(self, categories_raw) -> List[str]:
+        tags = []
+        for tag in safe_list(categories_raw):
+            tag_value = str(tag).strip()
+            if tag_value:
+                tags.append(tag_value)
+        return tags
@@ -0,0 +1,17 @@
+import time
+from django.core.management.base import BaseCommand
+from api.services.current_prices import DEFAULT_BATCH_SIZE, rebuild_current_prices
+
+
+class Command(BaseCommand):
+    help = "Ricostruisce da zero la tabella dei prezzi correnti (ultimo prezzo approvato per prodotto, negozio e tipo)"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        written = rebuild_current_prices(batch_size=options["batch_size"])
+        self.stdout.write(
+            self.style.SUCCESS(f"✅ Prezzi correnti ricostruiti: {written} righe in {time.monotonic() - started:.1f}s")
+        )
@@ -0,0 +1,17 @@
+import time
+from django.core.management.base import BaseCommand
+from api.services.product_search import DEFAULT_BATCH_SIZE, rebuild_index
+
+
+class Command(BaseCommand):
+    help = "Ricostruisce da zero l'indice di ricerca dei prodotti"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        written = rebuild_index(batch_size=options["batch_size"])
+        self.stdout.write(
+            self.style.SUCCESS(f"✅ Indice ricostruito: {written} token in {time.monotonic() - started:.1f}s")
+        )
@@ -25,7 +25,10 @@ class Command(BaseCommand):
 
                 try:
                     self.stdout.write(f"🔁 Tentativo nuovo import per {ean}")
-                    import_product_by_ean(ean, verbose=False)
+                    if not import_product_by_ean(ean, verbose=False):
+                        writer.writerow([ean, "NOT_FOUND", "Prodotto non trovato"])
+                        self.stderr.write(f"🔎 {ean} non trovato su nessun dominio")
+                        continue
                     writer.writerow([ean, "OK", "Importazione riuscita al retry"])
                     self.stdout.write(f"✅ Importazione riuscita per {ean}")
                 except Exception as e:
@@ -16,19 +16,20 @@ class Command(BaseCommand):
     ]
 
     def handle(self, *args, **options):
-        prodotti = Product.objects.exclude(raw_data=None)
+        prodotti = Product.objects.exclude(raw_data=None).select_related("raw_data")
         aggiornati = 0
         già_ok = 0
 
         for p in prodotti:
             updated = False
             translations = p.translations or {}
+            raw_data = p.raw_data.document
 
             for lang in self.SUPPORTED_LANGUAGES:
                 lang_data = translations.get(lang, {})
                 for field in self.TRANSLATABLE_FIELDS:
                     key = f"{field}_{lang}"
-                    valore = p.raw_data.get(key)
+                    valore = raw_data.get(key)
                     if valore and not lang_data.get(field):
                         lang_data[field] = valore
                         updated = True
@@ -1,5 +1,6 @@
 from django.core.management.base import BaseCommand
 from api.models import Product, Price, Store, Category, ProductChangeRequest, UserProfile
+from api.services import category_tree
 
 class Command(BaseCommand):
     help = "Cancella tutto il contenuto del database (eccetto gli utenti)"
@@ -12,6 +13,7 @@ class Command(BaseCommand):
         Product.objects.all().delete()
         Store.objects.all().delete()
         Category.objects.all().delete()
+        category_tree.invalidate()  # 🔹 Nuova versione dell'albero anche per ETag e risposte in cache
         UserProfile.objects.all().delete()
 
         self.stdout.write(self.style.SUCCESS("✅ Tutti i dati eliminati (eccetto utenti)."))
@@ -0,0 +1,27 @@
+# Generated by Django 5.1.7 on 2026-10-17 22:35
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0003_importcheckpoint'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OpenFactsLookup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('ean', models.CharField(max_length=32, unique=True)),
+                ('found', models.BooleanField(default=False)),
+                ('source', models.CharField(blank=True, max_length=100, null=True)),
+                ('payload', models.JSONField(blank=True, null=True)),
+                ('hit_count', models.PositiveIntegerField(default=0)),
+                ('fetched_at', models.DateTimeField(auto_now=True)),
+                ('expires_at', models.DateTimeField(db_index=True)),
+                ('last_used_at', models.DateTimeField(db_index=True)),
+            ],
+        ),
+    ]
@@ -0,0 +1,76 @@
+# Generated by Django 5.1.7 on 2026-10-17 22:37
+
+import json
+import zlib
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+CHUNK_SIZE = 500
+
+
+def move_raw_data(apps, schema_editor):
+    Product = apps.get_model("api", "Product")
+    ProductRawData = apps.get_model("api", "ProductRawData")
+
+    last_pk = 0
+    while True:
+        chunk = list(
+            Product.objects.filter(pk__gt=last_pk)
+            .exclude(raw_data=None)
+            .order_by("pk")
+            .values_list("pk", "raw_data")[:CHUNK_SIZE]
+        )
+        if not chunk:
+            break
+        ProductRawData.objects.bulk_create(
+            [
+                ProductRawData(
+                    product_id=pk,
+                    data=zlib.compress(json.dumps(doc, ensure_ascii=False, separators=(",", ":")).encode("utf-8")),
+                )
+                for pk, doc in chunk
+            ]
+        )
+        last_pk = chunk[-1][0]
+
+
+def restore_raw_data(apps, schema_editor):
+    Product = apps.get_model("api", "Product")
+    ProductRawData = apps.get_model("api", "ProductRawData")
+
+    last_pk = 0
+    while True:
+        chunk = list(
+            ProductRawData.objects.filter(pk__gt=last_pk).order_by("pk").values_list("pk", "data")[:CHUNK_SIZE]
+        )
+        if not chunk:
+            break
+        # Product(raw_data=...) urterebbe l'accessor inverso di ProductRawData: si passa da update()
+        for pk, data in chunk:
+            Product.objects.filter(pk=pk).update(raw_data=json.loads(zlib.decompress(bytes(data))))
+        last_pk = chunk[-1][0]
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0004_openfactslookup'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProductRawData',
+            fields=[
+                ('product', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='raw_data', serialize=False, to='api.product')),
+                ('data', models.BinaryField()),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.RunPython(move_raw_data, restore_raw_data),
+        migrations.RemoveField(
+            model_name='product',
+            name='raw_data',
+        ),
+    ]
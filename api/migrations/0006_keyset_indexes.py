@@ -0,0 +1,27 @@
+# Generated by Django 5.1.7 on 2026-10-17 22:41
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0005_productrawdata'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='price',
+            index=models.Index(fields=['date_inserted', 'id'], name='price_date_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='productviewlog',
+            index=models.Index(fields=['timestamp', 'id'], name='viewlog_ts_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='productviewlog',
+            index=models.Index(fields=['user', 'timestamp', 'id'], name='viewlog_user_ts_id_idx'),
+        ),
+    ]
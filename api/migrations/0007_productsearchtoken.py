@@ -0,0 +1,57 @@
+# Generated by Django 5.1.7 on 2026-10-17 22:42
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+from api.services.product_search import product_tokens
+
+
+CHUNK_SIZE = 500
+
+
+def populate_search_tokens(apps, schema_editor):
+    """Indicizza i prodotti esistenti, come rebuild_search_index."""
+    Product = apps.get_model("api", "Product")
+    ProductSearchToken = apps.get_model("api", "ProductSearchToken")
+
+    last_pk = 0
+    while True:
+        chunk = list(
+            Product.objects.filter(pk__gt=last_pk)
+            .order_by("pk")
+            .values_list("pk", "ean", "name", "brand", "translations")[:CHUNK_SIZE]
+        )
+        if not chunk:
+            break
+        ProductSearchToken.objects.bulk_create(
+            [
+                ProductSearchToken(product_id=pk, token=token, weight=weight)
+                for pk, ean, name, brand, translations in chunk
+                for token, weight in product_tokens(ean, name, brand, translations).items()
+            ],
+            batch_size=CHUNK_SIZE,
+        )
+        last_pk = chunk[-1][0]
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0006_keyset_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProductSearchToken',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('token', models.CharField(max_length=64)),
+                ('weight', models.FloatField()),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='search_tokens', to='api.product')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('token', 'product'), name='search_token_product_uniq')],
+            },
+        ),
+        migrations.RunPython(populate_search_tokens, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,42 @@
+# Generated by Django 5.1.7 on 2026-10-17 22:44
+
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def populate_brand_stats(apps, schema_editor):
+    Product = apps.get_model("api", "Product")
+    BrandStat = apps.get_model("api", "BrandStat")
+    counts = (
+        Product.objects.exclude(brand=None).exclude(brand="")
+        .values_list("brand").annotate(n=Count("id")).order_by()
+    )
+    BrandStat.objects.bulk_create(
+        [BrandStat(brand=brand, product_count=n) for brand, n in counts],
+        batch_size=500,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0007_productsearchtoken'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BrandStat',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('brand', models.CharField(max_length=20, unique=True)),
+                ('product_count', models.PositiveIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True, db_index=True)),
+            ],
+        ),
+        migrations.AlterField(
+            model_name='product',
+            name='brand',
+            field=models.CharField(blank=True, db_index=True, max_length=20, null=True),
+        ),
+        migrations.RunPython(populate_brand_stats, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,84 @@
+# Generated by Django 5.1.7 on 2026-10-17 22:46
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+BATCH_SIZE = 500
+
+
+def populate_current_prices(apps, schema_editor):
+    """Ultimo Price approvato per (prodotto, negozio, tipo), come rebuild_current_prices."""
+    Price = apps.get_model("api", "Price")
+    CurrentPrice = apps.get_model("api", "CurrentPrice")
+
+    prices = (
+        Price.objects.filter(is_approved=True)
+        .order_by("product_id", "store_id", "price_type", "-date_inserted", "-id")
+        .values_list("id", "product_id", "store_id", "price_type", "price", "currency", "date_inserted")
+    )
+    batch = []
+    previous = None
+    for pk, product_id, store_id, price_type, price, currency, date_inserted in prices.iterator(chunk_size=BATCH_SIZE):
+        key = (product_id, store_id, price_type)
+        if key == previous:
+            continue
+        previous = key
+        batch.append(CurrentPrice(
+            product_id=product_id, store_id=store_id, price_type=price_type, source_id=pk,
+            price=price, currency=currency, date_inserted=date_inserted,
+        ))
+        if len(batch) >= BATCH_SIZE:
+            CurrentPrice.objects.bulk_create(batch)
+            batch = []
+    CurrentPrice.objects.bulk_create(batch)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0008_brandstat'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CurrentPrice',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('price_type', models.CharField(choices=[('full', 'Prezzo pieno'), ('discount', 'Offerta'), ('card', 'Carta fedeltà')], max_length=10)),
+                ('price', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('currency', models.CharField(max_length=10)),
+                ('date_inserted', models.DateField()),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='price',
+            index=models.Index(fields=['product', 'store', 'price_type', 'date_inserted', 'id'], name='price_latest_idx'),
+        ),
+        migrations.AddField(
+            model_name='currentprice',
+            name='product',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='current_prices', to='api.product'),
+        ),
+        migrations.AddField(
+            model_name='currentprice',
+            name='source',
+            field=models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='api.price'),
+        ),
+        migrations.AddField(
+            model_name='currentprice',
+            name='store',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='current_prices', to='api.store'),
+        ),
+        migrations.AddIndex(
+            model_name='currentprice',
+            index=models.Index(fields=['product', 'price'], name='current_price_cheapest_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='currentprice',
+            constraint=models.UniqueConstraint(fields=('product', 'store', 'price_type'), name='current_price_key_uniq'),
+        ),
+        migrations.RunPython(populate_current_prices, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,48 @@
+# Generated by Django 5.1.7 on 2026-10-17 22:47
+
+from django.db import migrations, models
+
+from api.utils.unit_normalization import unit_price
+
+
+CHUNK_SIZE = 500
+
+
+def populate_unit_prices(apps, schema_editor):
+    Price = apps.get_model("api", "Price")
+
+    last_pk = 0
+    while True:
+        chunk = list(
+            Price.objects.filter(pk__gt=last_pk)
+            .select_related("product")
+            .only("id", "price", "product__quantity", "product__unit")
+            .order_by("pk")[:CHUNK_SIZE]
+        )
+        if not chunk:
+            break
+        for price in chunk:
+            price.unit_price, price.base_unit = unit_price(price.price, price.product.quantity, price.product.unit)
+        Price.objects.bulk_update(chunk, ["unit_price", "base_unit"])
+        last_pk = chunk[-1].pk
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0009_currentprice'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='price',
+            name='base_unit',
+            field=models.CharField(blank=True, max_length=3, null=True),
+        ),
+        migrations.AddField(
+            model_name='price',
+            name='unit_price',
+            field=models.DecimalField(blank=True, db_index=True, decimal_places=4, max_digits=16, null=True),
+        ),
+        migrations.RunPython(populate_unit_prices, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 5.1.7 on 2026-10-17 22:50
+
+from django.db import migrations, models
+
+from api.utils.geo import encode
+
+
+def populate_geohash(apps, schema_editor):
+    Store = apps.get_model("api", "Store")
+
+    stores = list(Store.objects.filter(latitude__isnull=False, longitude__isnull=False).only("id", "latitude", "longitude"))
+    for store in stores:
+        store.geohash = encode(float(store.latitude), float(store.longitude))
+    Store.objects.bulk_update(stores, ["geohash"], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0010_price_unit_price'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='store',
+            name='geohash',
+            field=models.CharField(blank=True, db_index=True, editable=False, max_length=12, null=True),
+        ),
+        migrations.RunPython(populate_geohash, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,46 @@
+# Generated by Django 5.1.7 on 2026-10-17 22:59
+
+import datetime
+
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+def backfill_created_at(apps, schema_editor):
+    """Prezzi esistenti: mezzanotte (ora locale) del giorno di inserimento, un UPDATE per data."""
+    Price = apps.get_model("api", "Price")
+
+    for day in Price.objects.values_list("date_inserted", flat=True).distinct().order_by():
+        midnight = django.utils.timezone.make_aware(datetime.datetime.combine(day, datetime.time.min))
+        Price.objects.filter(date_inserted=day).update(created_at=midnight)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0011_store_geohash'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='price',
+            name='created_at',
+            field=models.DateTimeField(auto_now_add=True, default=django.utils.timezone.now),
+            preserve_default=False,
+        ),
+        migrations.RunPython(backfill_created_at, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='price',
+            index=models.Index(fields=['user', 'created_at', 'id'], name='price_user_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['user', 'created_at', 'id'], name='product_user_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='productchangerequest',
+            index=models.Index(fields=['user', 'created_at', 'id'], name='change_user_created_idx'),
+        ),
+    ]
@@ -1,3 +1,6 @@
+import json
+import zlib
+
 from django.db import models
 from django.contrib.auth.models import User
 
@@ -36,7 +39,7 @@ class Product(models.Model):
     translations = models.JSONField(null=True, blank=True)  # 🔹 Testi multilingua strutturati
     ean = models.CharField(max_length=50, unique=True)
     name = models.CharField(max_length=255)
-    brand = models.CharField(max_length=20, null=True, blank=True)
+    brand = models.CharField(max_length=20, null=True, blank=True, db_index=True)
     quantity = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True)
     unit = models.CharField(max_length=10, null=True, blank=True, default='NA')
 
@@ -63,7 +66,7 @@ class Product(models.Model):
     ingredients_text = models.TextField(null=True, blank=True)
     ingredients = models.JSONField(null=True, blank=True)  # 🔹 Strutturati
     nutrients = models.JSONField(null=True, blank=True)    # 🔹 Valori nutrizionali
-    raw_data = models.JSONField(null=True, blank=True)
+    content_hash = models.CharField(max_length=64, null=True, blank=True)  # 🔹 Impronta dell'ultimo import
 
     last_synced_at = models.DateTimeField(auto_now=True)
     created_at = models.DateTimeField(auto_now_add=True)
@@ -71,10 +74,37 @@ class Product(models.Model):
 
     user = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'created_at', 'id'], name='product_user_created_idx'),  # 🔹 Contributi
+        ]
+
     def __str__(self):
         return f"{self.name} ({self.ean})"
 
 
+# 🔹 Documento OpenFacts originale, compresso e fuori dalla riga del prodotto (letto solo su richiesta)
+class ProductRawData(models.Model):
+    product = models.OneToOneField(Product, on_delete=models.CASCADE, primary_key=True, related_name="raw_data")
+    data = models.BinaryField()  # JSON compresso con zlib
+    updated_at = models.DateTimeField(auto_now=True)
+
+    @staticmethod
+    def pack(document) -> bytes:
+        return zlib.compress(json.dumps(document, ensure_ascii=False, separators=(",", ":")).encode("utf-8"))
+
+    @staticmethod
+    def unpack(data) -> dict:
+        return json.loads(zlib.decompress(bytes(data)))
+
+    @property
+    def document(self) -> dict:
+        return self.unpack(self.data)
+
+    def __str__(self):
+        return f"Dati OpenFacts di {self.product_id}"
+
+
 # 🔹 Store (fisico o online)
 class Store(models.Model):
     STORE_TYPE_CHOICES = [
@@ -86,6 +116,8 @@ class Store(models.Model):
     location = models.CharField(max_length=255, blank=True, null=True)
     latitude = models.DecimalField(max_digits=9, decimal_places=6, null=True, blank=True)
     longitude = models.DecimalField(max_digits=9, decimal_places=6, null=True, blank=True)
+    # 🔹 Geohash di latitude/longitude (calcolato al salvataggio) per la ricerca dei negozi vicini
+    geohash = models.CharField(max_length=12, null=True, blank=True, db_index=True, editable=False)
     url = models.URLField(blank=True, null=True)
     verified = models.BooleanField(default=False)
     created_at = models.DateTimeField(auto_now_add=True)
@@ -109,12 +141,49 @@ class Price(models.Model):
     currency = models.CharField(max_length=10, default='EUR')
     price_type = models.CharField(max_length=10, choices=PRICE_TYPE_CHOICES, default='full')
     date_inserted = models.DateField(auto_now_add=True)
+    created_at = models.DateTimeField(auto_now_add=True)  # 🔹 Istante esatto, come created_at degli altri contributi
     is_approved = models.BooleanField(default=False)
 
+    # 🔹 Prezzo per unità base (kg, l, pz), calcolato al salvataggio da quantità e unità del prodotto
+    unit_price = models.DecimalField(max_digits=16, decimal_places=4, null=True, blank=True, db_index=True)
+    base_unit = models.CharField(max_length=3, null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['date_inserted', 'id'], name='price_date_id_idx'),  # 🔹 Paginazione keyset
+            # 🔹 Ultimo prezzo per (prodotto, negozio, tipo): vedi CurrentPrice
+            models.Index(fields=['product', 'store', 'price_type', 'date_inserted', 'id'], name='price_latest_idx'),
+            models.Index(fields=['user', 'created_at', 'id'], name='price_user_created_idx'),  # 🔹 Contributi
+        ]
+
     def __str__(self):
         return f"{self.price} {self.currency} @ {self.store} - {self.product}"
 
 
+# 🔹 Prezzo corrente: l'ultimo Price approvato per (prodotto, negozio, tipo), mantenuto dai signal di Price.
+#    Le scritture massive su Price (update(), bulk_create, bulk_update) non inviano signal: chi le fa deve
+#    chiamare services.current_prices.refresh_current_prices con le chiavi toccate
+class CurrentPrice(models.Model):
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='current_prices')
+    store = models.ForeignKey(Store, on_delete=models.CASCADE, related_name='current_prices')
+    price_type = models.CharField(max_length=10, choices=Price.PRICE_TYPE_CHOICES)
+    source = models.OneToOneField(Price, on_delete=models.CASCADE, related_name='+')
+    price = models.DecimalField(max_digits=10, decimal_places=2)
+    currency = models.CharField(max_length=10)
+    date_inserted = models.DateField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['product', 'store', 'price_type'], name='current_price_key_uniq'),
+        ]
+        indexes = [
+            models.Index(fields=['product', 'price'], name='current_price_cheapest_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.price} {self.currency} @ {self.store_id} - {self.product_id} ({self.price_type})"
+
+
 # 🔹 Modifica proposta a un prodotto
 class ProductChangeRequest(models.Model):
     product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='change_requests')
@@ -128,6 +197,11 @@ class ProductChangeRequest(models.Model):
     is_rejected = models.BooleanField(default=False)
     created_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'created_at', 'id'], name='change_user_created_idx'),  # 🔹 Contributi
+        ]
+
     def __str__(self):
         return f"Modifica per {self.product.name} da {self.user}"
 
@@ -138,5 +212,74 @@ class ProductViewLog(models.Model):
     device_info = models.CharField(max_length=255, null=True, blank=True)
     timestamp = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            # 🔹 Paginazione keyset (globale e per utente)
+            models.Index(fields=['timestamp', 'id'], name='viewlog_ts_id_idx'),
+            models.Index(fields=['user', 'timestamp', 'id'], name='viewlog_user_ts_id_idx'),
+        ]
+
     def __str__(self):
         return f"{self.user} - {self.product} at {self.timestamp}"
+
+
+# 🔹 Avanzamento degli import massivi da dump (per riprendere dopo un'interruzione)
+class ImportCheckpoint(models.Model):
+    source = models.CharField(max_length=500, unique=True)  # Percorso assoluto del dump
+    dump_size = models.BigIntegerField()
+    dump_mtime = models.FloatField()
+    line_number = models.BigIntegerField(default=0)  # Righe già elaborate e salvate
+    counters = models.JSONField(default=dict)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.source} @ riga {self.line_number}"
+
+
+# 🔹 Cache persistente delle ricerche EAN sulle API OpenFacts (anche dei "non trovato")
+class OpenFactsLookup(models.Model):
+    ean = models.CharField(max_length=32, unique=True)
+    found = models.BooleanField(default=False)
+    source = models.CharField(max_length=100, null=True, blank=True)  # Dominio che ha risposto
+    payload = models.JSONField(null=True, blank=True)  # Prodotto restituito dalle API (solo se found)
+    hit_count = models.PositiveIntegerField(default=0)
+    fetched_at = models.DateTimeField(auto_now=True)
+    expires_at = models.DateTimeField(db_index=True)
+    last_used_at = models.DateTimeField(db_index=True)
+
+    def __str__(self):
+        return f"{self.ean} ({'trovato' if self.found else 'non trovato'})"
+
+
+# 🔹 Indice invertito per la ricerca prodotti (token normalizzati di nome, brand, traduzioni, EAN)
+class ProductSearchToken(models.Model):
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='search_tokens')
+    token = models.CharField(max_length=64)
+    weight = models.FloatField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['token', 'product'], name='search_token_product_uniq'),
+        ]
+
+    def __str__(self):
+        return f"{self.token} → {self.product_id}"
+
+
+# 🔹 Numero di prodotti per brand, aggiornato a ogni scrittura (alimenta l'autocompletamento)
+class BrandStat(models.Model):
+    brand = models.CharField(max_length=20, unique=True)
+    product_count = models.PositiveIntegerField(default=0)  # 0 = brand non più usato
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
+
+    def __str__(self):
+        return f"{self.brand} ({self.product_count})"
+
+
+# 🔹 Versione dei dati derivati (cache dell'albero categorie, risposte, ETag), condivisa tra processi e comandi
+class DataVersion(models.Model):
+    name = models.CharField(max_length=100, unique=True)  # es. "category_tree", "prices:42"
+    version = models.BigIntegerField()  # time_ns dell'ultima modifica registrata
+
+    def __str__(self):
+        return f"{self.name} @ {self.version}"
@@ -0,0 +1,173 @@
+# pagination.py
+
+import base64
+import json
+from datetime import date
+from decimal import Decimal
+from functools import reduce
+from operator import or_
+
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+
+# 🔹 Paginazione keyset su un ordinamento stabile, es. ('-date_inserted', '-id')
+#    Ogni pagina è una WHERE (a, b) < (ultimo_a, ultimo_b) + LIMIT: niente COUNT(*) né OFFSET,
+#    quindi il costo di una pagina non dipende da quanto è profonda.
+class KeysetPagination(BasePagination):
+    cursor_query_param = 'cursor'
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+    invalid_cursor_message = 'Cursore non valido.'
+
+    def __init__(self, ordering=('-id',), page_size=10, fields=None):
+        self.ordering = tuple(ordering)
+        self.page_size = page_size
+        # Campi dei termini di ordinamento, per validare i valori del cursore; per i queryset
+        # vengono dal modello, per le query composte (paginate_composed) li passa la vista
+        self.fields = tuple(fields) if fields is not None else None
+
+    def get_page_size(self, request):
+        try:
+            size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        return max(1, min(size, self.max_page_size))
+
+    def encode_cursor(self, values):
+        return base64.urlsafe_b64encode(json.dumps(values).encode()).decode().rstrip('=')
+
+    def decode_cursor(self, cursor, fields=None):
+        """Valori del cursore, convertiti col to_python dei campi; NotFound se malformati o del tipo sbagliato."""
+        try:
+            values = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+        except (ValueError, TypeError):
+            raise NotFound(self.invalid_cursor_message)
+        if not isinstance(values, list) or len(values) != len(self.ordering):
+            raise NotFound(self.invalid_cursor_message)
+        if fields is None:
+            return values
+
+        decoded = []
+        for field, value in zip(fields, values):
+            if value is None or isinstance(value, (list, dict)):
+                raise NotFound(self.invalid_cursor_message)
+            try:
+                decoded.append(field.to_python(value))
+            except (ValidationError, TypeError, ValueError):
+                raise NotFound(self.invalid_cursor_message)
+        return decoded
+
+    def _model_fields(self, model):
+        return [model._meta.get_field(term.lstrip('-')) for term in self.ordering]
+
+    def _after(self, values):
+        """Q per le righe che seguono `values` nell'ordinamento (a > x OR a = x AND b > y ...)."""
+        conditions = []
+        for i, (term, value) in enumerate(zip(self.ordering, values)):
+            name = term.lstrip('-')
+            lookup = 'lt' if term.startswith('-') else 'gt'
+            equal = {f.lstrip('-'): v for f, v in zip(self.ordering[:i], values[:i])}
+            conditions.append(Q(**equal, **{f'{name}__{lookup}': value}))
+        return reduce(or_, conditions)
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        page_size = self.get_page_size(request)
+        cursor = request.query_params.get(self.cursor_query_param)
+
+        queryset = queryset.order_by(*self.ordering)
+        if cursor:
+            values = self.decode_cursor(cursor, self._model_fields(queryset.model))
+            queryset = queryset.filter(self._after(values))
+
+        rows = list(queryset[:page_size + 1])
+        self.has_next = len(rows) > page_size
+        self.page = rows[:page_size]
+        if self.page:
+            last = self.page[-1]
+            model = queryset.model
+            self.next_values = [
+                model._meta.get_field(term.lstrip('-')).value_to_string(last) for term in self.ordering
+            ]
+        return self.page
+
+    def paginate_composed(self, build, request):
+        """
+        Come paginate_queryset, per query composte (UNION) che non accettano filter() e order_by():
+        build(after) riceve la Q delle righe dopo il cursore (None alla prima pagina) e restituisce
+        il queryset già ordinato per self.ordering, con righe dizionario che hanno quei nomi.
+        I valori del cursore sono validati con self.fields, se indicati.
+        """
+        self.request = request
+        page_size = self.get_page_size(request)
+        cursor = request.query_params.get(self.cursor_query_param)
+        queryset = build(self._after(self.decode_cursor(cursor, self.fields)) if cursor else None)
+
+        rows = list(queryset[:page_size + 1]) if queryset is not None else []
+        self.has_next = len(rows) > page_size
+        self.page = rows[:page_size]
+        if self.page:
+            last = self.page[-1]
+            self.next_values = [self._cursor_value(last[term.lstrip('-')]) for term in self.ordering]
+        return self.page
+
+    @staticmethod
+    def _cursor_value(value):
+        if isinstance(value, date):  # Anche datetime
+            return value.isoformat()
+        if isinstance(value, Decimal):
+            return str(value)
+        return value
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, self.encode_cursor(self.next_values))
+
+    def get_paginated_response(self, data):
+        return Response({'next': self.get_next_link(), 'results': data})
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'required': ['results'],
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
+
+
+# 🔹 Paginazione predefinita: a pagine come prima, keyset quando il client passa ?cursor=
+#    (vuoto per la prima pagina). L'ordinamento keyset viene da view.keyset_ordering.
+class OptInKeysetPagination(PageNumberPagination):
+    default_keyset_ordering = ('-id',)
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.keyset = None
+        if KeysetPagination.cursor_query_param in request.query_params:
+            ordering = getattr(view, 'keyset_ordering', self.default_keyset_ordering)
+            self.keyset = KeysetPagination(ordering, self.page_size)
+            return self.keyset.paginate_queryset(queryset, request, view)
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        if self.keyset is not None:
+            return self.keyset.get_paginated_response(data)
+        return super().get_paginated_response(data)
+
+    def get_next_link(self):
+        if self.keyset is not None:
+            return self.keyset.get_next_link()
+        return super().get_next_link()
+
+    def get_previous_link(self):
+        if self.keyset is not None:
+            return None
+        return super().get_previous_link()
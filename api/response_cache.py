@@ -0,0 +1,133 @@
+# response_cache.py
+
+import hashlib
+from functools import wraps
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.core.cache import caches
+from rest_framework.response import Response
+
+from .services import versions
+
+
+# 🔹 Cache delle risposte delle letture pubbliche (liste, dettagli, brand, ricerca)
+#    Si salvano i dati già serializzati (response.data), non il rendering: un HIT salta queryset
+#    e serializer ma rispetta comunque la negoziazione del formato.
+#    Chiave: nome dell'endpoint, staff/pubblico, percorso, query string ordinata e le versioni
+#    delle chiavi da cui dipende la risposta (services/versions). I signal dei modelli fanno
+#    avanzare quelle versioni: le voci vecchie non vengono più lette e scadono da sole.
+#    Le versioni sono nel database, quindi valgono per tutti i processi anche se la cache non
+#    è condivisa. Backend: alias "responses" di CACHES (memoria locale, file o Redis, vedi settings).
+
+CACHE_ALIAS = 'responses'
+KEY = 'response:{name}:{digest}'
+STATS_KEY = 'response_cache:stats:{name}:{outcome}'
+
+
+def _cache():
+    return caches[CACHE_ALIAS]
+
+
+def _timeout():
+    return getattr(settings, 'RESPONSE_CACHE_TIMEOUT', 300)
+
+
+# Endpoint registrati, per leggere le statistiche
+_names = set()
+
+
+def _count(name, outcome):
+    key = STATS_KEY.format(name=name, outcome=outcome)
+    cache = _cache()
+    try:
+        cache.incr(key)
+    except ValueError:  # Contatore ancora assente
+        if not cache.add(key, 1, None):
+            cache.incr(key)
+
+
+def stats():
+    """{endpoint: {hits, misses, hit_rate}}, condivise tra i processi se il backend lo è."""
+    cache = _cache()
+    keys = {
+        (name, outcome): STATS_KEY.format(name=name, outcome=outcome)
+        for name in _names for outcome in ('hit', 'miss')
+    }
+    values = cache.get_many(list(keys.values()))
+    result = {}
+    for name in sorted(_names):
+        hits = values.get(keys[(name, 'hit')], 0)
+        misses = values.get(keys[(name, 'miss')], 0)
+        total = hits + misses
+        result[name] = {'hits': hits, 'misses': misses, 'hit_rate': round(hits / total, 4) if total else None}
+    return result
+
+
+def _key(name, request, dependencies):
+    user = request.user
+    variant = 'staff' if user and user.is_authenticated and user.is_staff else 'public'
+    query = urlencode(sorted((k, v) for k, values in request.query_params.lists() for v in values))
+    # Host incluso: le risposte paginate contengono link assoluti
+    raw = '|'.join([variant, request.get_host(), request.path, query, *versions.get_many(dependencies)])
+    return KEY.format(name=name, digest=hashlib.md5(raw.encode()).hexdigest())
+
+
+def cached(name, dependencies, handler, request, *args, **kwargs):
+    """Risposta di handler dalla cache o calcolata e salvata (solo GET con stato 200)."""
+    if request.method != 'GET':
+        return handler(request, *args, **kwargs)
+
+    cache = _cache()
+    key = _key(name, request, dependencies)
+    data = cache.get(key)
+    if data is not None:
+        _count(name, 'hit')
+        response = Response(data)
+        response['X-Cache'] = 'HIT'
+        return response
+
+    _count(name, 'miss')
+    response = handler(request, *args, **kwargs)
+    if response.status_code == 200 and isinstance(response, Response):
+        cache.set(key, response.data, _timeout())
+        response['X-Cache'] = 'MISS'
+    return response
+
+
+def cache_response(name, dependencies):
+    """
+    Decoratore per funzioni API e azioni dei ViewSet.
+    dependencies(request, **kwargs) → nomi delle versioni da cui dipende la risposta.
+    """
+    _names.add(name)
+
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            request = args[-1]  # (request) per le funzioni, (self, request) per i metodi
+            handler = lambda request, **kw: view(*args[:-1], request, **kw)
+            return cached(name, dependencies(request, **kwargs), handler, request, **kwargs)
+        return wrapper
+    return decorator
+
+
+# 🔹 Cache di list/retrieve per i ViewSet: response_cache_name e response_cache_dependencies
+class ResponseCacheMixin:
+    response_cache_name = None
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        if cls.response_cache_name:
+            _names.update({f'{cls.response_cache_name}-list', f'{cls.response_cache_name}-detail'})
+
+    def response_cache_dependencies(self, request, **kwargs):
+        return []
+
+    def list(self, request, *args, **kwargs):
+        dependencies = self.response_cache_dependencies(request, **kwargs)
+        return cached(f'{self.response_cache_name}-list', dependencies, super().list, request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        dependencies = self.response_cache_dependencies(request, **kwargs)
+        return cached(f'{self.response_cache_name}-detail', dependencies, super().retrieve, request, *args, **kwargs)
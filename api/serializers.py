@@ -1,11 +1,33 @@
 # serializers.py
 
+from decimal import Decimal
+
 from rest_framework import serializers
 from django.contrib.auth.models import User
 from .models import (
-    Product, Price, Store, Category,
+    Product, Price, Store, Category, CurrentPrice,
     UserProfile, ProductChangeRequest, ProductViewLog
 )
+from .services import basket_optimizer, category_tree, store_locator
+
+# 🔹 Mixin per fieldset sparsi: fields=[...] limita l'output, expand=[...] aggiunge
+#    le relazioni annidate dichiarate in Meta.expandable_fields (nome → factory del campo)
+class SparseFieldsetMixin:
+    def __init__(self, *args, fields=None, expand=None, **kwargs):
+        super().__init__(*args, **kwargs)
+
+        expand = list(expand or [])
+        expandable = getattr(self.Meta, 'expandable_fields', {})
+        for name in expand:
+            if name in expandable and name not in self.fields:
+                self.fields[name] = expandable[name]()
+
+        if fields is not None:
+            allowed = set(fields) | set(expand)
+            for name in list(self.fields):
+                if name not in allowed:
+                    self.fields.pop(name)
+
 
 # 🔹 Categoria Serializer
 class CategorySerializer(serializers.ModelSerializer):
@@ -20,8 +42,15 @@ class CategorySerializer(serializers.ModelSerializer):
         fields = ['id', 'name', 'parent', 'children', 'is_approved']
 
     def get_children(self, obj):
-        children = obj.children.all()
-        return CategorySerializer(children, many=True, context=self.context).data
+        # 🔹 Figli presi dall'albero in cache (una query per tutto l'albero, non una per nodo)
+        request = self.context.get('request')
+        staff = bool(request and request.user.is_authenticated and request.user.is_staff)
+        tree = self.context.get('_category_tree')
+        if tree is None:
+            tree = category_tree.get_tree(staff)
+            self.context['_category_tree'] = tree
+        node = tree['nodes'].get(obj.id)
+        return node['children'] if node is not None else []
 
 
 # 🔹 Store Serializer
@@ -31,25 +60,45 @@ class StoreSerializer(serializers.ModelSerializer):
         fields = '__all__'
 
 
+# 🔹 Negozio con la distanza dal punto richiesto (/stores/nearby/)
+class NearbyStoreSerializer(StoreSerializer):
+    distance_km = serializers.SerializerMethodField()
+
+    def get_distance_km(self, obj):
+        return round(obj.distance_km, 3)
+
+
 # 🔹 Product Serializer
-class ProductSerializer(serializers.ModelSerializer):
+class ProductSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     categories = CategorySerializer(many=True, read_only=True)
     translations = serializers.JSONField(required=False)
 
     class Meta:
         model = Product
-        fields = '__all__'
+        exclude = ['content_hash']  # Impronta interna dell'import, non esposta né scrivibile
+
+
+# 🔹 Product Serializer compatto per liste e ricerca (?expand=categories per le categorie)
+class ProductListSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
+    class Meta:
+        model = Product
+        fields = ['id', 'ean', 'name', 'brand', 'quantity', 'unit', 'image_url', 'is_approved']
+        expandable_fields = {
+            'categories': lambda: CategorySerializer(many=True, read_only=True),
+        }
 
 
 # 🔹 Price Serializer
 class PriceSerializer(serializers.ModelSerializer):
-    unit_price = serializers.SerializerMethodField()
+    # Numero JSON come quando era calcolato dal serializer, non la stringa dei DecimalField
+    unit_price = serializers.DecimalField(max_digits=16, decimal_places=4, coerce_to_string=False, read_only=True)
 
     class Meta:
         model = Price
         fields = [
             'id',
             'unit_price',
+            'base_unit',
             'price',
             'currency',
             'price_type',
@@ -59,13 +108,17 @@ class PriceSerializer(serializers.ModelSerializer):
             'store',
             'user',
         ]
-        read_only_fields = ['user']
+        read_only_fields = ['user', 'unit_price', 'base_unit']  # unit_price: calcolato dal signal pre_save
 
-    def get_unit_price(self, obj):
-        quantity = getattr(obj.product, 'quantity', None)
-        if quantity and quantity > 0:
-            return round(obj.price / quantity, 4)
-        return None
+
+# 🔹 Prezzo corrente per negozio (confronto prezzi di un prodotto)
+class CurrentPriceSerializer(serializers.ModelSerializer):
+    store_name = serializers.CharField(source='store.name', read_only=True)
+    price_id = serializers.IntegerField(source='source_id', read_only=True)
+
+    class Meta:
+        model = CurrentPrice
+        fields = ['store', 'store_name', 'price_type', 'price', 'currency', 'date_inserted', 'price_id']
 
 
 # 🔹 Product Change Request Serializer
@@ -110,3 +163,32 @@ class ProductViewLogSerializer(serializers.ModelSerializer):
         model = ProductViewLog
         fields = ['id', 'user', 'product', 'device_info', 'timestamp']
         read_only_fields = ['id', 'user', 'timestamp']
+
+
+# 🔹 Lista della spesa per l'ottimizzazione (/basket/optimize/)
+class BasketItemSerializer(serializers.Serializer):
+    ean = serializers.CharField(required=False, max_length=13)
+    product = serializers.IntegerField(required=False, min_value=1)
+    quantity = serializers.DecimalField(max_digits=8, decimal_places=3, min_value=Decimal('0.001'), default=Decimal('1'))
+
+    def validate(self, attrs):
+        if ('ean' in attrs) == ('product' in attrs):
+            raise serializers.ValidationError('Indicare ean oppure product.')
+        return attrs
+
+
+class BasketRequestSerializer(serializers.Serializer):
+    items = BasketItemSerializer(many=True, allow_empty=False, max_length=200)
+    lat = serializers.FloatField(required=False, min_value=-90, max_value=90)
+    lng = serializers.FloatField(required=False, min_value=-180, max_value=180)
+    radius = serializers.FloatField(required=False, min_value=0.1, max_value=store_locator.MAX_RADIUS_KM,
+                                    default=store_locator.DEFAULT_RADIUS_KM)
+    max_stores = serializers.IntegerField(required=False, min_value=1, max_value=basket_optimizer.MAX_STORES,
+                                          default=basket_optimizer.DEFAULT_MAX_STORES)
+    price_types = serializers.ListField(child=serializers.ChoiceField(choices=Price.PRICE_TYPE_CHOICES), required=False)
+    currency = serializers.CharField(required=False, max_length=10, default='EUR')
+
+    def validate(self, attrs):
+        if ('lat' in attrs) != ('lng' in attrs):
+            raise serializers.ValidationError('lat e lng vanno indicati insieme.')
+        return attrs
@@ -0,0 +1,187 @@
+"""
+Ottimizzazione della spesa: dove comprare una lista di prodotti.
+
+I prezzi vengono da CurrentPrice (ultimo prezzo approvato per prodotto,
+negozio e tipo), letti con una sola query e ridotti al minimo per coppia
+(prodotto, negozio). Ne risulta una matrice negozio × prodotto di costi
+(prezzo × quantità, infinito se il negozio non ha il prodotto), una riga per
+negozio allineata all'ordine dei prodotti.
+
+- Negozio singolo: la riga con meno prodotti mancanti e, a parità, il totale
+  minore, su tutti i negozi.
+- Combinazione di al massimo K negozi: ogni prodotto si compra dove costa
+  meno tra i negozi scelti, cioè il minimo elemento per elemento delle
+  righe. Le combinazioni sono enumerate esattamente su un insieme ristretto
+  di candidati (i negozi più economici per ciascun prodotto e i migliori
+  negozi singoli); la migliore viene poi rifinita sostituendo un negozio
+  alla volta con uno qualsiasi degli altri, finché il totale scende. Così il
+  costo resta contenuto anche con centinaia di negozi.
+"""
+import math
+from dataclasses import dataclass, field
+from decimal import Decimal
+from itertools import combinations
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from api.models import CurrentPrice
+
+
+DEFAULT_MAX_STORES = 2
+MAX_STORES = 3
+# Insieme dei candidati per le combinazioni
+CANDIDATES_PER_PRODUCT = 3
+CANDIDATE_SINGLE_STORES = 10
+MAX_CANDIDATES = 40
+MAX_REFINE_ROUNDS = 5
+
+CENT = Decimal("0.01")
+_MISSING = math.inf
+
+
+@dataclass
+class BasketLine:
+    product_id: int
+    store_id: int
+    price: Decimal
+    price_type: str
+    quantity: Decimal
+
+    @property
+    def subtotal(self) -> Decimal:
+        return (self.price * self.quantity).quantize(CENT)
+
+
+@dataclass
+class BasketPlan:
+    store_ids: List[int]
+    lines: List[BasketLine] = field(default_factory=list)
+    missing: List[int] = field(default_factory=list)  # Prodotti non disponibili nei negozi scelti
+
+    @property
+    def total(self) -> Decimal:
+        return sum((line.subtotal for line in self.lines), Decimal("0.00"))
+
+
+@dataclass
+class BasketResult:
+    unavailable: List[int]  # Prodotti senza prezzi in nessun negozio considerato
+    single_store: Optional[BasketPlan]
+    split: Optional[BasketPlan]
+
+
+def _cheapest_offers(product_ids, store_ids, price_types, currency) -> Dict[int, Dict[int, Tuple[Decimal, str]]]:
+    """{negozio: {prodotto: (prezzo minimo, tipo)}} da una sola query su CurrentPrice."""
+    rows = CurrentPrice.objects.filter(product_id__in=product_ids, currency=currency)
+    if store_ids is not None:
+        rows = rows.filter(store_id__in=store_ids)
+    if price_types:
+        rows = rows.filter(price_type__in=price_types)
+
+    offers: Dict[int, Dict[int, Tuple[Decimal, str]]] = {}
+    for product_id, store_id, price, price_type in rows.values_list("product_id", "store_id", "price", "price_type"):
+        by_product = offers.setdefault(store_id, {})
+        current = by_product.get(product_id)
+        if current is None or price < current[0]:
+            by_product[product_id] = (price, price_type)
+    return offers
+
+
+def _score(rows: List[List[float]]) -> Tuple[int, float]:
+    """(prodotti mancanti, costo) comprando ogni prodotto dove costa meno tra le righe date."""
+    best = rows[0] if len(rows) == 1 else list(map(min, *rows))
+    missing = best.count(_MISSING)
+    if not missing:
+        return 0, sum(best)
+    return missing, sum(value for value in best if value != _MISSING)
+
+
+def _plan(store_ids, products, quantities, offers) -> BasketPlan:
+    plan = BasketPlan(store_ids=list(store_ids))
+    for product_id in products:
+        choices = [
+            (offers[store_id][product_id], store_id) for store_id in store_ids if product_id in offers[store_id]
+        ]
+        if not choices:
+            plan.missing.append(product_id)
+            continue
+        (price, price_type), store_id = min(choices, key=lambda choice: (choice[0][0], choice[1]))
+        plan.lines.append(BasketLine(product_id, store_id, price, price_type, quantities[product_id]))
+    # Negozi da cui non si compra nulla non fanno parte del piano
+    used = {line.store_id for line in plan.lines}
+    plan.store_ids = [store_id for store_id in plan.store_ids if store_id in used]
+    return plan
+
+
+def optimize_basket(
+    quantities: Dict[int, Decimal],
+    store_ids: Optional[Iterable[int]] = None,
+    max_stores: int = DEFAULT_MAX_STORES,
+    price_types: Optional[List[str]] = None,
+    currency: str = "EUR",
+) -> BasketResult:
+    """
+    Negozio singolo e combinazione di al massimo `max_stores` negozi più
+    convenienti per `quantities` ({product_id: quantità}). `store_ids` limita
+    i negozi considerati (None: tutti).
+    """
+    max_stores = min(max(max_stores, 1), MAX_STORES)
+    offers = _cheapest_offers(list(quantities), store_ids, price_types, currency)
+
+    available = set()
+    for by_product in offers.values():
+        available.update(by_product)
+    products = [product_id for product_id in quantities if product_id in available]
+    unavailable = [product_id for product_id in quantities if product_id not in available]
+    if not products:
+        return BasketResult(unavailable=unavailable, single_store=None, split=None)
+
+    # Matrice dei costi: una riga per negozio, una colonna per prodotto
+    weights = [float(quantities[product_id]) for product_id in products]
+    matrix = {
+        store_id: [
+            float(by_product[product_id][0]) * weight if product_id in by_product else _MISSING
+            for product_id, weight in zip(products, weights)
+        ]
+        for store_id, by_product in offers.items()
+    }
+
+    singles = sorted((_score([row]), store_id) for store_id, row in matrix.items())
+    single_store = _plan([singles[0][1]], products, quantities, offers)
+
+    # Candidati: i più economici per ciascun prodotto, poi i migliori negozi singoli
+    candidates = {}
+    for column in range(len(products)):
+        cheapest = sorted((row[column], store_id) for store_id, row in matrix.items() if row[column] != _MISSING)
+        for _, store_id in cheapest[:CANDIDATES_PER_PRODUCT]:
+            candidates[store_id] = None
+    for _, store_id in singles[:CANDIDATE_SINGLE_STORES]:
+        candidates[store_id] = None
+    candidates = sorted(candidates, key=lambda store_id: _score([matrix[store_id]]))[:MAX_CANDIDATES]
+
+    best_key, best_stores = None, None
+    for size in range(1, max_stores + 1):
+        for stores in combinations(candidates, size):
+            missing, cost = _score([matrix[store_id] for store_id in stores])
+            key = (missing, round(cost, 6), size)
+            if best_key is None or key < best_key:
+                best_key, best_stores = key, stores
+
+    # Rifinitura: scambi di un negozio con uno qualsiasi degli altri
+    best_stores = list(best_stores)
+    for _ in range(MAX_REFINE_ROUNDS):
+        improved = False
+        for position in range(len(best_stores)):
+            others = [matrix[store_id] for i, store_id in enumerate(best_stores) if i != position]
+            for store_id in matrix:
+                if store_id in best_stores:
+                    continue
+                missing, cost = _score(others + [matrix[store_id]])
+                key = (missing, round(cost, 6), len(best_stores))
+                if key < best_key:
+                    best_key, improved = key, True
+                    best_stores[position] = store_id
+        if not improved:
+            break
+    split = _plan(sorted(best_stores), products, quantities, offers)
+
+    return BasketResult(unavailable=unavailable, single_store=single_store, split=split)
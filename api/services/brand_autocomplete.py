@@ -0,0 +1,120 @@
+"""
+Autocompletamento dei brand da un indice in memoria.
+
+Il conteggio dei prodotti per brand vive in BrandStat e viene ricalcolato
+solo per i brand toccati da una scrittura (signal di Product e
+bulk_upsert_products), con una COUNT sull'indice di Product.brand. Ogni
+processo tiene un array ordinato di (brand normalizzato, brand) e lo
+riallinea leggendo solo le righe di BrandStat modificate dall'ultima
+sincronizzazione: nessuna richiesta rilegge la tabella dei prodotti.
+
+La ricerca è per prefisso (bisect) senza distinzione di maiuscole e accenti,
+con la ricerca per sottostringa come ripiego; i risultati sono ordinati per
+numero di prodotti.
+"""
+import heapq
+import threading
+import time
+from bisect import bisect_left, insort
+from datetime import timedelta
+from typing import Dict, Iterable, List, Optional
+
+from django.db.models import Count
+
+from api.models import BrandStat, Product
+from api.services import versions
+from api.services.product_search import fold
+
+
+DEFAULT_LIMIT = 20
+# Intervallo minimo tra due sincronizzazioni con BrandStat (secondi)
+SYNC_INTERVAL = 1.0
+# Le righe sono rilette con un margine, per non perdere transazioni con commit in ritardo
+SYNC_OVERLAP = timedelta(seconds=30)
+
+
+def refresh_brand_counts(brands: Iterable[Optional[str]]) -> None:
+    """Ricalcola BrandStat per i brand indicati (anche quelli rimasti senza prodotti)."""
+    brands = {brand for brand in brands if brand}
+    if not brands:
+        return
+    counts = dict(
+        Product.objects.filter(brand__in=brands).values_list("brand").annotate(n=Count("id")).order_by()
+    )
+    BrandStat.objects.bulk_create(
+        [BrandStat(brand=brand, product_count=counts.get(brand, 0)) for brand in brands],
+        update_conflicts=True,
+        unique_fields=["brand"],
+        update_fields=["product_count", "updated_at"],
+    )
+    versions.bump([versions.BRANDS])
+
+
+class BrandAutocomplete:
+    def __init__(self):
+        self._entries: List[tuple] = []  # (brand normalizzato, brand) in ordine
+        self._counts: Dict[str, int] = {}
+        self._synced_until = None
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+
+    def _apply(self, brand: str, count: int) -> None:
+        entry = (fold(brand), brand)
+        known = brand in self._counts
+        if count > 0:
+            if not known:
+                insort(self._entries, entry)
+            self._counts[brand] = count
+        elif known:
+            del self._counts[brand]
+            index = bisect_left(self._entries, entry)
+            if index < len(self._entries) and self._entries[index] == entry:
+                del self._entries[index]
+
+    def sync(self, force: bool = False) -> None:
+        if not force and time.monotonic() - self._checked_at < SYNC_INTERVAL:
+            return
+        with self._lock:
+            self._checked_at = time.monotonic()
+            rows = BrandStat.objects.order_by("updated_at")
+            if self._synced_until is not None:
+                rows = rows.filter(updated_at__gte=self._synced_until - SYNC_OVERLAP)
+            for brand, count, updated_at in rows.values_list("brand", "product_count", "updated_at"):
+                self._apply(brand, count)
+                self._synced_until = updated_at
+
+    def _ranked(self, brands: Iterable[str], limit: int) -> List[str]:
+        counts = self._counts
+        return heapq.nsmallest(limit, brands, key=lambda brand: (-counts[brand], fold(brand), brand))
+
+    def complete(self, query: str = "", limit: int = DEFAULT_LIMIT) -> List[str]:
+        """Brand che iniziano con `query` (poi quelli che la contengono), dal più usato."""
+        self.sync()
+        query = fold(query.strip())
+        with self._lock:
+            if not query:
+                return self._ranked(self._counts, limit)
+
+            entries = self._entries
+            prefixed = []
+            index = bisect_left(entries, (query,))
+            while index < len(entries) and entries[index][0].startswith(query):
+                prefixed.append(entries[index][1])
+                index += 1
+            results = self._ranked(prefixed, limit)
+            if len(results) < limit:
+                infix = (brand for folded, brand in self._entries if query in folded and not folded.startswith(query))
+                results += self._ranked(infix, limit - len(results))
+            return results
+
+
+_autocomplete = BrandAutocomplete()
+
+
+def complete(query: str = "", limit: int = DEFAULT_LIMIT) -> List[str]:
+    return _autocomplete.complete(query, limit)
+
+
+def sync() -> None:
+    """Riallinea subito l'indice, senza attendere SYNC_INTERVAL."""
+    _autocomplete.sync(force=True)
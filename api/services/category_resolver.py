@@ -0,0 +1,145 @@
+"""
+Risoluzione in memoria dei tag categoria OpenFacts negli id di Category.
+
+Gli import chiamavano Category.objects.get_or_create una volta per tag e per
+prodotto, e product.imported_categories.set() per ogni prodotto. Il resolver
+tiene una mappa tag → id, crea i tag nuovi con insert in blocco, e
+sync_imported_categories() scrive la tabella M2M come differenza a batch.
+"""
+from typing import Dict, Iterable, List, Optional
+
+from api.models import Category, Product
+from api.services import category_tree, versions
+
+
+DEFAULT_BATCH_SIZE = 500
+
+
+def _unique(values: Iterable[str]) -> List[str]:
+    return list(dict.fromkeys(values))
+
+
+class CategoryResolver:
+    """
+    Cache tag → id (e id → id del padre) delle categorie con tag.
+
+    Con preload=True tutte le categorie con tag sono lette una volta; altrimenti
+    i tag sono cercati quando servono, una query per chiamata per quelli ignoti.
+    """
+
+    def __init__(self, preload: bool = True, batch_size: int = DEFAULT_BATCH_SIZE):
+        self.batch_size = batch_size
+        self._ids: Dict[str, int] = {}
+        self._parents: Dict[int, Optional[int]] = {}
+        self._preloaded = preload
+        if preload:
+            self._load(Category.objects.exclude(tag=None))
+
+    def _load(self, queryset) -> None:
+        for tag, pk, parent_id in queryset.values_list("tag", "id", "parent_id"):
+            self._ids[tag] = pk
+            self._parents[pk] = parent_id
+
+    def _lookup_missing(self, tags: List[str]) -> List[str]:
+        missing = [tag for tag in tags if tag not in self._ids]
+        if missing and not self._preloaded:
+            self._load(Category.objects.filter(tag__in=missing))
+            missing = [tag for tag in missing if tag not in self._ids]
+        return missing
+
+    def resolve_tags(self, tags: Iterable[str]) -> Dict[str, int]:
+        """
+        Restituisce l'id di ogni tag, creando in blocco quelli nuovi come
+        categorie radice non approvate, col nome del tag senza prefisso.
+        """
+        tags = _unique(tags)
+        missing = self._lookup_missing(tags)
+        if missing:
+            Category.objects.bulk_create(
+                [
+                    Category(
+                        tag=tag,
+                        name=tag.split(":", 1)[-1],
+                        translations=None,
+                        parent=None,
+                        is_approved=False,
+                    )
+                    for tag in missing
+                ],
+                batch_size=self.batch_size,
+                ignore_conflicts=True,
+            )
+            category_tree.invalidate()  # bulk_create non invia post_save
+            self._load(Category.objects.filter(tag__in=missing))
+        return {tag: self._ids[tag] for tag in tags}
+
+    def resolve_hierarchy(self, hierarchy: List[str]) -> Optional[int]:
+        """
+        Garantisce che ogni livello di una categories_hierarchy esista e sia
+        collegato al precedente; restituisce l'id dell'ultimo livello.
+        """
+        self._lookup_missing(_unique(hierarchy))
+
+        parent_id = None
+        for tag in hierarchy:
+            pk = self._ids.get(tag)
+            if pk is None:
+                category, _ = Category.objects.get_or_create(
+                    tag=tag,
+                    defaults={
+                        "name": tag.split(":")[-1].replace("-", " ").capitalize(),
+                        "parent_id": parent_id,
+                    },
+                )
+                pk = category.pk
+                self._ids[tag] = pk
+                self._parents[pk] = category.parent_id
+
+            if self._parents.get(pk) is None and parent_id is not None:
+                Category.objects.filter(pk=pk).update(parent_id=parent_id)
+                category_tree.invalidate()  # update() non invia post_save
+                self._parents[pk] = parent_id
+            parent_id = pk
+
+        return parent_id
+
+
+def sync_imported_categories(links: Dict[int, Iterable[int]], batch_size: int = DEFAULT_BATCH_SIZE) -> None:
+    """
+    Imposta Product.imported_categories di molti prodotti in una volta.
+
+    `links` mappa id prodotto → id delle categorie volute; si inseriscono o
+    cancellano solo le differenze con le righe già nella tabella M2M.
+    """
+    if not links:
+        return
+
+    through = Product.imported_categories.through
+    wanted = {product_id: set(category_ids) for product_id, category_ids in links.items()}
+
+    stale: List[int] = []
+    present = set()
+    changed = set()  # Prodotti con collegamenti aggiunti o rimossi
+    existing = through.objects.filter(product_id__in=list(wanted)).values_list(
+        "id", "product_id", "category_id"
+    )
+    for pk, product_id, category_id in existing:
+        if category_id in wanted[product_id]:
+            present.add((product_id, category_id))
+        else:
+            stale.append(pk)
+            changed.add(product_id)
+
+    for start in range(0, len(stale), batch_size):
+        through.objects.filter(pk__in=stale[start:start + batch_size]).delete()
+
+    missing = [
+        through(product_id=product_id, category_id=category_id)
+        for product_id, category_ids in wanted.items()
+        for category_id in category_ids
+        if (product_id, category_id) not in present
+    ]
+    through.objects.bulk_create(missing, batch_size=batch_size, ignore_conflicts=True)
+    changed.update(link.product_id for link in missing)
+    if changed:
+        versions.bump(versions.product_names(changed))  # bulk_create e delete non inviano m2m_changed
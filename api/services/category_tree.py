@@ -0,0 +1,83 @@
+"""
+Albero delle categorie costruito con una sola query e tenuto in cache.
+
+CategorySerializer.get_children faceva una query per nodo, moltiplicata per
+ogni categoria annidata nei prodotti. Qui l'albero viene letto una volta,
+serializzato come dizionari {id, name, parent, children, is_approved} e messo
+nella cache di Django in due varianti: solo categorie approvate (pubblico) e
+completa (staff).
+
+Ogni modifica a Category (signal post_save/post_delete, oppure le scritture
+che i signal non vedono: bulk_create e update() del CategoryResolver, i comandi
+import_categories, delete_categories e wipe_data) cambia la versione
+dell'albero, che è anche l'ETag di /categories/; le versioni vecchie non vengono più lette e scadono da sole.
+La versione sta nel database (services/versions), quindi una modifica fatta
+da un altro worker o da un comando di import è vista subito da tutti i
+processi, qualunque sia il backend della cache.
+"""
+from typing import Dict, Optional
+
+from django.core.cache import cache
+
+from api.models import Category
+from api.services import versions
+
+
+VERSION_NAME = "category_tree"
+TREE_KEY = "category_tree:{version}:{variant}"
+TREE_TIMEOUT = 24 * 3600
+
+# Ultimo albero deserializzato per variante, valido solo finché la versione letta dal
+# database non cambia: evita di ricaricarlo dalla cache a ogni richiesta
+_local: Dict[str, tuple] = {}
+
+
+def get_version() -> str:
+    return versions.get(VERSION_NAME)
+
+
+def invalidate() -> None:
+    """Cambia la versione dell'albero (dopo il commit della transazione in corso)."""
+    versions.bump([VERSION_NAME])
+
+
+def build_tree(approved_only: bool) -> dict:
+    """Restituisce {"nodes": {id: nodo}, "roots": [nodi radice]} da una sola query."""
+    queryset = Category.objects.order_by("id")
+    if approved_only:
+        queryset = queryset.filter(is_approved=True)
+
+    nodes = {
+        pk: {"id": pk, "name": name, "parent": parent_id, "children": [], "is_approved": is_approved}
+        for pk, name, parent_id, is_approved in queryset.values_list("id", "name", "parent_id", "is_approved")
+    }
+    roots = []
+    for node in nodes.values():
+        parent = nodes.get(node["parent"]) if node["parent"] is not None else None
+        if parent is not None:
+            parent["children"].append(node)
+        elif node["parent"] is None:
+            roots.append(node)
+    return {"nodes": nodes, "roots": roots}
+
+
+def get_tree(staff: bool = False) -> dict:
+    variant = "staff" if staff else "public"
+    version = get_version()
+
+    local = _local.get(variant)
+    if local is not None and local[0] == version:
+        return local[1]
+
+    key = TREE_KEY.format(version=version, variant=variant)
+    tree = cache.get(key)
+    if tree is None:
+        tree = build_tree(approved_only=not staff)
+        cache.set(key, tree, TREE_TIMEOUT)
+    _local[variant] = (version, tree)
+    return tree
+
+
+def get_children(category_id: int, staff: bool = False) -> list:
+    node: Optional[dict] = get_tree(staff)["nodes"].get(category_id)
+    return node["children"] if node is not None else []
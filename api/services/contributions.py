@@ -0,0 +1,119 @@
+"""
+Cronologia dei contributi di un utente: prezzi, prodotti e modifiche proposte.
+
+Le tre tabelle vengono unite nel database con una UNION ALL ordinata per
+(istante, tipo, id), con le stesse colonne calcolate in SQL: stato, nome ed
+EAN del prodotto, prezzo e negozio. L'istante è sempre created_at, un
+datetime in tutte e tre le tabelle (per i prezzi inseriti prima che esistesse
+è la mezzanotte di date_inserted).
+
+I filtri per tipo e stato escludono intere parti della UNION o diventano
+condizioni WHERE sulle colonne di ciascuna tabella; la paginazione keyset
+passa la condizione "dopo il cursore" a ogni parte.
+"""
+from typing import Iterable, Optional
+
+from django.db.models import BigIntegerField, Case, CharField, DateTimeField, DecimalField, F, Q, Value, When
+
+from api.models import Price, Product, ProductChangeRequest
+
+
+TYPES = ("price", "product", "modification")
+STATUSES = ("approved", "pending", "rejected")
+
+# Colonne calcolate, nello stesso ordine in ogni parte della UNION; nei risultati hanno il
+# prefisso feed_ perché le annotazioni non possono avere il nome di un campo del modello
+COLUMNS = ("type", "status", "product_name", "ean", "price", "store_name", "date_inserted")
+PREFIX = "feed_"
+
+# Ordinamento del feed, dal più recente (nomi delle colonne nei risultati), e i tipi delle
+# colonne per validare i cursori keyset
+ORDERING = ("-feed_date_inserted", "-feed_type", "-id")
+ORDERING_FIELDS = (DateTimeField(), CharField(), BigIntegerField())
+
+
+def _approval_status(with_rejected: bool):
+    whens = [When(is_approved=True, then=Value("approved"))]
+    if with_rejected:
+        whens.append(When(is_rejected=True, then=Value("rejected")))
+    return Case(*whens, default=Value("pending"), output_field=CharField())
+
+
+def _status_filter(kind: str, status: Optional[str]) -> Optional[Q]:
+    """Condizione sulle colonne della tabella per lo stato richiesto; None se nessuna riga può averlo."""
+    if status is None:
+        return Q()
+    if kind == "modification":
+        return {
+            "approved": Q(is_approved=True),
+            "rejected": Q(is_approved=False, is_rejected=True),
+            "pending": Q(is_approved=False, is_rejected=False),
+        }[status]
+    if status == "rejected":
+        return None
+    return Q(is_approved=status == "approved")
+
+
+def _part(queryset, after: Optional[Q], **columns):
+    queryset = queryset.annotate(**{PREFIX + name: columns[name] for name in COLUMNS})
+    if after is not None:
+        queryset = queryset.filter(after)
+    return queryset.values("id", *(PREFIX + name for name in COLUMNS))
+
+
+def _parts(user, after):
+    null_price = Value(None, output_field=DecimalField(max_digits=10, decimal_places=2))
+    null_store = Value(None, output_field=CharField())
+    return {
+        "price": _part(
+            Price.objects.filter(user=user), after,
+            type=Value("price"),
+            status=_approval_status(with_rejected=False),
+            product_name=F("product__name"),
+            ean=F("product__ean"),
+            price=F("price"),
+            store_name=F("store__name"),
+            date_inserted=F("created_at"),
+        ),
+        "product": _part(
+            Product.objects.filter(user=user), after,
+            type=Value("product"),
+            status=_approval_status(with_rejected=False),
+            product_name=F("name"),
+            ean=F("ean"),
+            price=null_price,
+            store_name=null_store,
+            date_inserted=F("created_at"),
+        ),
+        "modification": _part(
+            ProductChangeRequest.objects.filter(user=user), after,
+            type=Value("modification"),
+            status=_approval_status(with_rejected=True),
+            product_name=F("product__name"),
+            ean=F("product__ean"),
+            price=null_price,
+            store_name=null_store,
+            date_inserted=F("created_at"),
+        ),
+    }
+
+
+def feed(user, types: Optional[Iterable[str]] = None, status: Optional[str] = None, after: Optional[Q] = None):
+    """
+    Queryset (UNION ALL ordinata per ORDERING) dei contributi di `user`, come
+    dizionari con le chiavi id e feed_<colonna>. `after` è una Q sulle stesse
+    chiavi (es. il cursore keyset); None se nessuna parte può avere risultati.
+    """
+    types = [kind for kind in TYPES if types is None or kind in types]
+
+    parts = []
+    available = _parts(user, after)
+    for kind in types:
+        condition = _status_filter(kind, status)
+        if condition is not None:
+            parts.append(available[kind].filter(condition))
+    if not parts:
+        return None
+
+    union = parts[0].union(*parts[1:], all=True) if len(parts) > 1 else parts[0]
+    return union.order_by(*ORDERING)
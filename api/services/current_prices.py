@@ -0,0 +1,111 @@
+"""
+Tabella materializzata dei prezzi correnti (CurrentPrice).
+
+Per ogni (prodotto, negozio, tipo di prezzo) tiene l'ultimo Price approvato,
+nell'ordine (date_inserted, id). I signal di Price ricalcolano solo le chiavi
+toccate da una scrittura, così il confronto prezzi di un prodotto legge una
+riga per negozio invece di tutto lo storico. rebuild_current_prices la
+ricostruisce da zero.
+
+Le scritture che non inviano signal (QuerySet.update(), bulk_create,
+bulk_update: per esempio un'approvazione in blocco) lasciano la tabella
+indietro senza errori. Chi le fa deve chiamare refresh_current_prices con le
+chiavi dei prezzi toccati, ricavabili con price_keys dallo stesso queryset.
+"""
+from typing import Iterable, List, Set, Tuple
+
+from django.db import transaction
+
+from api.models import CurrentPrice, Price
+
+
+DEFAULT_BATCH_SIZE = 500
+
+PriceKey = Tuple[int, int, str]  # (product_id, store_id, price_type)
+
+
+def _row(price: Price) -> CurrentPrice:
+    return CurrentPrice(
+        product_id=price.product_id,
+        store_id=price.store_id,
+        price_type=price.price_type,
+        source_id=price.pk,
+        price=price.price,
+        currency=price.currency,
+        date_inserted=price.date_inserted,
+    )
+
+
+def _approved():
+    return Price.objects.filter(is_approved=True).only(
+        "id", "product_id", "store_id", "price_type", "price", "currency", "date_inserted"
+    )
+
+
+def price_keys(prices) -> Set[PriceKey]:
+    """Chiavi (prodotto, negozio, tipo) dei Price di un queryset."""
+    return set(prices.values_list("product_id", "store_id", "price_type"))
+
+
+@transaction.atomic
+def refresh_current_prices(keys: Iterable[PriceKey]) -> None:
+    """
+    Ricalcola le righe di CurrentPrice per le chiavi indicate. Chiamata dai
+    signal di Price e, a mano, dopo ogni scrittura massiva sui prezzi.
+    """
+    for product_id, store_id, price_type in set(keys):
+        latest = (
+            _approved()
+            .filter(product_id=product_id, store_id=store_id, price_type=price_type)
+            .order_by("-date_inserted", "-id")
+            .first()
+        )
+        current = CurrentPrice.objects.filter(product_id=product_id, store_id=store_id, price_type=price_type)
+        if latest is None:
+            current.delete()
+            continue
+        # Il Price sorgente può essere legato a un'altra chiave se gli è stato cambiato prodotto o negozio
+        CurrentPrice.objects.filter(source_id=latest.pk).exclude(
+            product_id=product_id, store_id=store_id, price_type=price_type
+        ).delete()
+        CurrentPrice.objects.update_or_create(
+            product_id=product_id,
+            store_id=store_id,
+            price_type=price_type,
+            defaults={
+                "source_id": latest.pk,
+                "price": latest.price,
+                "currency": latest.currency,
+                "date_inserted": latest.date_inserted,
+            },
+        )
+
+
+@transaction.atomic
+def rebuild_current_prices(batch_size: int = DEFAULT_BATCH_SIZE) -> int:
+    """Ricostruisce l'intera tabella in un solo passaggio ordinato sullo storico."""
+    CurrentPrice.objects.all().delete()
+    batch: List[CurrentPrice] = []
+    written = 0
+    previous = None
+    prices = _approved().order_by("product_id", "store_id", "price_type", "-date_inserted", "-id")
+    for price in prices.iterator(chunk_size=batch_size):
+        key = (price.product_id, price.store_id, price.price_type)
+        if key == previous:
+            continue
+        previous = key
+        batch.append(_row(price))
+        if len(batch) >= batch_size:
+            CurrentPrice.objects.bulk_create(batch)
+            written += len(batch)
+            batch = []
+    CurrentPrice.objects.bulk_create(batch)
+    return written + len(batch)
+
+
+def cheapest_for_product(product_id: int, price_type: str | None = None):
+    """Prezzi correnti di un prodotto, uno per negozio e tipo, dal più economico."""
+    queryset = CurrentPrice.objects.filter(product_id=product_id).select_related("store")
+    if price_type:
+        queryset = queryset.filter(price_type=price_type)
+    return queryset.order_by("price", "store_id", "price_type")
@@ -0,0 +1,131 @@
+"""
+Client HTTP per le API prodotto di OpenFacts.
+
+Una sessione requests con pool di connessioni keep-alive condiviso; i domini
+vengono interrogati in parallelo e l'EAN viene risolto dal primo dominio, in
+ordine di priorità di API_DOMAINS, che lo conosce. fetch_many() risolve molti
+EAN in parallelo con un limite di concorrenza.
+"""
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterable, List, NamedTuple, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+
+
+logger = logging.getLogger(__name__)
+
+
+API_DOMAINS = [
+    "world.openfoodfacts.org",
+    "world.openbeautyfacts.org",
+    "world.openpetfoodfacts.org",
+    "world.openproductfacts.org",
+]
+
+# Sovrascrivibile (es. "http://127.0.0.1:8000/{domain}/api/v0/product/{ean}.json")
+# per puntare a un server di test locale.
+DEFAULT_URL_TEMPLATE = "https://{domain}/api/v0/product/{ean}.json"
+DEFAULT_TIMEOUT = 5
+DEFAULT_POOL_SIZE = 16
+
+HIT, MISS, ERROR = "hit", "miss", "error"
+
+
+class FetchResult(NamedTuple):
+    product: Optional[dict]
+    source: Optional[str]
+    errors: int  # domini che non hanno dato una risposta valida (timeout, 5xx, JSON rotto)
+
+
+class OpenFactsClient:
+    def __init__(
+        self,
+        domains: Optional[List[str]] = None,
+        url_template: str = DEFAULT_URL_TEMPLATE,
+        timeout: float = DEFAULT_TIMEOUT,
+        pool_size: int = DEFAULT_POOL_SIZE,
+        rate_limiter=None,
+    ):
+        self.domains = list(domains or API_DOMAINS)
+        self.url_template = url_template
+        self.timeout = timeout
+        # Oggetto con acquire(domain), es. DomainRateLimiter: chiamato prima di ogni richiesta
+        self.rate_limiter = rate_limiter
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=len(self.domains), pool_maxsize=pool_size)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self._executor = ThreadPoolExecutor(max_workers=pool_size, thread_name_prefix="openfacts")
+
+    def close(self) -> None:
+        self._executor.shutdown(wait=False, cancel_futures=True)
+        self.session.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def _query(self, domain: str, ean: str):
+        url = self.url_template.format(domain=domain, ean=ean)
+        if self.rate_limiter is not None:
+            self.rate_limiter.acquire(domain)
+        try:
+            response = self.session.get(url, timeout=self.timeout)
+            if response.status_code == 404:
+                return MISS, None
+            if response.status_code != 200:
+                return ERROR, None
+            data = response.json()
+        except (requests.RequestException, ValueError) as e:
+            logger.warning("Errore chiamando %s: %s", url, e)  # Contato anche in FetchResult.errors
+            return ERROR, None
+
+        if data.get("status") == 1:
+            return HIT, data.get("product")
+        return MISS, None
+
+    def fetch(self, ean: str) -> FetchResult:
+        """
+        Interroga tutti i domini in parallelo. Le risposte sono lette in ordine
+        di priorità: un dominio successivo vince solo se i precedenti non
+        conoscono l'EAN, così il risultato è lo stesso dell'interrogazione in
+        sequenza ma un miss costa un solo timeout invece di uno per dominio.
+        """
+        futures = [self._executor.submit(self._query, domain, ean) for domain in self.domains]
+        errors = 0
+        try:
+            for domain, future in zip(self.domains, futures):
+                outcome, product = future.result()
+                if outcome == HIT:
+                    return FetchResult(product, domain, errors)
+                if outcome == ERROR:
+                    errors += 1
+        finally:
+            for future in futures:
+                future.cancel()
+        return FetchResult(None, None, errors)
+
+    def fetch_many(self, eans: Iterable[str], max_concurrency: int = 8) -> Dict[str, FetchResult]:
+        """Risolve più EAN in parallelo, al massimo max_concurrency alla volta."""
+        eans = list(dict.fromkeys(eans))
+        with ThreadPoolExecutor(max_workers=max_concurrency, thread_name_prefix="openfacts-batch") as executor:
+            return dict(zip(eans, executor.map(self.fetch, eans)))
+
+
+_default_client: Optional[OpenFactsClient] = None
+_default_client_lock = threading.Lock()
+
+
+def get_default_client() -> OpenFactsClient:
+    global _default_client
+
+    with _default_client_lock:
+        if _default_client is None:
+            _default_client = OpenFactsClient()
+        return _default_client
@@ -0,0 +1,236 @@
+"""
+Crawler concorrente per l'importazione completa dei dataset OpenFacts.
+
+Un thread scarica in anticipo le pagine di ricerca (fino a prefetch_pages
+pagine di EAN in coda), un pool limitato di worker importa gli EAN e i
+tentativi falliti vengono ripianificati con backoff esponenziale senza
+bloccare i worker: restano in un heap finché non sono di nuovo eseguibili.
+
+Ogni richiesta HTTP passa da un token bucket per dominio, così la
+concorrenza non supera il rate concordato con le API. Un EAN che nessun
+dominio conosce non viene ritentato (evento not_found); gli errori di rete
+o dei domini sollevano OpenFactsFetchError e seguono il percorso dei
+tentativi. Tutti gli eventi (importati, non trovati, falliti, skippati,
+errori di pagina) sono consegnati al
+callback on_event dal thread chiamante, che può quindi scrivere log e CSV
+senza lock.
+"""
+import heapq
+import queue
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Callable, Dict, Iterable, List, Optional
+from urllib.parse import urlparse
+
+from api.services.openfacts_client import OpenFactsClient
+from api.services.openfacts_importer import import_product_by_ean
+
+
+SEARCH_URL_TEMPLATE = "{base_url}/cgi/search.pl?search_simple=1&action=process&json=1&page_size={page_size}&page={page}"
+DEFAULT_PAGE_SIZE = 1000
+DEFAULT_WORKERS = 8
+DEFAULT_RATE = 5.0  # richieste al secondo per dominio
+MIN_EAN_LENGTH = 8
+
+# Eventi consegnati a on_event(kind, ean, message, attempt)
+DATASET, IMPORTED, NOT_FOUND, RETRY, FAILED, SKIPPED, PAGE_ERROR = (
+    "dataset", "imported", "not_found", "retry", "failed", "skipped", "page_error",
+)
+_EAN, _DONE = "ean", "done"
+
+
+class TokenBucket:
+    """Token bucket thread-safe: `rate` token al secondo, al massimo `capacity` accumulati."""
+
+    def __init__(self, rate: float, capacity: Optional[float] = None):
+        self.rate = rate
+        self.capacity = capacity or max(1.0, rate)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self) -> None:
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait_for = (1 - self._tokens) / self.rate
+            time.sleep(wait_for)
+
+
+class DomainRateLimiter:
+    """Un TokenBucket per dominio; rate None o 0 disattiva il limite."""
+
+    def __init__(self, rate: Optional[float] = DEFAULT_RATE):
+        self.rate = rate
+        self._buckets: Dict[str, TokenBucket] = {}
+        self._lock = threading.Lock()
+
+    def acquire(self, domain: str) -> None:
+        if not self.rate:
+            return
+        with self._lock:
+            bucket = self._buckets.get(domain)
+            if bucket is None:
+                bucket = self._buckets[domain] = TokenBucket(self.rate)
+        bucket.acquire()
+
+
+class OpenFactsCrawler:
+    def __init__(
+        self,
+        client: OpenFactsClient,
+        on_event: Callable[[str, Optional[str], str, int], None],
+        workers: int = DEFAULT_WORKERS,
+        max_retries: int = 3,
+        retry_delay: float = 2.0,
+        page_size: int = DEFAULT_PAGE_SIZE,
+        prefetch_pages: int = 2,
+        max_pages: Optional[int] = None,
+    ):
+        self.client = client
+        self.on_event = on_event
+        self.workers = workers
+        self.max_retries = max_retries
+        self.retry_delay = retry_delay
+        self.page_size = page_size
+        self.prefetch_pages = prefetch_pages
+        self.max_pages = max_pages
+        self._stop = threading.Event()
+
+    # 🔹 Produttori: pagine di ricerca o lista di EAN già nota
+
+    def _put(self, events: queue.Queue, item) -> bool:
+        while not self._stop.is_set():
+            try:
+                events.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _produce_pages(self, datasets: List[str], events: queue.Queue) -> None:
+        session = self.client.session
+        rate_limiter = self.client.rate_limiter
+        try:
+            for base_url in datasets:
+                if not self._put(events, (DATASET, None, base_url)):
+                    return
+                page = 1
+                while self.max_pages is None or page <= self.max_pages:
+                    url = SEARCH_URL_TEMPLATE.format(base_url=base_url, page_size=self.page_size, page=page)
+                    if rate_limiter is not None:
+                        rate_limiter.acquire(urlparse(base_url).netloc)
+                    try:
+                        response = session.get(url, timeout=max(self.client.timeout, 30))
+                        products = response.json().get("products", []) if response.status_code == 200 else None
+                    except Exception:
+                        products = None
+                    if products is None:
+                        self._put(events, (PAGE_ERROR, None, f"Errore nella richiesta a {url}"))
+                        break
+                    if not products:
+                        break
+
+                    for p in products:
+                        ean = p.get("code")
+                        if not ean or len(ean) < MIN_EAN_LENGTH:
+                            item = (SKIPPED, ean, "EAN mancante o troppo corto")
+                        else:
+                            item = (_EAN, ean, "")
+                        if not self._put(events, item):
+                            return
+                    page += 1
+        finally:
+            self._put(events, (_DONE, None, ""))
+
+    def _produce_eans(self, eans: Iterable[str], events: queue.Queue) -> None:
+        try:
+            for ean in eans:
+                if not self._put(events, (_EAN, ean, "")):
+                    return
+        finally:
+            self._put(events, (_DONE, None, ""))
+
+    # 🔹 Consumatore
+
+    def _import(self, ean: str) -> bool:
+        return import_product_by_ean(ean, verbose=False, client=self.client)
+
+    def _run(self, producer: Callable[[queue.Queue], None]) -> None:
+        events: queue.Queue = queue.Queue(maxsize=max(1, self.prefetch_pages) * self.page_size)
+        self._stop.clear()
+        thread = threading.Thread(target=producer, args=(events,), name="openfacts-pages", daemon=True)
+        thread.start()
+
+        max_in_flight = self.workers * 2
+        in_flight = {}
+        retries: list = []  # heap di (pronto_dal, seq, ean, tentativo)
+        seq = 0
+        producer_done = False
+        executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="openfacts-import")
+        try:
+            while True:
+                now = time.monotonic()
+                while retries and retries[0][0] <= now and len(in_flight) < max_in_flight:
+                    _, _, ean, attempt = heapq.heappop(retries)
+                    in_flight[executor.submit(self._import, ean)] = (ean, attempt)
+
+                while not producer_done and len(in_flight) < max_in_flight:
+                    idle = not in_flight and not (retries and retries[0][0] <= now)
+                    try:
+                        kind, ean, message = events.get(timeout=0.1) if idle else events.get_nowait()
+                    except queue.Empty:
+                        break
+                    if kind == _DONE:
+                        producer_done = True
+                    elif kind == _EAN:
+                        in_flight[executor.submit(self._import, ean)] = (ean, 1)
+                    else:
+                        self.on_event(kind, ean, message, 0)
+
+                if producer_done and not in_flight and not retries:
+                    break
+                if not in_flight:
+                    if producer_done and retries:
+                        time.sleep(max(0.0, min(retries[0][0] - time.monotonic(), 0.1)))
+                    continue
+
+                timeout = 0.1
+                if retries:
+                    timeout = max(0.0, min(timeout, retries[0][0] - time.monotonic()))
+                done, _ = wait(in_flight, timeout=timeout, return_when=FIRST_COMPLETED)
+                for future in done:
+                    ean, attempt = in_flight.pop(future)
+                    error = future.exception()
+                    if error is None:
+                        if future.result():
+                            self.on_event(IMPORTED, ean, "", attempt)
+                        else:
+                            self.on_event(NOT_FOUND, ean, "Prodotto non trovato", attempt)
+                        continue
+                    message = f"{type(error).__name__} – {error}"
+                    if attempt < self.max_retries:
+                        self.on_event(RETRY, ean, message, attempt)
+                        ready_at = time.monotonic() + self.retry_delay * 2 ** (attempt - 1)
+                        seq += 1
+                        heapq.heappush(retries, (ready_at, seq, ean, attempt + 1))
+                    else:
+                        self.on_event(FAILED, ean, message, attempt)
+        finally:
+            self._stop.set()
+            executor.shutdown(wait=True, cancel_futures=True)
+            thread.join(timeout=1)
+
+    def crawl(self, datasets: List[str]) -> None:
+        """Scorre le pagine di ricerca di ogni dataset e importa tutti gli EAN validi."""
+        self._run(lambda events: self._produce_pages(datasets, events))
+
+    def import_eans(self, eans: Iterable[str]) -> None:
+        """Importa una lista di EAN già nota (es. il retry finale)."""
+        self._run(lambda events: self._produce_eans(eans, events))
@@ -1,17 +1,20 @@
-import requests
 import re
-from api.models import Product, Category
+from api.models import Product
+from api.services.category_resolver import CategoryResolver
+from api.services.openfacts_client import OpenFactsClient, get_default_client
+from api.services.openfacts_lookup_cache import cached_fetch
+from api.services.product_upsert import bulk_upsert_products
 from django.utils.timezone import now
 from django.db import transaction
 from api.utils.unit_normalization import UNIT_NORMALIZATION_MAP
 
 
-API_DOMAINS = [
-    "world.openfoodfacts.org",
-    "world.openbeautyfacts.org",
-    "world.openpetfoodfacts.org",
-    "world.openproductfacts.org",
-]
+class OpenFactsFetchError(Exception):
+    """Nessun dominio ha trovato l'EAN ma almeno uno non ha risposto: l'esito non è un "non trovato"."""
+
+
+class OpenFactsDataError(Exception):
+    """Il prodotto trovato su OpenFacts non ha i dati minimi per essere salvato (es. product_name)."""
 
 
 def extract_numeric_quantity(value):
@@ -44,42 +47,48 @@ def extract_unit_from_quantity(value):
     return None
 
 
-def fetch_product_data_from_apis(ean: str):
-    for domain in API_DOMAINS:
-        url = f"https://{domain}/api/v0/product/{ean}.json"
-        try:
-            response = requests.get(url, timeout=5)
-            if response.status_code == 200:
-                data = response.json()
-                if data.get("status") == 1:
-                    return data.get("product"), domain
-        except Exception as e:
-            print(f"Errore chiamando {url}: {e}")
-    return None, None
-
-
-def get_or_create_category_hierarchy(hierarchy: list[str]) -> Category | None:
-    parent = None
-    last_category = None
+def fetch_product_data_from_apis(
+    ean: str,
+    client: OpenFactsClient | None = None,
+    use_cache: bool = True,
+    raise_on_error: bool = False,
+):
+    """
+    Cerca l'EAN su tutti i domini API_DOMAINS (in parallelo, con connessioni
+    persistenti) e restituisce (prodotto, dominio) oppure (None, None).
+    Gli esiti, compresi i "non trovato", passano dalla cache OpenFactsLookup.
+    Con raise_on_error un EAN non trovato per errori di rete o dei domini
+    solleva OpenFactsFetchError invece di restituire (None, None).
+    """
+    client = client or get_default_client()
+    result = cached_fetch(ean, client.fetch) if use_cache else client.fetch(ean)
+    if raise_on_error and result.product is None and result.errors:
+        raise OpenFactsFetchError(f"{result.errors} domini non hanno risposto per {ean}")
+    return result.product, result.source
 
-    for tag in hierarchy:
-        name = tag.split(":")[-1].replace("-", " ").capitalize()
-        category, _ = Category.objects.get_or_create(
-            tag=tag,
-            defaults={"name": name, "parent": parent}
-        )
-        if category.parent is None and parent is not None:
-            category.parent = parent
-            category.save()
-        parent = category
-        last_category = category
 
-    return last_category
+def get_or_create_category_hierarchy(hierarchy: list[str], resolver: CategoryResolver | None = None) -> int | None:
+    """
+    Crea la catena di categorie di categories_hierarchy e restituisce l'id della foglia.
+    Passando un resolver condiviso i tag già visti non generano query.
+    """
+    resolver = resolver or CategoryResolver(preload=False)
+    return resolver.resolve_hierarchy(hierarchy)
 
 
 @transaction.atomic
-def import_product_by_ean(ean: str, verbose=False) -> bool:
-    product_data, source = fetch_product_data_from_apis(ean)
+def import_product_by_ean(
+    ean: str,
+    verbose=False,
+    resolver: CategoryResolver | None = None,
+    client: OpenFactsClient | None = None,
+) -> bool:
+    """
+    Importa o aggiorna il prodotto `ean`. Restituisce False se nessun dominio
+    lo conosce; solleva OpenFactsFetchError se la ricerca non è stata completa
+    e OpenFactsDataError se il prodotto trovato non si può salvare.
+    """
+    product_data, source = fetch_product_data_from_apis(ean, client, raise_on_error=True)
 
     if not product_data:
         if verbose:
@@ -122,17 +131,22 @@ def import_product_by_ean(ean: str, verbose=False) -> bool:
         "last_synced_at": now(),
     }
 
-    product, created = Product.objects.update_or_create(
-        ean=ean,
-        defaults=defaults
-    )
+    # 🔹 Validazione prima di scrivere: senza nome il prodotto non è salvabile
+    if not isinstance(defaults["name"], str) or not defaults["name"].strip():
+        raise OpenFactsDataError(f"product_name mancante per {ean}")
+
+    result = bulk_upsert_products([{"ean": ean, **defaults}])
+    created = result.created > 0
 
     # Gestione categorie
     hierarchy = product_data.get("categories_hierarchy")
     if hierarchy:
-        category = get_or_create_category_hierarchy(hierarchy)
-        if category and not product.imported_categories.filter(pk=category.pk).exists():
-            product.imported_categories.add(category)
+        category_id = get_or_create_category_hierarchy(hierarchy, resolver)
+        if category_id:
+            Product.imported_categories.through.objects.get_or_create(
+                product_id=result.ids[ean],
+                category_id=category_id,
+            )
 
     if verbose:
         print(f"[{ean}] {'Creato' if created else 'Aggiornato'} da {source}")
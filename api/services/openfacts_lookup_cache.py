@@ -0,0 +1,129 @@
+"""
+Cache persistente delle ricerche EAN sulle API OpenFacts.
+
+Un EAN sconosciuto costa una richiesta per dominio a ogni scansione e a ogni
+run di import_all_openfacts / update_product_categories_ai. Qui si salvano
+sia i prodotti trovati (payload + dominio) sia i "non trovato", con TTL
+separati; un miss viene salvato solo se tutti i domini hanno risposto
+(nessun timeout o errore), così un disservizio non viene scambiato per un
+EAN inesistente.
+
+Impostazioni (lette a ogni chiamata, con i default qui sotto):
+OPENFACTS_LOOKUP_HIT_TTL e OPENFACTS_LOOKUP_MISS_TTL in secondi,
+OPENFACTS_LOOKUP_MAX_ENTRIES per il numero massimo di righe: oltre il
+limite vengono eliminate le voci scadute e poi quelle usate meno di recente.
+"""
+import threading
+from datetime import timedelta
+from typing import Callable, Dict
+
+from django.conf import settings
+from django.db.models import F
+from django.utils import timezone
+
+from api.models import OpenFactsLookup
+from api.services.openfacts_client import FetchResult
+
+
+DEFAULT_HIT_TTL = 7 * 24 * 3600
+DEFAULT_MISS_TTL = 24 * 3600
+DEFAULT_MAX_ENTRIES = 100_000
+# Ogni quante scritture controllare il limite di dimensione
+EVICTION_INTERVAL = 200
+
+
+class LookupStats:
+    """Contatori del processo corrente (thread-safe)."""
+
+    FIELDS = ("hits", "negative_hits", "misses", "stored", "evicted")
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self) -> None:
+        with self._lock:
+            self._counts = dict.fromkeys(self.FIELDS, 0)
+
+    def incr(self, name: str, amount: int = 1) -> int:
+        with self._lock:
+            self._counts[name] += amount
+            return self._counts[name]
+
+    def snapshot(self) -> Dict[str, int]:
+        with self._lock:
+            return dict(self._counts)
+
+
+stats = LookupStats()
+
+
+def _setting(name: str, default: int) -> int:
+    return getattr(settings, name, default)
+
+
+def cached_fetch(ean: str, fetch: Callable[[str], FetchResult]) -> FetchResult:
+    """
+    Restituisce il risultato in cache per `ean` se ancora valido, altrimenti
+    chiama fetch(ean) e ne salva l'esito.
+    """
+    current = timezone.now()
+    entry = (
+        OpenFactsLookup.objects.filter(ean=ean, expires_at__gt=current)
+        .values_list("found", "source", "payload")
+        .first()
+    )
+    if entry is not None:
+        found, source, payload = entry
+        stats.incr("hits" if found else "negative_hits")
+        OpenFactsLookup.objects.filter(ean=ean).update(hit_count=F("hit_count") + 1, last_used_at=current)
+        return FetchResult(payload if found else None, source if found else None, 0)
+
+    stats.incr("misses")
+    result = fetch(ean)
+    if result.product is not None or result.errors == 0:
+        store(ean, result)
+    return result
+
+
+def store(ean: str, result: FetchResult) -> None:
+    found = result.product is not None
+    ttl = _setting("OPENFACTS_LOOKUP_HIT_TTL" if found else "OPENFACTS_LOOKUP_MISS_TTL",
+                   DEFAULT_HIT_TTL if found else DEFAULT_MISS_TTL)
+    current = timezone.now()
+    OpenFactsLookup.objects.update_or_create(
+        ean=ean,
+        defaults={
+            "found": found,
+            "source": result.source,
+            "payload": result.product,
+            "hit_count": 0,
+            "expires_at": current + timedelta(seconds=ttl),
+            "last_used_at": current,
+        },
+    )
+    if stats.incr("stored") % EVICTION_INTERVAL == 0:
+        evict()
+
+
+def evict(max_entries: int | None = None) -> int:
+    """Riporta la cache entro max_entries righe; restituisce quante ne ha eliminate."""
+    if max_entries is None:
+        max_entries = _setting("OPENFACTS_LOOKUP_MAX_ENTRIES", DEFAULT_MAX_ENTRIES)
+    if OpenFactsLookup.objects.count() <= max_entries:
+        return 0
+
+    deleted, _ = OpenFactsLookup.objects.filter(expires_at__lte=timezone.now()).delete()
+    overflow = OpenFactsLookup.objects.count() - max_entries
+    if overflow > 0:
+        oldest = list(
+            OpenFactsLookup.objects.order_by("last_used_at", "id").values_list("id", flat=True)[:overflow]
+        )
+        for start in range(0, len(oldest), 500):
+            deleted += OpenFactsLookup.objects.filter(id__in=oldest[start:start + 500]).delete()[0]
+    stats.incr("evicted", deleted)
+    return deleted
+
+
+def invalidate(ean: str) -> None:
+    OpenFactsLookup.objects.filter(ean=ean).delete()
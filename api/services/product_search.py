@@ -0,0 +1,165 @@
+"""
+Ricerca prodotti su un indice invertito (ProductSearchToken).
+
+Nome, brand, nomi tradotti (it/en/fr) ed EAN vengono spezzati in token
+minuscoli senza accenti, ciascuno con un peso per campo. Ogni termine della
+query è un prefisso: un prodotto è un risultato se tutti i termini trovano
+almeno un token, e il punteggio somma i pesi dei token trovati (doppi se il
+token è uguale al termine). I prefissi sono interrogati come intervalli
+[termine, termine successivo), così l'indice su token viene usato sia da
+SQLite sia da Postgres.
+
+L'indice è aggiornato da bulk_upsert_products e dal signal post_save di
+Product; rebuild_search_index lo ricostruisce da zero.
+
+Le query di sole cifre (scansioni di codici a barre) non passano dall'indice:
+un EAN completo e valido è cercato per uguaglianza sull'indice unico di
+Product.ean, con l'equivalenza UPC-A / EAN-13 con zero iniziale; un codice
+parziale (o completo ma non trovato) come prefisso ancorato dello stesso indice.
+"""
+import re
+import unicodedata
+from functools import reduce
+from operator import or_
+from typing import Dict, Iterable, List
+
+from django.db.models import Case, F, FloatField, IntegerField, Max, Q, Sum, Value, When
+
+from api.models import Product, ProductSearchToken
+from api.utils.normalizers import ean_variants, is_valid_ean
+
+
+SUPPORTED_LANGUAGES = ["it", "en", "fr"]
+TRANSLATED_FIELDS = ["product_name", "generic_name"]
+
+WEIGHT_EAN = 4.0
+WEIGHT_NAME = 3.0
+WEIGHT_BRAND = 2.0
+WEIGHT_TRANSLATION = 1.0
+
+MAX_TOKEN_LENGTH = 64
+MAX_QUERY_TERMS = 8
+DEFAULT_BATCH_SIZE = 500
+
+_SPLIT_RE = re.compile(r"[^0-9a-z]+")
+
+
+def fold(value: str) -> str:
+    """Minuscolo, senza accenti e segni diacritici."""
+    decomposed = unicodedata.normalize("NFKD", str(value))
+    return "".join(ch for ch in decomposed if not unicodedata.combining(ch)).lower()
+
+
+def tokenize(value) -> List[str]:
+    if not value:
+        return []
+    return [
+        token[:MAX_TOKEN_LENGTH]
+        for token in _SPLIT_RE.split(fold(value))
+        if len(token) > 1 or token.isdigit()
+    ]
+
+
+def product_tokens(ean, name, brand, translations) -> Dict[str, float]:
+    """Token di un prodotto col peso del campo più importante in cui compaiono."""
+    weights: Dict[str, float] = {}
+
+    def add(value, weight):
+        for token in tokenize(value):
+            if weights.get(token, 0) < weight:
+                weights[token] = weight
+
+    add(ean, WEIGHT_EAN)
+    add(name, WEIGHT_NAME)
+    add(brand, WEIGHT_BRAND)
+    if isinstance(translations, dict):
+        for lang in SUPPORTED_LANGUAGES:
+            lang_data = translations.get(lang)
+            if isinstance(lang_data, dict):
+                for field in TRANSLATED_FIELDS:
+                    add(lang_data.get(field), WEIGHT_TRANSLATION)
+    return weights
+
+
+def index_products(product_ids: Iterable[int], batch_size: int = DEFAULT_BATCH_SIZE) -> int:
+    """(Re)indicizza i prodotti indicati; restituisce il numero di token scritti."""
+    product_ids = list(product_ids)
+    written = 0
+    for start in range(0, len(product_ids), batch_size):
+        chunk = product_ids[start:start + batch_size]
+        rows = Product.objects.filter(pk__in=chunk).values_list("pk", "ean", "name", "brand", "translations")
+        tokens = [
+            ProductSearchToken(product_id=pk, token=token, weight=weight)
+            for pk, ean, name, brand, translations in rows
+            for token, weight in product_tokens(ean, name, brand, translations).items()
+        ]
+        ProductSearchToken.objects.filter(product_id__in=chunk).delete()
+        ProductSearchToken.objects.bulk_create(tokens, batch_size=batch_size)
+        written += len(tokens)
+    return written
+
+
+def rebuild_index(batch_size: int = DEFAULT_BATCH_SIZE) -> int:
+    ProductSearchToken.objects.all().delete()
+    written = 0
+    last_pk = 0
+    while True:
+        chunk = list(
+            Product.objects.filter(pk__gt=last_pk).order_by("pk").values_list("pk", flat=True)[:batch_size]
+        )
+        if not chunk:
+            return written
+        written += index_products(chunk, batch_size)
+        last_pk = chunk[-1]
+
+
+def _prefix(term: str, field: str = "token") -> Q:
+    return Q(**{f"{field}__gte": term, f"{field}__lt": term[:-1] + chr(ord(term[-1]) + 1)})
+
+
+def find_by_ean(ean: str):
+    """Queryset dei prodotti con questo EAN, comprese le varianti UPC-A / EAN-13."""
+    return Product.objects.filter(ean__in=ean_variants(ean))
+
+
+def search_ean(code: str, limit: int = 5, offset: int = 0) -> List[int]:
+    code = code.strip()
+    if is_valid_ean(code):
+        exact = list(find_by_ean(code).order_by("ean").values_list("pk", flat=True))
+        if exact:
+            return exact[offset:offset + limit]
+    prefixed = Product.objects.filter(_prefix(code, field="ean")).order_by("ean").values_list("pk", flat=True)
+    return list(prefixed[offset:offset + limit])
+
+
+def search(query: str, limit: int = 5, offset: int = 0) -> List[int]:
+    """Id dei prodotti che corrispondono a `query`, dal più rilevante."""
+    code = query.strip()
+    if code.isascii() and code.isdigit():
+        return search_ean(code, limit, offset)
+
+    terms = list(dict.fromkeys(tokenize(query)))[:MAX_QUERY_TERMS]
+    if not terms:
+        return []
+
+    matched = {
+        f"m{i}": Max(Case(When(_prefix(term), then=Value(1)), default=Value(0), output_field=IntegerField()))
+        for i, term in enumerate(terms)
+    }
+    score = Sum(
+        Case(
+            *[When(token=term, then=F("weight") * 2) for term in terms],
+            *[When(_prefix(term), then=F("weight")) for term in terms],
+            default=Value(0.0),
+            output_field=FloatField(),
+        )
+    )
+    ranked = (
+        ProductSearchToken.objects.filter(reduce(or_, map(_prefix, terms)))
+        .values("product_id")
+        .annotate(score=score, **matched)
+        .filter(**{name: 1 for name in matched})
+        .order_by("-score", "product_id")
+        .values_list("product_id", flat=True)
+    )
+    return list(ranked[offset:offset + limit])
@@ -0,0 +1,134 @@
+"""
+Scrittura in blocco dei prodotti importati.
+
+Ogni batch è scritto con un solo INSERT ... ON CONFLICT (ean) DO UPDATE invece
+di un update_or_create (SELECT + INSERT/UPDATE) per prodotto. Funziona su
+SQLite (>= 3.24) e su Postgres.
+
+Le righe con un content_hash uguale a quello salvato non vengono scritte.
+Il documento "raw_data" non è una colonna di Product: viene compresso nella
+tabella ProductRawData, anche lì con un upsert in blocco per batch. Poiché
+bulk_create non invia post_save, per le righe scritte qui si aggiornano
+l'indice di ricerca, i conteggi del brand vecchio e nuovo, le versioni delle
+risposte in cache e, se quantità o unità cambiano, gli unit_price dei prezzi.
+"""
+from itertools import groupby
+from typing import Dict, List, NamedTuple
+
+from api.models import Product, ProductRawData
+from api.services import versions
+from api.services.brand_autocomplete import refresh_brand_counts
+from api.services.product_search import index_products
+from api.services.unit_prices import refresh_unit_prices
+from api.utils.unit_normalization import to_base_quantity
+
+
+DEFAULT_BATCH_SIZE = 500
+
+# Campi che un import non sovrascrive mai sulle righe esistenti
+PRESERVED_FIELDS = {"id", "ean", "created_at", "is_approved", "user"}
+
+
+class UpsertResult(NamedTuple):
+    created: int
+    updated: int
+    unchanged: int
+    ids: Dict[str, int]
+
+
+def bulk_upsert_products(rows: List[dict]) -> UpsertResult:
+    """
+    Inserisce o aggiorna un batch di righe normalizzate, con chiave l'`ean` unico.
+
+    Ogni riga è un dict di valori dei campi di Product, "ean" compreso. Se lo
+    stesso EAN compare più volte vince l'ultima riga, e i contatori sono quelli
+    che darebbe una sequenza di update_or_create.
+    Restituisce i conteggi creati/aggiornati/invariati e la mappa ean → id
+    delle righe effettivamente scritte.
+    """
+    by_ean: Dict[str, dict] = {}
+    raw_by_ean: Dict[str, object] = {}
+    for row in rows:
+        ean = str(row["ean"])
+        if "raw_data" in row:
+            row = dict(row)
+            raw_by_ean[ean] = row.pop("raw_data")
+        else:
+            raw_by_ean.pop(ean, None)
+        by_ean[ean] = row
+    if not by_ean:
+        return UpsertResult(0, 0, 0, {})
+
+    existing = {
+        row.ean: row
+        for row in Product.objects.filter(ean__in=list(by_ean)).values_list(
+            "ean", "content_hash", "brand", "quantity", "unit", named=True
+        )
+    }
+    unchanged = 0
+    for ean in list(by_ean):
+        content_hash = by_ean[ean].get("content_hash")
+        if content_hash is not None and ean in existing and existing[ean].content_hash == content_hash:
+            del by_ean[ean]
+            unchanged += 1
+    if not by_ean:
+        return UpsertResult(0, len(rows) - unchanged, unchanged, {})
+
+    eans = list(by_ean)
+
+    # Righe raggruppate per insieme di chiavi: un campo assente da una riga
+    # non viene mai sovrascritto col default del modello
+    def field_key(item):
+        return tuple(sorted(k for k in item[1] if k != "ean"))
+
+    for fields, group in groupby(sorted(by_ean.items(), key=field_key), key=field_key):
+        # Le righe senza impronta cancellano quella salvata, così il prossimo
+        # import del dump non le scambia per invariate
+        objs = [
+            Product(ean=ean, **{"content_hash": None, **{k: v for k, v in row.items() if k != "ean"}})
+            for ean, row in group
+        ]
+        update_fields = sorted((set(fields) | {"content_hash", "last_synced_at"}) - PRESERVED_FIELDS)
+        Product.objects.bulk_create(
+            objs,
+            update_conflicts=True,
+            unique_fields=["ean"],
+            update_fields=update_fields,
+        )
+
+    ids = dict(Product.objects.filter(ean__in=eans).values_list("ean", "id"))
+    _save_raw_data({ids[ean]: raw_by_ean[ean] for ean in eans if ean in raw_by_ean})
+    index_products(ids.values())
+    versions.bump(versions.product_names(ids.values()))
+    refresh_brand_counts(
+        {row.get("brand") for row in by_ean.values()}
+        | {existing[ean].brand for ean in eans if ean in existing}
+    )
+    refresh_unit_prices(
+        ids[ean]
+        for ean in eans
+        if ean in existing
+        and ("quantity" in by_ean[ean] or "unit" in by_ean[ean])
+        and to_base_quantity(by_ean[ean].get("quantity", existing[ean].quantity), by_ean[ean].get("unit", existing[ean].unit))
+        != to_base_quantity(existing[ean].quantity, existing[ean].unit)
+    )
+    created = len(set(eans) - set(existing))
+    return UpsertResult(created, len(rows) - created - unchanged, unchanged, ids)
+
+
+def _save_raw_data(documents: Dict[int, object]) -> None:
+    """Salva id prodotto → documento OpenFacts; un documento None cancella quello salvato."""
+    empty = [product_id for product_id, document in documents.items() if document is None]
+    if empty:
+        ProductRawData.objects.filter(product_id__in=empty).delete()
+    ProductRawData.objects.bulk_create(
+        [
+            ProductRawData(product_id=product_id, data=ProductRawData.pack(document))
+            for product_id, document in documents.items()
+            if document is not None
+        ],
+        batch_size=DEFAULT_BATCH_SIZE,
+        update_conflicts=True,
+        unique_fields=["product"],
+        update_fields=["data", "updated_at"],
+    )
@@ -0,0 +1,61 @@
+"""
+Negozi vicini a un punto, senza PostGIS.
+
+Ogni Store con coordinate ha un geohash indicizzato (calcolato dal signal
+pre_save). Una ricerca copre il cerchio con il suo riquadro, seleziona i
+candidati con pochi intervalli di prefisso sul geohash più il filtro sul
+riquadro, e calcola la distanza haversine solo per quelli.
+"""
+import heapq
+from functools import reduce
+from operator import or_
+from typing import List, Tuple
+
+from django.db.models import Q
+
+from api.models import Store
+from api.utils.geo import bounding_box, covering_cells, haversine_km
+
+
+DEFAULT_RADIUS_KM = 5.0
+MAX_RADIUS_KM = 50.0
+DEFAULT_LIMIT = 20
+MAX_LIMIT = 100
+
+
+def _prefix(cell: str) -> Q:
+    return Q(geohash__gte=cell, geohash__lt=cell[:-1] + chr(ord(cell[-1]) + 1))
+
+
+def _box_filter(box) -> Q:
+    min_lat, max_lat, min_lng, max_lng = box
+    query = Q(latitude__gte=min_lat, latitude__lte=max_lat)
+    if (min_lng, max_lng) == (-180.0, 180.0):
+        return query
+    # Riquadro a cavallo dell'antimeridiano: due intervalli di longitudine
+    if min_lng < -180.0:
+        return query & (Q(longitude__gte=min_lng + 360.0) | Q(longitude__lte=max_lng))
+    if max_lng > 180.0:
+        return query & (Q(longitude__gte=min_lng) | Q(longitude__lte=max_lng - 360.0))
+    return query & Q(longitude__gte=min_lng, longitude__lte=max_lng)
+
+
+def nearby_stores(
+    queryset, lat: float, lng: float, radius_km: float = DEFAULT_RADIUS_KM, limit: int = DEFAULT_LIMIT
+) -> List[Tuple[Store, float]]:
+    """Coppie (negozio, distanza in km) entro `radius_km`, dalla più vicina."""
+    box = bounding_box(lat, lng, radius_km)
+    candidates = queryset.filter(geohash__isnull=False).filter(_box_filter(box))
+    cells = covering_cells(box)
+    if cells:
+        candidates = candidates.filter(reduce(or_, map(_prefix, cells)))
+
+    rows = list(candidates.values_list("pk", "latitude", "longitude"))
+    distances = haversine_km(lat, lng, ((float(row[1]), float(row[2])) for row in rows))
+    nearest = heapq.nsmallest(
+        limit,
+        ((distance, row[0]) for row, distance in zip(rows, distances) if distance <= radius_km),
+    )
+
+    stores = Store.objects.in_bulk([pk for _, pk in nearest])
+    return [(stores[pk], distance) for distance, pk in nearest]
@@ -0,0 +1,50 @@
+"""
+Manutenzione di Price.unit_price (prezzo per kg, l o pezzo).
+
+Il valore è calcolato al salvataggio di ogni Price (signal pre_save); quando
+cambiano quantità o unità di un prodotto, tutti i suoi prezzi vengono
+ricalcolati con un solo UPDATE per prodotto.
+"""
+from typing import Iterable
+
+from django.db.models import Case, DecimalField, ExpressionWrapper, F, Value, When
+
+from api.models import Price, Product
+from api.services import versions
+from api.utils.unit_normalization import UNIT_PRICE_LIMIT, to_base_quantity
+
+
+def refresh_unit_prices(product_ids: Iterable[int]) -> int:
+    """Ricalcola unit_price dei prezzi dei prodotti indicati; restituisce le righe aggiornate."""
+    product_ids = list(set(product_ids))
+    if not product_ids:
+        return 0
+
+    updated = 0
+    refreshed = []
+    products = (
+        Product.objects.filter(pk__in=product_ids, price__isnull=False)
+        .distinct()
+        .values_list("pk", "quantity", "unit")
+    )
+    for pk, quantity, unit in products:
+        base_quantity, base_unit = to_base_quantity(quantity, unit)
+        prices = Price.objects.filter(product_id=pk)
+        refreshed.append(pk)
+        if base_quantity is None:
+            updated += prices.update(unit_price=None, base_unit=None)
+            continue
+        per_unit = ExpressionWrapper(
+            F("price") / Value(base_quantity),
+            output_field=DecimalField(max_digits=16, decimal_places=4),
+        )
+        updated += prices.update(
+            unit_price=Case(
+                When(price__lt=UNIT_PRICE_LIMIT * base_quantity, then=per_unit),
+                default=None,
+                output_field=DecimalField(max_digits=16, decimal_places=4),
+            ),
+            base_unit=base_unit,
+        )
+    versions.bump(versions.PRICES.format(product_id=pk) for pk in refreshed)
+    return updated
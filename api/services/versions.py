@@ -0,0 +1,78 @@
+"""
+Contatori di versione per dati derivati e risposte HTTP, nella tabella DataVersion.
+
+Una versione è l'istante (time_ns) dell'ultima modifica registrata per una
+chiave, es. "category_tree" o "prices:42". Serve sia a invalidare cache
+costruite sui dati (cambia la chiave, le voci vecchie scadono da sole) sia
+come validatore per ETag / Last-Modified. Sta nel database e non in cache
+perché deve essere la stessa per tutti i worker e per i comandi di import:
+una versione persa o locale a un processo lascerebbe servire dati vecchi
+senza scadenza.
+"""
+import time
+from datetime import datetime, timezone
+from typing import Iterable, List
+
+from django.db import transaction
+from django.db.models import F, Value
+from django.db.models.functions import Greatest
+
+from api.models import DataVersion
+
+
+PRICES = "prices:{product_id}"  # Prezzi di un prodotto (letture condizionali di /prices/)
+PRODUCTS = "products"  # Qualsiasi prodotto (liste e ricerca)
+PRODUCT = "product:{product_id}"  # Un prodotto, comprese le sue categorie
+STORES = "stores"
+STORE = "store:{store_id}"
+BRANDS = "brands"  # Conteggi di BrandStat (autocompletamento)
+
+
+def get(name: str) -> str:
+    return get_many([name])[0]
+
+
+def get_many(names: Iterable[str]) -> List[str]:
+    """Versioni di più chiavi con una sola query (nello stesso ordine); le chiavi mai viste nascono adesso."""
+    names = list(names)
+    if not names:
+        return []
+    found = dict(DataVersion.objects.filter(name__in=set(names)).values_list("name", "version"))
+    missing = set(names) - set(found)
+    if missing:
+        now = time.time_ns()
+        DataVersion.objects.bulk_create(
+            [DataVersion(name=name, version=now) for name in sorted(missing)], ignore_conflicts=True
+        )
+        found.update(DataVersion.objects.filter(name__in=missing).values_list("name", "version"))
+    return [str(found[name]) for name in names]
+
+
+def product_names(product_ids: Iterable[int]) -> List[str]:
+    """Chiavi da far avanzare quando cambiano i prodotti indicati."""
+    return [PRODUCTS] + [PRODUCT.format(product_id=pk) for pk in product_ids]
+
+
+def _bump(names: set) -> None:
+    now = time.time_ns()
+    # Mai all'indietro, anche con orologi diversi tra i processi
+    updated = DataVersion.objects.filter(name__in=names).update(version=Greatest(F("version") + 1, Value(now)))
+    if updated < len(names):
+        existing = set(DataVersion.objects.filter(name__in=names).values_list("name", flat=True))
+        DataVersion.objects.bulk_create(
+            [DataVersion(name=name, version=now) for name in sorted(names - existing)], ignore_conflicts=True
+        )
+
+
+def bump(names: Iterable[str]) -> None:
+    """
+    Nuova versione per le chiavi indicate, dopo il commit della transazione in corso:
+    così gli import non tengono bloccate le righe condivise (es. "products") per tutto il batch.
+    """
+    names = set(names)
+    if names:
+        transaction.on_commit(lambda: _bump(names))
+
+
+def as_datetime(version: str) -> datetime:
+    return datetime.fromtimestamp(int(version) / 1e9, tz=timezone.utc)
@@ -1,7 +1,11 @@
-from django.db.models.signals import post_save
+from django.db.models.signals import post_save, post_delete, pre_save, m2m_changed
 from django.contrib.auth.models import User
+from django.db import transaction
 from django.dispatch import receiver
-from .models import UserProfile
+from .models import UserProfile, Category, Product, Price, Store
+from .services import brand_autocomplete, category_tree, current_prices, product_search, unit_prices, versions
+from .utils import geo
+from .utils.unit_normalization import to_base_quantity, unit_price
 
 @receiver(post_save, sender=User)
 def create_or_update_user_profile(sender, instance, created, **kwargs):
@@ -9,3 +13,121 @@ def create_or_update_user_profile(sender, instance, created, **kwargs):
         UserProfile.objects.create(user=instance)
     else:
         instance.userprofile.save()
+
+
+# 🔹 Ogni modifica a una categoria invalida l'albero in cache
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+def invalidate_category_tree(sender, **kwargs):
+    category_tree.invalidate()
+
+
+# 🔹 Indice di ricerca aggiornato a ogni salvataggio di un prodotto (la cancellazione va in cascata)
+@receiver(post_save, sender=Product)
+def index_product_for_search(sender, instance, **kwargs):
+    transaction.on_commit(lambda: product_search.index_products([instance.pk]))
+
+
+# 🔹 Risposte in cache del prodotto (dopo l'indicizzazione: on_commit nell'ordine di registrazione)
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+def invalidate_product_responses(sender, instance, **kwargs):
+    versions.bump(versions.product_names([instance.pk]))
+
+
+@receiver(m2m_changed, sender=Product.categories.through)
+@receiver(m2m_changed, sender=Product.imported_categories.through)
+def invalidate_product_category_responses(sender, instance, action, reverse, pk_set, **kwargs):
+    # Dal lato della categoria pk_set contiene i prodotti, ma per clear() è None: si leggono prima
+    if reverse and action == 'pre_clear':
+        instance._cleared_product_ids = list(
+            sender.objects.filter(category_id=instance.pk).values_list('product_id', flat=True)
+        )
+    if not action.startswith('post_'):
+        return
+    if not reverse:
+        product_ids = [instance.pk]
+    elif action == 'post_clear':
+        product_ids = getattr(instance, '_cleared_product_ids', [])
+    else:
+        product_ids = pk_set
+    versions.bump(versions.product_names(product_ids))
+
+
+# 🔹 Valori precedenti del prodotto, per i ricalcoli che dipendono da cosa è cambiato
+@receiver(pre_save, sender=Product)
+def remember_previous_product_values(sender, instance, **kwargs):
+    instance._previous_values = (
+        Product.objects.filter(pk=instance.pk).values_list('brand', 'quantity', 'unit', named=True).first()
+        if instance.pk else None
+    )
+
+
+# 🔹 Conteggi per brand dell'autocompletamento: ricalcolati per il brand vecchio e quello nuovo
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+def refresh_brand_stats(sender, instance, **kwargs):
+    previous = getattr(instance, '_previous_values', None)
+    brands = {instance.brand, previous.brand if previous else None}
+    transaction.on_commit(lambda: brand_autocomplete.refresh_brand_counts(brands))
+
+
+# 🔹 Cambio di quantità o unità: ricalcolo in blocco dei prezzi unitari del prodotto
+@receiver(post_save, sender=Product)
+def refresh_product_unit_prices(sender, instance, created, **kwargs):
+    previous = getattr(instance, '_previous_values', None)
+    if created or previous is None:
+        return
+    if to_base_quantity(previous.quantity, previous.unit) != to_base_quantity(instance.quantity, instance.unit):
+        transaction.on_commit(lambda: unit_prices.refresh_unit_prices([instance.pk]))
+
+
+# 🔹 Prezzi correnti: si ricalcolano la chiave (prodotto, negozio, tipo) vecchia e quella nuova
+def _price_key(price):
+    return (price.product_id, price.store_id, price.price_type)
+
+
+@receiver(pre_save, sender=Price)
+def compute_unit_price(sender, instance, **kwargs):
+    product = instance.product
+    instance.unit_price, instance.base_unit = unit_price(instance.price, product.quantity, product.unit)
+
+
+@receiver(pre_save, sender=Price)
+def remember_previous_price_key(sender, instance, **kwargs):
+    previous = None
+    if instance.pk:
+        previous = Price.objects.filter(pk=instance.pk).values_list('product_id', 'store_id', 'price_type').first()
+    instance._previous_price_key = previous
+
+
+@receiver(post_save, sender=Price)
+@receiver(post_delete, sender=Price)
+def refresh_current_price(sender, instance, **kwargs):
+    keys = {_price_key(instance), getattr(instance, '_previous_price_key', None)} - {None}
+    transaction.on_commit(lambda: current_prices.refresh_current_prices(keys))
+
+
+# 🔹 Versione dei prezzi del prodotto (ETag di /prices/?product=)
+@receiver(post_save, sender=Price)
+@receiver(post_delete, sender=Price)
+def bump_price_version(sender, instance, **kwargs):
+    previous = getattr(instance, '_previous_price_key', None)
+    product_ids = {instance.product_id, previous[0] if previous else None} - {None}
+    versions.bump(versions.PRICES.format(product_id=pk) for pk in product_ids)
+
+
+# 🔹 Geohash del negozio, per /stores/nearby/
+@receiver(pre_save, sender=Store)
+def compute_store_geohash(sender, instance, **kwargs):
+    if instance.latitude is None or instance.longitude is None:
+        instance.geohash = None
+    else:
+        instance.geohash = geo.encode(float(instance.latitude), float(instance.longitude))
+
+
+# 🔹 Risposte in cache dei negozi
+@receiver(post_save, sender=Store)
+@receiver(post_delete, sender=Store)
+def invalidate_store_responses(sender, instance, **kwargs):
+    versions.bump([versions.STORES, versions.STORE.format(store_id=instance.pk)])
@@ -1,3 +1,476 @@
-from django.test import TestCase
+import base64
+import gzip
+import json
+import os
+import random
+import tempfile
+from datetime import datetime, timezone as dt_timezone
+from decimal import Decimal
+from difflib import SequenceMatcher
+from io import StringIO
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.db import OperationalError, connection
+from django.db.migrations.executor import MigrationExecutor
+from django.test import TestCase, TransactionTestCase, override_settings
+from rest_framework.test import APIClient
+
+from api.benchmarks import synthetic
+from api.management.commands import import_off_italy
+from api.management.commands.import_off_italy import is_italian, may_be_italian, process_lines
+from api.models import (
+    Category, CurrentPrice, ImportCheckpoint, Price, Product, ProductChangeRequest, Store,
+)
+from api.services import basket_optimizer, contributions, current_prices, product_search
+from api.services.category_resolver import CategoryResolver
+from api.services.product_upsert import bulk_upsert_products
+from api.utils import geo
+from api.utils.brand_index import BrandIndex
+from api.utils.normalizers import canonicalize_brand
+
+
+def _cursor(values):
+    return base64.urlsafe_b64encode(json.dumps(values).encode()).decode().rstrip('=')
+
+
+def _linear_brand_match(known, brand):
+    """Scansione lineare sostituita da BrandIndex: il primo brand col ratio più alto > 0.8."""
+    best_match, best_score = brand, 0.0
+    for existing in known:
+        score = SequenceMatcher(None, brand.lower(), existing.lower()).ratio()
+        if score > 0.8 and score > best_score:
+            best_match, best_score = existing, score
+    if best_match == brand:
+        known.append(brand)
+    return best_match
+
+
+# 🔹 Scrittura in blocco dei prodotti importati
+class BulkUpsertProductsTests(TestCase):
+    def rows(self, **hashes):
+        return [{'ean': ean, 'name': f'Prodotto {ean}', 'content_hash': value} for ean, value in hashes.items()]
+
+    def test_counters_for_created_updated_and_unchanged_rows(self):
+        result = bulk_upsert_products(self.rows(**{'8000000000001': 'a', '8000000000002': 'b'}))
+        self.assertEqual((result.created, result.updated, result.unchanged), (2, 0, 0))
+        self.assertEqual(set(result.ids), {'8000000000001', '8000000000002'})
+
+        result = bulk_upsert_products(self.rows(**{'8000000000001': 'a', '8000000000002': 'b'}))
+        self.assertEqual((result.created, result.updated, result.unchanged), (0, 0, 2))
+        self.assertEqual(result.ids, {})
+
+        result = bulk_upsert_products(self.rows(**{'8000000000001': 'a', '8000000000002': 'changed'}))
+        self.assertEqual((result.created, result.updated, result.unchanged), (0, 1, 1))
+        self.assertEqual(Product.objects.get(ean='8000000000002').content_hash, 'changed')
+
+    def test_repeated_ean_counts_like_update_or_create(self):
+        rows = [
+            {'ean': '8000000000003', 'name': 'Prima', 'content_hash': 'x'},
+            {'ean': '8000000000003', 'name': 'Seconda', 'content_hash': 'y'},
+        ]
+        result = bulk_upsert_products(rows)
+        self.assertEqual((result.created, result.updated, result.unchanged), (1, 1, 0))
+        self.assertEqual(Product.objects.get(ean='8000000000003').name, 'Seconda')
+
+    def test_row_without_fingerprint_clears_the_stored_one(self):
+        bulk_upsert_products(self.rows(**{'8000000000004': 'a'}))
+        result = bulk_upsert_products([{'ean': '8000000000004', 'name': 'Modificato a mano'}])
+        self.assertEqual(result.updated, 1)
+        self.assertIsNone(Product.objects.get(ean='8000000000004').content_hash)
+
+
+# 🔹 import_off_italy: pre-filtro sui byte e ripresa dal checkpoint
+class ImportOffItalyTests(TestCase):
+    def setUp(self):
+        handle, self.path = tempfile.mkstemp(suffix='.jsonl.gz')
+        os.close(handle)
+        self.addCleanup(os.remove, self.path)
+        synthetic.write_dump(self.path, 60, seed=7)
+
+    def expected_eans(self):
+        with gzip.open(self.path, 'rb') as file_handle:
+            _, results, _ = process_lines(list(file_handle), prefilter=False)
+        return {normalized['ean'] for _, kind, normalized in results if kind == 'row'}
+
+    def test_prefilter_never_drops_an_italian_document(self):
+        docs = list(synthetic.synthetic_documents(300, seed=3))
+        docs += [
+            {'code': '1', 'countries_tags': ['EN:ITALY']},
+            {'code': '2', 'countries': 'Francia, ITALIA'},
+            {'code': '3', 'countries_tags': ['en:france'], 'countries': 'France'},
+            {'code': '4', 'countries': 'Italia'},
+        ]
+        lines = [json.dumps(doc).encode() for doc in docs]
+        lines.append(b'{"code": "5", "countries": "\\u0049taly"}')  # escape: va comunque al parsing
+        for line in lines:
+            if is_italian(json.loads(line)):
+                self.assertTrue(may_be_italian(line), line)
+
+        self.assertEqual(process_lines(lines, prefilter=True)[1], process_lines(lines, prefilter=False)[1])
+
+    def test_resume_after_interrupted_transaction(self):
+        expected = self.expected_eans()
+        original_flush = import_off_italy.Command._flush
+        calls = []
+
+        def failing_flush(command, rows):
+            calls.append(len(rows))
+            if len(calls) == 3:
+                raise RuntimeError('interrotto')
+            return original_flush(command, rows)
+
+        options = {'path': self.path, 'checkpoint_every': 5, 'batch_size': 5, 'stdout': StringIO()}
+        with mock.patch.object(import_off_italy.Command, '_flush', failing_flush):
+            with self.assertRaises(RuntimeError):
+                call_command('import_off_italy', **options)
+
+        # Solo le due transazioni completate sono state scritte, col loro checkpoint
+        checkpoint = ImportCheckpoint.objects.get(source=os.path.abspath(self.path))
+        self.assertEqual(Product.objects.count(), 10)
+        self.assertEqual(checkpoint.counters['created'], 10)
+
+        out = StringIO()
+        call_command('import_off_italy', **{**options, 'resume': True, 'stdout': out})
+        self.assertIn(f'Ripresa dalla riga {checkpoint.line_number}.', out.getvalue())
+        self.assertEqual(set(Product.objects.values_list('ean', flat=True)), expected)
+        self.assertIn(f'Prodotti creati: {len(expected)}', out.getvalue())
+        self.assertFalse(ImportCheckpoint.objects.exists())
+
+
+# 🔹 BrandIndex: stessi risultati della vecchia scansione lineare
+class BrandIndexTests(TestCase):
+    def test_matches_the_linear_scan(self):
+        brands = [canonicalize_brand(brand) for brand in synthetic.synthetic_brands(400, seed=11)]
+        brands += ['Ab', 'Abc', 'aB', 'Coop', 'COOP', 'Cop', 'Star', 'Stra', 'X']
+        random.Random(5).shuffle(brands)
+        seed_brands = ['Barilla', 'Mulino Bianco', 'Ferrero']
+
+        index, known = BrandIndex(seed_brands), list(seed_brands)
+        for brand in brands:
+            if brand:
+                self.assertEqual(index.match(brand), _linear_brand_match(known, brand), brand)
+        self.assertEqual(len(index), len(set(known)))
+
+
+# 🔹 Migrazioni su dati esistenti
+class DataMigrationTests(TransactionTestCase):
+    def migrate(self, target):
+        """Porta il database a `target` (None: ultima migrazione) e restituisce i modelli storici."""
+        executor = MigrationExecutor(connection)
+        targets = [('api', target)] if target else executor.loader.graph.leaf_nodes('api')
+        executor.migrate(targets)
+        executor.loader.build_graph()
+        return executor.loader.project_state(targets).apps
+
+    def tearDown(self):
+        self.migrate(None)
+
+    def test_products_created_before_the_search_index_are_found(self):
+        old_apps = self.migrate('0006_keyset_indexes')
+        product = old_apps.get_model('api', 'Product').objects.create(
+            ean='8000000000500', name='Pasta di Gragnano', brand='Garofalo',
+            translations={'en': {'product_name': 'Durum wheat pasta'}},
+        )
+        self.migrate(None)
+        self.assertEqual(product_search.search('gragnano garof'), [product.pk])
+        self.assertEqual(product_search.search('durum'), [product.pk])
+
+
+# 🔹 Paginazione keyset (?cursor=)
+@override_settings(ROOT_URLCONF='api.urls')
+class KeysetPaginationTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.product_ids = [
+            Product.objects.create(ean=f'80000000{i:05d}', name=f'Prodotto {i}', is_approved=True).pk
+            for i in range(12)
+        ]
+
+    def test_next_links_walk_every_row_once(self):
+        seen = []
+        response = self.client.get('/products/', {'cursor': '', 'page_size': 5})
+        while True:
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(set(response.data), {'next', 'results'})
+            seen += [item['id'] for item in response.data['results']]
+            if response.data['next'] is None:
+                break
+            response = self.client.get(response.data['next'])
+        self.assertEqual(seen, sorted(self.product_ids))
+
+    def test_page_number_pagination_without_cursor(self):
+        response = self.client.get('/products/', {'page': 2})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['count'], 12)
+        self.assertIsNotNone(response.data['previous'])
+
+    def test_tampered_cursors_are_not_found(self):
+        for cursor in ['%%%', _cursor({'id': 1}), _cursor([1, 2]), _cursor(['abc']), _cursor([None]), _cursor([[1]])]:
+            response = self.client.get('/products/', {'cursor': cursor})
+            self.assertEqual(response.status_code, 404, cursor)
+
+        Price.objects.create(
+            product_id=self.product_ids[0], store=Store.objects.create(name='Negozio'),
+            price=Decimal('1.00'), is_approved=True,
+        )
+        self.assertEqual(self.client.get('/prices/', {'cursor': _cursor(['2026-01-01', 10])}).status_code, 200)
+        for values in (['ieri', 10], ['2026-01-01', 'dieci']):
+            self.assertEqual(self.client.get('/prices/', {'cursor': _cursor(values)}).status_code, 404, values)
+
+
+# 🔹 Cronologia dei contributi
+@override_settings(ROOT_URLCONF='api.urls')
+class ContributionsFeedTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('contributore', password='x')
+        other = User.objects.create_user('altro', password='x')
+        store = Store.objects.create(name='Negozio')
+        product = Product.objects.create(ean='8000000000100', name='Prodotto', user=self.user, is_approved=True)
+        Product.objects.create(ean='8000000000101', name='Di un altro', user=other)
+
+        def at(day, hour):
+            return datetime(2026, 1, day, hour, tzinfo=dt_timezone.utc)
+
+        price_a = Price.objects.create(product=product, store=store, price=Decimal('1.50'), user=self.user)
+        price_b = Price.objects.create(product=product, store=store, price=Decimal('1.40'), user=self.user,
+                                       is_approved=True)
+        change = ProductChangeRequest.objects.create(product=product, user=self.user, is_rejected=True)
+        Product.objects.filter(pk=product.pk).update(created_at=at(1, 9))
+        Price.objects.filter(pk=price_a.pk).update(created_at=at(2, 9))
+        Price.objects.filter(pk=price_b.pk).update(created_at=at(2, 9))  # Stesso istante: decide l'id
+        ProductChangeRequest.objects.filter(pk=change.pk).update(created_at=at(2, 9))  # E prima il tipo
+
+        self.expected = [
+            ('price', price_b.pk), ('price', price_a.pk), ('modification', change.pk), ('product', product.pk),
+        ]
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_feed_is_ordered_by_instant_type_and_id(self):
+        rows = list(contributions.feed(self.user))
+        self.assertEqual([(row['feed_type'], row['id']) for row in rows], self.expected)
+        self.assertEqual([row['feed_status'] for row in rows], ['approved', 'pending', 'rejected', 'approved'])
+
+    def test_filters_and_keyset_pages_match_the_full_list(self):
+        response = self.client.get('/user/contributions/', {'status': 'rejected'})
+        self.assertEqual([(item['type'], int(item['id'])) for item in response.data], [self.expected[2]])
+
+        seen = []
+        response = self.client.get('/user/contributions/', {'cursor': '', 'page_size': 1})
+        while True:
+            self.assertEqual(response.status_code, 200)
+            seen += [(item['type'], int(item['id'])) for item in response.data['results']]
+            if response.data['next'] is None:
+                break
+            response = self.client.get(response.data['next'])
+        self.assertEqual(seen, self.expected)
+
+        for values in (['ieri', 'price', 1], ['2026-01-02T09:00:00+00:00', 'price', 'uno']):
+            response = self.client.get('/user/contributions/', {'cursor': _cursor(values)})
+            self.assertEqual(response.status_code, 404, values)
+
+
+# 🔹 /products/by-ean/ con import da OpenFacts
+@override_settings(ROOT_URLCONF='api.urls')
+class ByEanImportTests(TestCase):
+    EAN = '8000000000700'
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.create_user('utente', password='x'))
+
+    def get(self, product_data):
+        target = 'api.services.openfacts_importer.fetch_product_data_from_apis'
+        with mock.patch(target, return_value=(product_data, 'world')):
+            return self.client.get(f'/products/by-ean/{self.EAN}/', {'import': '1'})
+
+    def test_imports_a_complete_product(self):
+        response = self.get({'product_name': 'Passata di pomodoro', 'quantity': '700 g'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['name'], 'Passata di pomodoro')
+
+    def test_product_without_a_name_is_not_importable(self):
+        response = self.get({'product_name': ' ', 'brands': 'Mutti'})
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual(response.data['detail'], 'Prodotto non importabile.')
+        self.assertFalse(Product.objects.exists())
+
+    def test_database_errors_are_not_reported_as_not_found(self):
+        with mock.patch('api.services.openfacts_importer.bulk_upsert_products', side_effect=OperationalError('locked')):
+            with self.assertRaises(OperationalError):
+                self.get({'product_name': 'Passata di pomodoro'})
+
+
+# 🔹 /stores/nearby/
+@override_settings(ROOT_URLCONF='api.urls')
+class NearbyStoresTests(TestCase):
+    def store(self, name, lat, lng):
+        return Store.objects.create(name=name, latitude=Decimal(str(lat)), longitude=Decimal(str(lng)), verified=True)
+
+    def test_radius_crosses_the_antimeridian(self):
+        east = self.store('Est', -16.5, 179.95)
+        west = self.store('Ovest', -16.5, -179.9)
+        self.store('Lontano', -16.5, 178.5)
+        self.store('Greenwich', -16.5, 0.0)
+
+        response = APIClient().get('/stores/nearby/', {'lat': -16.5, 'lng': 179.99, 'radius': 20})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([item['id'] for item in response.data], [east.pk, west.pk])
+
+        expected = geo.haversine_km(-16.5, 179.99, [(-16.5, 179.95), (-16.5, -179.9)])
+        for item, distance in zip(response.data, expected):
+            self.assertAlmostEqual(item['distance_km'], distance, places=3)
+
+    def test_invalid_coordinates(self):
+        client = APIClient()
+        self.assertEqual(client.get('/stores/nearby/', {'lat': 0}).status_code, 400)
+        self.assertEqual(client.get('/stores/nearby/', {'lat': 91, 'lng': 0}).status_code, 400)
+
+
+# 🔹 Prezzi correnti
+class CurrentPriceTests(TestCase):
+    def test_bulk_approval_followed_by_the_refresh_hook(self):
+        product = Product.objects.create(ean='8000000000600', name='Prodotto', is_approved=True)
+        store = Store.objects.create(name='Negozio')
+        with self.captureOnCommitCallbacks(execute=True):
+            approved = Price.objects.create(product=product, store=store, price=Decimal('2.00'), is_approved=True)
+            pending = Price.objects.create(product=product, store=store, price=Decimal('1.80'))
+        self.assertEqual(CurrentPrice.objects.get().source_id, approved.pk)
+
+        # update() non invia post_save: la tabella resta indietro finché non si chiama l'hook
+        prices = Price.objects.filter(pk=pending.pk)
+        prices.update(is_approved=True)
+        self.assertEqual(CurrentPrice.objects.get().source_id, approved.pk)
+
+        current_prices.refresh_current_prices(current_prices.price_keys(prices))
+        current = CurrentPrice.objects.get()
+        self.assertEqual((current.source_id, current.price), (pending.pk, Decimal('1.80')))
+
+        prices.update(is_approved=False)
+        current_prices.refresh_current_prices(current_prices.price_keys(prices))
+        self.assertEqual(CurrentPrice.objects.get().source_id, approved.pk)
+
+
+# 🔹 Ottimizzazione della spesa
+@override_settings(ROOT_URLCONF='api.urls')
+class BasketOptimizerTests(TestCase):
+    # Negozio → prezzi dei prodotti A, B, C (None: non disponibile)
+    PRICES = {
+        'Uno': ('1.00', '5.00', '5.00'),
+        'Due': ('5.00', '1.00', None),
+        'Tre': ('4.00', '3.00', '2.00'),
+    }
+
+    def setUp(self):
+        self.products = [
+            Product.objects.create(ean=f'800000000020{i}', name=name, is_approved=True)
+            for i, name in enumerate('ABC')
+        ]
+        self.stores = {}
+        with self.captureOnCommitCallbacks(execute=True):  # CurrentPrice aggiornata dai signal di Price
+            for name, prices in self.PRICES.items():
+                store = self.stores[name] = Store.objects.create(name=name, verified=True)
+                for product, price in zip(self.products, prices):
+                    if price is not None:
+                        Price.objects.create(product=product, store=store, price=Decimal(price), is_approved=True)
+
+    def test_single_store_and_split_plans(self):
+        self.assertEqual(CurrentPrice.objects.count(), 8)
+
+        quantities = {product.pk: Decimal('1') for product in self.products}
+        result = basket_optimizer.optimize_basket(quantities, max_stores=2)
+        self.assertEqual(result.unavailable, [])
+        self.assertEqual(result.single_store.store_ids, [self.stores['Tre'].pk])
+        self.assertEqual(result.single_store.total, Decimal('9.00'))
+        self.assertEqual(sorted(result.split.store_ids), sorted([self.stores['Uno'].pk, self.stores['Tre'].pk]))
+        self.assertEqual(result.split.total, Decimal('6.00'))
+
+    def test_endpoint_matches_brute_force(self):
+        quantities = {self.products[0].pk: Decimal('2'), self.products[1].pk: Decimal('3')}
+        response = APIClient().post('/basket/optimize/', {
+            'items': [{'product': pk, 'quantity': str(quantity)} for pk, quantity in quantities.items()]
+            + [{'ean': '8000000000999'}],
+            'max_stores': 2,
+        }, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['unknown'], ['8000000000999'])
+
+        # Tutte le coppie di negozi: ogni prodotto dove costa meno tra i due
+        best = min(
+            sum(min(Decimal(self.PRICES[name][i]) for name in pair) * quantities[product.pk]
+                for i, product in enumerate(self.products[:2]))
+            for pair in [('Uno', 'Due'), ('Uno', 'Tre'), ('Due', 'Tre')]
+        )
+        self.assertEqual(Decimal(response.data['split']['total']), best)
+
+
+# 🔹 GET condizionali: ETag → 304 → scrittura → 200
+@override_settings(ROOT_URLCONF='api.urls')
+class ConditionalGetTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.product = Product.objects.create(ean='8000000000300', name='Prodotto', is_approved=True)
+        self.price = Price.objects.create(
+            product=self.product, store=Store.objects.create(name='Negozio'), price=Decimal('2.00'), is_approved=True,
+        )
+
+    def test_price_list_etag_changes_after_a_write(self):
+        params = {'product': self.product.pk}
+        response = self.client.get('/prices/', params)
+        self.assertEqual(response.status_code, 200)
+        etag = response['ETag']
+
+        self.assertEqual(self.client.get('/prices/', params, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.price.price = Decimal('1.90')
+            self.price.save()
+
+        response = self.client.get('/prices/', params, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_pending_price_is_not_found_by_public_conditional_requests(self):
+        pending = Price.objects.create(product=self.product, store=self.price.store, price=Decimal('1.00'))
+        future = 'Fri, 01 Jan 2100 00:00:00 GMT'
+        self.assertEqual(self.client.get(f'/prices/{pending.pk}/', HTTP_IF_MODIFIED_SINCE=future).status_code, 404)
+        self.assertEqual(self.client.get(f'/prices/{self.price.pk}/', HTTP_IF_MODIFIED_SINCE=future).status_code, 304)
+
+    def category_etag_after(self, write):
+        etag = self.client.get('/categories/')['ETag']
+        self.assertEqual(self.client.get('/categories/', HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        with self.captureOnCommitCallbacks(execute=True):
+            write()
+        response = self.client.get('/categories/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        return response
+
+    def test_category_etag_changes_after_a_write(self):
+        self.category_etag_after(lambda: Category.objects.create(name='Pasta', is_approved=True))
+
+    def test_category_etag_changes_after_writes_without_signals(self):
+        Category.objects.create(name='Cereali', tag='en:cereals', is_approved=True)
+        child = Category.objects.create(name='Pasta', tag='en:pastas', is_approved=True)
+
+        # Reparent con update() nel CategoryResolver
+        response = self.category_etag_after(
+            lambda: CategoryResolver(preload=False).resolve_hierarchy(['en:cereals', 'en:pastas'])
+        )
+        self.assertEqual([node['id'] for node in response.data['results'][0]['children']], [child.pk])
+
+        self.category_etag_after(lambda: call_command('delete_categories', stdout=StringIO()))
+
+# 🔹 Prezzo unitario normalizzato
+@override_settings(ROOT_URLCONF='api.urls')
+class UnitPriceTests(TestCase):
+    def test_unit_price_is_a_json_number(self):
+        product = Product.objects.create(
+            ean='8000000000400', name='Prodotto', quantity=Decimal('500'), unit='g', is_approved=True,
+        )
+        price = Price.objects.create(
+            product=product, store=Store.objects.create(name='Negozio'), price=Decimal('2.00'), is_approved=True,
+        )
+        response = APIClient().get(f'/prices/{price.pk}/')
+        self.assertEqual(json.loads(response.content)['unit_price'], 4.0)
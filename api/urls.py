@@ -25,6 +25,8 @@ urlpatterns = [
     path('token/', TokenObtainPairView.as_view(), name='token_obtain_pair'),
     path('token/refresh/', TokenRefreshView.as_view(), name='token_refresh'),
     path('search/', views.search_products, name='search_products'),
+    path('response-cache/stats/', views.response_cache_stats, name='response_cache_stats'),
+    path('basket/optimize/', views.optimize_basket, name='optimize_basket'),
     path('recent-product-views/', views.recent_product_views, name='recent_product_views'),
     path('convert-token/', FirebaseAuthConvertView.as_view(), name='convert_token'),
     path('users/me/', CurrentUserMe.as_view(), name='users-me'),
@@ -0,0 +1,119 @@
+"""
+Indexed fuzzy lookup of canonical brands.
+
+Replaces the linear SequenceMatcher scan over every known brand with an
+index of the distinct brands:
+
+* exact (case-insensitive) hits are answered from a dict;
+* candidates are blocked on shared character bigrams, then filtered with the
+  real_quick_ratio/quick_ratio upper bounds before the full ratio();
+* results are memoized per input and only re-checked against brands added
+  after the memoized answer.
+
+The match rule is unchanged: the first known brand, in insertion order, with
+the highest SequenceMatcher ratio > 0.8 wins; an unmatched brand is added.
+
+Bigram blocking is exact for this threshold. Matching blocks are maximal, so
+if every block had length 1 there would be an unmatched character between
+each pair of blocks, i.e. U >= M - 1 with U = la + lb - 2M. A ratio > 0.8
+means M > 0.4 (la + lb) and U < 0.2 (la + lb), which is only possible when
+la + lb < 5. Pairs that short are compared by scanning the short brands.
+"""
+from bisect import bisect_left
+from collections import defaultdict
+from difflib import SequenceMatcher
+from typing import Dict, Iterable, List, Optional, Tuple
+
+
+THRESHOLD = 0.8
+# Pairs with la + lb below this total may match without sharing a bigram.
+_SHORT_TOTAL = 5
+
+
+def _bigrams(value: str) -> set:
+    return {value[i:i + 2] for i in range(len(value) - 1)}
+
+
+class BrandIndex:
+    def __init__(self, brands: Iterable[str] = ()):
+        self._brands: List[str] = []
+        self._lowers: List[str] = []
+        self._known: set = set()
+        self._exact: Dict[str, int] = {}
+        self._postings: Dict[str, List[int]] = defaultdict(list)
+        self._short: Dict[int, List[int]] = defaultdict(list)
+        self._memo: Dict[str, Tuple[int, float, int]] = {}
+        for brand in brands:
+            self.add(brand)
+
+    def __len__(self) -> int:
+        return len(self._brands)
+
+    def add(self, brand: str) -> None:
+        if not brand or brand in self._known:
+            return
+        rank = len(self._brands)
+        lower = brand.lower()
+        self._brands.append(brand)
+        self._lowers.append(lower)
+        self._known.add(brand)
+        self._exact.setdefault(lower, rank)
+        for bigram in _bigrams(lower):
+            self._postings[bigram].append(rank)
+        if len(lower) < _SHORT_TOTAL - 1:
+            self._short[len(lower)].append(rank)
+
+    def _candidates(self, lower: str, since: int = 0) -> List[int]:
+        ranks = set()
+        for bigram in _bigrams(lower):
+            postings = self._postings.get(bigram)
+            if postings:
+                ranks.update(postings[bisect_left(postings, since):])
+        for length in range(1, _SHORT_TOTAL - len(lower)):
+            postings = self._short.get(length, [])
+            ranks.update(postings[bisect_left(postings, since):])
+        return sorted(ranks)
+
+    def _best(self, lower: str, ranks: List[int], best_score: float) -> Tuple[Optional[int], float]:
+        best_rank = None
+        size = len(lower)
+        matcher = SequenceMatcher(None, lower)
+        for rank in ranks:
+            other = self._lowers[rank]
+            # real_quick_ratio() bound, without building the matcher for `other`
+            if 2.0 * min(size, len(other)) / (size + len(other)) <= THRESHOLD:
+                continue
+            matcher.set_seq2(other)
+            if matcher.quick_ratio() <= THRESHOLD:
+                continue
+            score = matcher.ratio()
+            if score > THRESHOLD and score > best_score:
+                best_rank = rank
+                best_score = score
+        return best_rank, best_score
+
+    def match(self, brand: str) -> str:
+        """Return the canonical brand for `brand`, adding it when nothing matches."""
+        lower = brand.lower()
+
+        exact = self._exact.get(lower)
+        if exact is not None:
+            return self._brands[exact]
+
+        memo = self._memo.get(brand)
+        if memo is not None:
+            rank, score, size = memo
+            if size < len(self._brands):
+                newer_rank, newer_score = self._best(lower, self._candidates(lower, since=size), score)
+                if newer_rank is not None:
+                    rank, score = newer_rank, newer_score
+                self._memo[brand] = (rank, score, len(self._brands))
+            return self._brands[rank]
+
+        rank, score = self._best(lower, self._candidates(lower), 0.0)
+        if rank is None:
+            self.add(brand)
+            return brand
+
+        self._memo[brand] = (rank, score, len(self._brands))
+        return self._brands[rank]
@@ -0,0 +1,106 @@
+"""
+Geohash encoding and great-circle distances, without PostGIS.
+
+A geohash interleaves longitude and latitude bits into a base-32 string, so
+points in the same cell share a prefix and a B-tree index on the column can
+answer "stores in these cells" with a few range scans.
+"""
+import math
+from typing import Iterable, List, Optional, Tuple
+
+BASE32 = "0123456789bcdefghjkmnpqrstuvwxyz"
+EARTH_RADIUS_KM = 6371.0088
+KM_PER_DEGREE_LAT = math.pi * EARTH_RADIUS_KM / 180
+
+GEOHASH_PRECISION = 9  # ~5 m cells, stored on Store.geohash
+
+
+def encode(lat: float, lng: float, precision: int = GEOHASH_PRECISION) -> str:
+    """Geohash of a point; longitude bits come first, as in the reference encoding."""
+    lat_range = [-90.0, 90.0]
+    lng_range = [-180.0, 180.0]
+    chars = []
+    bits = 0
+    value = 0
+    even = True
+    while len(chars) < precision:
+        interval, coordinate = (lng_range, lng) if even else (lat_range, lat)
+        middle = (interval[0] + interval[1]) / 2
+        value <<= 1
+        if coordinate >= middle:
+            value |= 1
+            interval[0] = middle
+        else:
+            interval[1] = middle
+        even = not even
+        bits += 1
+        if bits == 5:
+            chars.append(BASE32[value])
+            bits = 0
+            value = 0
+    return "".join(chars)
+
+
+def cell_size(precision: int) -> Tuple[float, float]:
+    """(height, width) in degrees of a geohash cell at `precision`."""
+    total_bits = 5 * precision
+    lat_bits = total_bits // 2
+    lng_bits = total_bits - lat_bits
+    return 180.0 / 2 ** lat_bits, 360.0 / 2 ** lng_bits
+
+
+def bounding_box(lat: float, lng: float, radius_km: float) -> Tuple[float, float, float, float]:
+    """(min_lat, max_lat, min_lng, max_lng) enclosing a circle; longitudes may exceed ±180."""
+    delta_lat = radius_km / KM_PER_DEGREE_LAT
+    min_lat = max(lat - delta_lat, -90.0)
+    max_lat = min(lat + delta_lat, 90.0)
+    widest = max(abs(min_lat), abs(max_lat))
+    if widest >= 90.0:
+        return min_lat, max_lat, -180.0, 180.0
+    delta_lng = radius_km / (KM_PER_DEGREE_LAT * math.cos(math.radians(widest)))
+    if delta_lng >= 180.0:
+        return min_lat, max_lat, -180.0, 180.0
+    return min_lat, max_lat, lng - delta_lng, lng + delta_lng
+
+
+def _wrap(lng: float) -> float:
+    return (lng + 180.0) % 360.0 - 180.0
+
+
+def covering_cells(box: Tuple[float, float, float, float], max_cells: int = 16) -> Optional[List[str]]:
+    """
+    Geohash prefixes whose cells cover `box`, at the finest precision that needs
+    at most `max_cells` of them. Returns None when the box is too large to be
+    worth a prefix filter.
+    """
+    min_lat, max_lat, min_lng, max_lng = box
+    best = None
+    for precision in range(1, GEOHASH_PRECISION + 1):
+        height, width = cell_size(precision)
+        rows = math.floor(max_lat / height) - math.floor(min_lat / height) + 1
+        columns = math.floor(max_lng / width) - math.floor(min_lng / width) + 1
+        if rows * columns > max_cells:
+            break
+        cells = set()
+        for row in range(rows):
+            cell_lat = min((math.floor(min_lat / height) + row + 0.5) * height, 90.0 - height / 2)
+            for column in range(columns):
+                cell_lng = (math.floor(min_lng / width) + column + 0.5) * width
+                cells.add(encode(cell_lat, _wrap(cell_lng), precision))
+        best = sorted(cells)
+    return best
+
+
+def haversine_km(lat: float, lng: float, points: Iterable[Tuple[float, float]]) -> List[float]:
+    """Great-circle distances (km) from one point to many, reusing the origin's terms."""
+    lat1 = math.radians(lat)
+    lng1 = math.radians(lng)
+    cos_lat1 = math.cos(lat1)
+    distances = []
+    for lat2, lng2 in points:
+        lat2 = math.radians(lat2)
+        half_dlat = math.sin((lat2 - lat1) / 2)
+        half_dlng = math.sin((math.radians(lng2) - lng1) / 2)
+        a = half_dlat * half_dlat + cos_lat1 * math.cos(lat2) * half_dlng * half_dlng
+        distances.append(2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(a))))
+    return distances
@@ -1,15 +1,17 @@
 """
 Utility functions to normalize OpenFoodFacts product data before import.
 """
+import hashlib
+import json
 import re
 from decimal import Decimal, InvalidOperation
-from difflib import SequenceMatcher
 from typing import Dict, List, Optional, Tuple
 
 from api.models import Product
+from api.utils.brand_index import BrandIndex
 
 
-_BRAND_CACHE: Optional[List[str]] = None
+_BRAND_INDEX: Optional[BrandIndex] = None
 
 
 def is_valid_ean(ean: str) -> bool:
@@ -19,6 +21,16 @@ def is_valid_ean(ean: str) -> bool:
     return bool(re.fullmatch(r"(\d{8}|\d{12,13})", str(ean).strip()))
 
 
+def ean_variants(ean: str) -> List[str]:
+    """Return the equivalent spellings of a barcode (UPC-A and its zero-padded EAN-13)."""
+    ean = str(ean).strip()
+    if len(ean) == 12:
+        return [ean, "0" + ean]
+    if len(ean) == 13 and ean.startswith("0"):
+        return [ean, ean[1:]]
+    return [ean]
+
+
 def _normalize_decimal_string(value: Decimal) -> str:
     normalized = value.normalize()
     if normalized == normalized.to_integral():
@@ -149,25 +161,19 @@ def canonicalize_brand(raw_brand: Optional[str]) -> Optional[str]:
     return brand[:20]
 
 
-def _find_similar_brand(brand: str) -> str:
-    global _BRAND_CACHE
+def _get_brand_index() -> BrandIndex:
+    global _BRAND_INDEX
 
-    if _BRAND_CACHE is None:
-        _BRAND_CACHE = list(
-            Product.objects.exclude(brand=None).values_list("brand", flat=True)
+    if _BRAND_INDEX is None:
+        _BRAND_INDEX = BrandIndex(
+            Product.objects.exclude(brand=None).values_list("brand", flat=True).distinct()
         )
+    return _BRAND_INDEX
 
-    best_match = brand
-    best_score = 0.0
-    for existing in _BRAND_CACHE:
-        score = SequenceMatcher(None, brand.lower(), existing.lower()).ratio()
-        if score > 0.8 and score > best_score:
-            best_match = existing
-            best_score = score
 
-    if best_match == brand:
-        _BRAND_CACHE.append(brand)
-    return best_match
+def _find_similar_brand(brand: str) -> str:
+    """Return the known brand with similarity > 0.8, or register `brand` as new."""
+    return _get_brand_index().match(brand)
 
 
 def normalize_name(
@@ -213,16 +219,8 @@ def safe_dict(value) -> Optional[Dict]:
     return None
 
 
-def normalize_off_product(doc: dict) -> Optional[dict]:
-    """
-    Normalize an OFF product document into defaults for update_or_create.
-    Returns None when required checks fail.
-    """
-    ean = doc.get("code")
-    if not is_valid_ean(ean):
-        return None
-
-    name_raw = next(
+def _pick_raw_name(doc: dict) -> Optional[str]:
+    return next(
         (
             doc.get(field)
             for field in [
@@ -235,13 +233,39 @@ def normalize_off_product(doc: dict) -> Optional[dict]:
         ),
         None,
     )
+
+
+def content_fingerprint(normalized: dict) -> str:
+    """Stable SHA-256 of a normalized row (key order and Decimal formatting independent)."""
+    payload = json.dumps(
+        {key: value for key, value in normalized.items() if key != "content_hash"},
+        sort_keys=True,
+        default=str,
+        ensure_ascii=False,
+        separators=(",", ":"),
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def normalize_off_product(doc: dict, match_brand: bool = True) -> Optional[dict]:
+    """
+    Normalize an OFF product document into defaults for update_or_create.
+    Returns None when required checks fail.
+
+    The row carries a content_hash computed before fuzzy brand matching, so it
+    only depends on the document. With match_brand=False the brand lookup is
+    skipped, so the function does not touch the database and can run in
+    worker processes; the caller must then apply match_normalized_brand().
+    """
+    ean = doc.get("code")
+    if not is_valid_ean(ean):
+        return None
+
+    name_raw = _pick_raw_name(doc)
     if not name_raw:
         return None
 
     brand_clean = canonicalize_brand(doc.get("brands"))
-    if brand_clean:
-        brand_clean = _find_similar_brand(brand_clean)
-        brand_clean = brand_clean[:20]
 
     quantity, unit = parse_quantity_unit(doc.get("quantity"))
     normalized_name = normalize_name(name_raw, brand_clean, quantity, unit)
@@ -292,5 +316,30 @@ def normalize_off_product(doc: dict) -> Optional[dict]:
         "translations": translations or None,
         "raw_data": doc,
     }
+    defaults["content_hash"] = content_fingerprint(defaults)
 
+    if match_brand:
+        match_normalized_brand(defaults)
     return defaults
+
+
+def match_normalized_brand(normalized: dict) -> dict:
+    """
+    Apply the fuzzy brand lookup to a row built with match_brand=False and
+    rebuild the name when the brand changes. The result is the same as calling
+    normalize_off_product(doc) directly.
+    """
+    brand = normalized.get("brand")
+    if not brand:
+        return normalized
+
+    matched = _find_similar_brand(brand)[:20]
+    if matched != brand:
+        normalized["brand"] = matched
+        normalized["name"] = normalize_name(
+            _pick_raw_name(normalized["raw_data"]),
+            matched,
+            normalized.get("quantity"),
+            normalized.get("unit"),
+        )
+    return normalized
@@ -1,5 +1,7 @@
 # api/utils/unit_normalization.py
 
+from decimal import Decimal, InvalidOperation
+
 UNIT_NORMALIZATION_MAP = {
     # Peso
     "g": "g",
@@ -57,3 +59,48 @@ UNIT_NORMALIZATION_MAP = {
     "pints": "unknown",
     "sachets": "unknown",
 }
+
+
+# Unità base per il confronto dei prezzi: (unità base, fattore di conversione)
+BASE_UNITS = {
+    "mg": ("kg", Decimal("0.000001")),
+    "g": ("kg", Decimal("0.001")),
+    "kg": ("kg", Decimal("1")),
+    "ml": ("l", Decimal("0.001")),
+    "cl": ("l", Decimal("0.01")),
+    "l": ("l", Decimal("1")),
+    "pz": ("pz", Decimal("1")),
+}
+
+UNIT_PRICE_PLACES = Decimal("0.0001")
+UNIT_PRICE_LIMIT = Decimal("1e12")  # Price.unit_price: max_digits=16, decimal_places=4
+
+
+def to_base_quantity(quantity, unit):
+    """
+    Converte una quantità nell'unità base (kg, l, pz): (500, 'g') → (Decimal('0.5'), 'kg').
+    Restituisce (None, None) se quantità o unità non sono utilizzabili.
+    """
+    if not quantity or not unit:
+        return None, None
+    unit = UNIT_NORMALIZATION_MAP.get(str(unit).strip().lower(), str(unit).strip().lower())
+    if unit not in BASE_UNITS:
+        return None, None
+    try:
+        base_quantity = Decimal(str(quantity)) * BASE_UNITS[unit][1]
+    except InvalidOperation:
+        return None, None
+    if base_quantity <= 0:
+        return None, None
+    return base_quantity, BASE_UNITS[unit][0]
+
+
+def unit_price(price, quantity, unit):
+    """Prezzo per unità base (€/kg, €/l, €/pz) e unità base, oppure (None, None)."""
+    base_quantity, base_unit = to_base_quantity(quantity, unit)
+    if base_quantity is None or price is None:
+        return None, None
+    value = (Decimal(str(price)) / base_quantity).quantize(UNIT_PRICE_PLACES)
+    if value >= UNIT_PRICE_LIMIT:
+        return None, None
+    return value, base_unit
@@ -1,23 +1,36 @@
 # views.py
 
-from rest_framework import viewsets, permissions
+from rest_framework import viewsets, permissions, status
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework.decorators import api_view, permission_classes, action
+from rest_framework.filters import OrderingFilter
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import IsAuthenticated
 from django_filters.rest_framework import DjangoFilterBackend
-from django.db.models import Q
+from django.db.models import F, Max, Q
+from django.core.exceptions import FieldDoesNotExist
 
 from .models import (
     Product, Price, Store, Category,
-    ProductChangeRequest, UserProfile, ProductViewLog
+    ProductChangeRequest, UserProfile, ProductViewLog, ProductRawData
 )
+from .conditional import ConditionalGetMixin
+from .response_cache import ResponseCacheMixin, cache_response
+from . import response_cache
+from .pagination import KeysetPagination
+from .services import (
+    basket_optimizer, brand_autocomplete, category_tree, contributions, current_prices, product_search,
+    store_locator, versions
+)
+from .services.openfacts_importer import OpenFactsDataError, OpenFactsFetchError, import_product_by_ean
+from .utils.normalizers import ean_variants, is_valid_ean
 from .serializers import (
-    ProductSerializer, PriceSerializer, StoreSerializer,
+    ProductSerializer, ProductListSerializer, PriceSerializer, StoreSerializer,
     CategorySerializer, ProductChangeRequestSerializer,
-    UserProfileSerializer, UnifiedContributionSerializer, ProductViewLogSerializer
+    UserProfileSerializer, UnifiedContributionSerializer, ProductViewLogSerializer,
+    CurrentPriceSerializer, NearbyStoreSerializer, BasketRequestSerializer
 )
 
 # 🔹 Helper comune per applicare filtri in base ai permessi
@@ -27,62 +40,221 @@ def _get_queryset_by_permission(user, queryset, public_filter=None):
     return queryset.filter(**(public_filter or {}))
 
 
+# 🔹 Helper per i fieldset sparsi: ?fields=id,name,brand e ?expand=categories
+def _sparse_fieldset_params(request):
+    def parse(name):
+        value = request.query_params.get(name)
+        if value is None:
+            return None
+        return [item.strip() for item in value.split(',') if item.strip()]
+
+    fields = parse('fields')
+    if fields == ['__all__']:
+        fields = []  # Tutti i campi del serializer completo
+    return fields, parse('expand') or []
+
+
+def _product_serializer_for(request, default_class):
+    """
+    Serializer (classe + kwargs) per le letture di prodotti: senza ?fields si usa
+    default_class, con ?fields si sceglie tra tutti i campi di ProductSerializer.
+    """
+    fields, expand = _sparse_fieldset_params(request)
+    if fields is None:
+        return default_class, {'expand': expand}
+    return ProductSerializer, {'fields': fields or None, 'expand': expand}
+
+
+# 🔹 Limita la query alle colonne e relazioni effettivamente serializzate
+def _only_serialized(queryset, serializer):
+    model = queryset.model
+    columns = {model._meta.pk.name}
+    prefetch = []
+    for field in serializer.fields.values():
+        if field.source == '*':
+            return queryset  # Campo calcolato sull'intera istanza: servono tutte le colonne
+        try:
+            model_field = model._meta.get_field(field.source.split('.')[0])
+        except FieldDoesNotExist:
+            continue
+        if model_field.many_to_many or model_field.one_to_many:
+            prefetch.append(model_field.name)
+        elif model_field.concrete:
+            columns.add(model_field.name)
+    return queryset.only(*columns).prefetch_related(*prefetch)
+
+
+# 🔹 ?ordering= con i valori nulli sempre in fondo (es. prezzi senza unit_price)
+class NullsLastOrderingFilter(OrderingFilter):
+    def filter_queryset(self, request, queryset, view):
+        ordering = self.get_ordering(request, queryset, view)
+        if not ordering:
+            return queryset
+        return queryset.order_by(*[
+            F(term[1:]).desc(nulls_last=True) if term.startswith('-') else F(term).asc(nulls_last=True)
+            for term in ordering
+        ])
+
+
 # 🔹 ViewSets principali
 
-class ProductViewSet(viewsets.ModelViewSet):
+BRANDS_MAX_LIMIT = 100
+
+class ProductViewSet(ConditionalGetMixin, ResponseCacheMixin, viewsets.ModelViewSet):
     serializer_class = ProductSerializer
     permission_classes = [permissions.IsAuthenticatedOrReadOnly]
     filter_backends = [DjangoFilterBackend]
     filterset_fields = ['name', 'ean', 'brand', 'is_approved']
+    keyset_ordering = ('id',)
+    response_cache_name = 'products'
+
+    def response_cache_dependencies(self, request, pk=None, **kwargs):
+        products = versions.PRODUCT.format(product_id=pk) if pk is not None else versions.PRODUCTS
+        return [products, category_tree.VERSION_NAME]
+
+    def _is_read(self):
+        return self.action in ('list', 'retrieve')
+
+    def get_serializer_class(self):
+        if self._is_read():
+            default_class = ProductListSerializer if self.action == 'list' else ProductSerializer
+            return _product_serializer_for(self.request, default_class)[0]
+        return super().get_serializer_class()
+
+    def get_serializer(self, *args, **kwargs):
+        if self._is_read():
+            default_class = ProductListSerializer if self.action == 'list' else ProductSerializer
+            kwargs.update(_product_serializer_for(self.request, default_class)[1])
+        return super().get_serializer(*args, **kwargs)
 
     def get_queryset(self):
-        qs = Product.objects.select_related('user').prefetch_related('categories')
+        qs = Product.objects.all()
+        if self._is_read():
+            qs = _only_serialized(qs, self.get_serializer())
         return _get_queryset_by_permission(self.request.user, qs, {'is_approved': True})
 
+    # 🔹 Validatori del dettaglio: last_synced_at, categorie del prodotto e versione dell'albero
+    def conditional_validators(self, request, pk=None, **kwargs):
+        if self.action != 'retrieve':
+            return None
+        try:
+            qs = _get_queryset_by_permission(request.user, Product.objects.filter(pk=pk), {'is_approved': True})
+        except (ValueError, TypeError):
+            return None
+        last_synced_at = qs.values_list('last_synced_at', flat=True).first()
+        if last_synced_at is None:
+            return None
+        category_ids = sorted(
+            Product.categories.through.objects.filter(product_id=pk).values_list('category_id', flat=True)
+        )
+        product_version, tree_version = versions.get_many([versions.PRODUCT.format(product_id=pk), category_tree.VERSION_NAME])
+        token = f'{last_synced_at.isoformat()}|{category_ids}|{product_version}|{tree_version}'
+        return token, max(last_synced_at, versions.as_datetime(tree_version))
+
     def perform_create(self, serializer):
         serializer.save(user=self.request.user)
 
+    # 🔹 Prezzo corrente in ogni negozio, dal più economico (?price_type= per filtrare)
+    @action(detail=True, methods=['get'], url_path='current-prices')
+    def store_prices(self, request, pk=None):
+        product = self.get_object()
+        prices = current_prices.cheapest_for_product(product.pk, request.query_params.get('price_type'))
+        return Response(CurrentPriceSerializer(prices, many=True).data)
+
+    # 🔹 Documento OpenFacts originale, caricato solo quando richiesto esplicitamente
+    @action(detail=True, methods=['get'], url_path='raw')
+    def raw(self, request, pk=None):
+        product = self.get_object()
+        data = ProductRawData.objects.filter(product_id=product.pk).values_list('data', flat=True).first()
+        if data is None:
+            return Response({'detail': 'Dati originali non disponibili.'}, status=status.HTTP_404_NOT_FOUND)
+        return Response(ProductRawData.unpack(data))
+
+    # 🔹 Lookup diretto per codice a barre (scansione). Come /search/ non filtra per approvazione.
+    #    Con ?import=1 un utente autenticato importa da OpenFacts l'EAN assente: le richieste
+    #    anonime non generano chiamate esterne né scritture.
+    @action(detail=False, methods=['get'], url_path=r'by-ean/(?P<ean>\d+)', permission_classes=[permissions.AllowAny])
+    def by_ean(self, request, ean=None):
+        product = product_search.find_by_ean(ean).order_by('ean').first()
+        wants_import = request.query_params.get('import') == '1' and request.user.is_authenticated
+        if product is None and wants_import and is_valid_ean(ean):
+            try:
+                import_product_by_ean(ean)
+            except OpenFactsFetchError:
+                return Response({'detail': 'OpenFacts non raggiungibile, riprova più tardi.'},
+                                status=status.HTTP_502_BAD_GATEWAY)
+            except OpenFactsDataError:  # Dati OpenFacts incompleti (es. senza product_name)
+                return Response({'detail': 'Prodotto non importabile.'}, status=status.HTTP_404_NOT_FOUND)
+            product = product_search.find_by_ean(ean).order_by('ean').first()
+        if product is None:
+            return Response({'detail': 'Prodotto non trovato.'}, status=status.HTTP_404_NOT_FOUND)
+        serializer_class, serializer_kwargs = _product_serializer_for(request, ProductSerializer)
+        return Response(serializer_class(product, context=self.get_serializer_context(), **serializer_kwargs).data)
+
         # 🔹 Endpoint custom per suggerimento brand
     @action(detail=False, methods=['get'], url_path='brands', permission_classes=[permissions.AllowAny])
+    @cache_response('brands', lambda request, **kwargs: [versions.BRANDS])
     def brands(self, request):
         """
-        Restituisce l'elenco dei brand unici, con filtro opzionale via ?search=
+        Restituisce i brand per l'autocompletamento, con filtro opzionale via ?search=
+        (prefisso, poi sottostringa; senza accenti né maiuscole), dal più usato, al massimo ?limit=
         """
-        query = request.query_params.get('search', '').strip().lower()
-        brands = Product.objects.exclude(brand__isnull=True).exclude(brand__exact='')
-
-        if query:
-            brands = brands.filter(brand__icontains=query)
-
-        unique_brands = (
-            brands.values_list('brand', flat=True)
-            .distinct()
-            .order_by('brand')
-        )
+        query = request.query_params.get('search', '')
+        try:
+            limit = min(max(int(request.query_params.get('limit', brand_autocomplete.DEFAULT_LIMIT)), 1), BRANDS_MAX_LIMIT)
+        except ValueError:
+            return Response({'detail': 'limit deve essere un numero intero.'}, status=status.HTTP_400_BAD_REQUEST)
 
-        return Response(list(unique_brands))
+        brand_autocomplete.sync()  # Risposta da mettere in cache: indice allineato agli ultimi conteggi
+        return Response(brand_autocomplete.complete(query, limit))
 
 
 
-class PriceViewSet(viewsets.ModelViewSet):
+class PriceViewSet(ConditionalGetMixin, viewsets.ModelViewSet):
     serializer_class = PriceSerializer
     permission_classes = [permissions.IsAuthenticatedOrReadOnly]
-    filter_backends = [DjangoFilterBackend]
-    filterset_fields = ['product', 'date_inserted', 'store', 'price_type']
+    filter_backends = [DjangoFilterBackend, NullsLastOrderingFilter]
+    filterset_fields = ['product', 'date_inserted', 'store', 'price_type', 'base_unit']
+    ordering_fields = ['unit_price', 'price', 'date_inserted']  # ?ordering=unit_price confronta formati diversi
+    ordering = ['-date_inserted', '-id']
+    keyset_ordering = ('-date_inserted', '-id')
 
     def get_queryset(self):
         qs = Price.objects.select_related('product', 'store', 'user')
         return _get_queryset_by_permission(self.request.user, qs, {'is_approved': True})
 
+    # 🔹 Validatori per i prezzi di un prodotto (?product= o dettaglio): id massimo e versione dei prezzi,
+    #    calcolati sui soli prezzi visibili all'utente come il resto del viewset
+    def conditional_validators(self, request, pk=None, **kwargs):
+        visible = _get_queryset_by_permission(request.user, Price.objects.all(), {'is_approved': True})
+        try:
+            if self.action == 'list':
+                product_id = int(request.query_params['product'])
+            elif self.action == 'retrieve':
+                product_id = visible.filter(pk=pk).values_list('product_id', flat=True).first()
+            else:
+                return None
+        except (KeyError, ValueError, TypeError):
+            return None
+        if product_id is None:
+            return None
+        max_id = visible.filter(product_id=product_id).aggregate(max_id=Max('id'))['max_id']
+        version = versions.get(versions.PRICES.format(product_id=product_id))
+        return f'{max_id}|{version}', versions.as_datetime(version)
+
     def perform_create(self, serializer):
         serializer.save(user=self.request.user)
 
 
-class StoreViewSet(viewsets.ModelViewSet):
+class StoreViewSet(ResponseCacheMixin, viewsets.ModelViewSet):
     serializer_class = StoreSerializer
     permission_classes = [permissions.IsAuthenticatedOrReadOnly]
     filter_backends = [DjangoFilterBackend]
     filterset_fields = ['store_type', 'verified']
+    response_cache_name = 'stores'
+
+    def response_cache_dependencies(self, request, pk=None, **kwargs):
+        return [versions.STORE.format(store_id=pk) if pk is not None else versions.STORES]
 
     def get_queryset(self):
         qs = Store.objects.all()
@@ -91,12 +263,42 @@ class StoreViewSet(viewsets.ModelViewSet):
     def perform_create(self, serializer):
         serializer.save(user=self.request.user)
 
-
-class CategoryViewSet(viewsets.ModelViewSet):
+    # 🔹 Negozi entro ?radius= km (default 5, max 50) da ?lat=&lng=, dal più vicino, al massimo ?limit=
+    @action(detail=False, methods=['get'], url_path='nearby')
+    def nearby(self, request):
+        params = request.query_params
+        try:
+            lat = float(params['lat'])
+            lng = float(params['lng'])
+            radius = float(params.get('radius', store_locator.DEFAULT_RADIUS_KM))
+            limit = int(params.get('limit', store_locator.DEFAULT_LIMIT))
+        except KeyError:
+            return Response({'detail': 'lat e lng sono obbligatori.'}, status=status.HTTP_400_BAD_REQUEST)
+        except ValueError:
+            return Response({'detail': 'lat, lng, radius e limit devono essere numerici.'}, status=status.HTTP_400_BAD_REQUEST)
+        if not (-90 <= lat <= 90 and -180 <= lng <= 180):
+            return Response({'detail': 'Coordinate non valide.'}, status=status.HTTP_400_BAD_REQUEST)
+        if not radius > 0:
+            return Response({'detail': 'radius deve essere positivo.'}, status=status.HTTP_400_BAD_REQUEST)
+
+        radius = min(radius, store_locator.MAX_RADIUS_KM)
+        limit = min(max(limit, 1), store_locator.MAX_LIMIT)
+        stores = []
+        for store, distance in store_locator.nearby_stores(self.get_queryset(), lat, lng, radius, limit):
+            store.distance_km = distance
+            stores.append(store)
+        return Response(NearbyStoreSerializer(stores, many=True, context=self.get_serializer_context()).data)
+
+
+class CategoryViewSet(ConditionalGetMixin, ResponseCacheMixin, viewsets.ModelViewSet):
     serializer_class = CategorySerializer
     permission_classes = [permissions.AllowAny]
     filter_backends = [DjangoFilterBackend]
     filterset_fields = ['name', 'tag', 'parent', 'is_approved']
+    response_cache_name = 'categories'
+
+    def response_cache_dependencies(self, request, **kwargs):
+        return [category_tree.VERSION_NAME]
 
     def get_queryset(self):
         qs = Category.objects.all()
@@ -105,6 +307,13 @@ class CategoryViewSet(viewsets.ModelViewSet):
             return qs.filter(parent=None)
         return qs
 
+    # 🔹 Validatori: versione dell'albero (nel database, uguale per tutti i processi). Le scritture
+    #    che non inviano signal (bulk_create, update(), import e cancellazioni massive) la fanno
+    #    avanzare con category_tree.invalidate()
+    def conditional_validators(self, request, **kwargs):
+        version = category_tree.get_version()
+        return version, versions.as_datetime(version)
+
 
 class ProductChangeRequestViewSet(viewsets.ModelViewSet):
     serializer_class = ProductChangeRequestSerializer
@@ -123,6 +332,7 @@ class ProductChangeRequestViewSet(viewsets.ModelViewSet):
 class ProductViewLogViewSet(viewsets.ModelViewSet):
     serializer_class = ProductViewLogSerializer
     permission_classes = [permissions.IsAuthenticatedOrReadOnly]
+    keyset_ordering = ('-timestamp', '-id')
 
     def get_queryset(self):
         return ProductViewLog.objects.select_related('product', 'user')
@@ -153,73 +363,148 @@ class UserPreferencesView(APIView):
 # 🔹 APIView - Contributi utente
 
 class UserContributionsView(APIView):
+    """
+    Cronologia dei contributi (prezzi, prodotti, modifiche) dal più recente, costruita nel database.
+    Filtri: ?type=price,product,modification e ?status=approved|pending|rejected.
+    Con ?cursor= (vuoto per la prima pagina) risponde a pagine keyset {next, results}.
+    """
     permission_classes = [IsAuthenticated]
 
     def get(self, request):
-        user = request.user
-
-        price_data = Price.objects.filter(user=user).select_related('product', 'store')
-        product_data = Product.objects.filter(user=user)
-        mod_data = ProductChangeRequest.objects.filter(user=user).select_related('product')
-
-        contributions = []
-
-        for p in price_data:
-            contributions.append({
-                'id': str(p.id),
-                'type': 'price',
-                'status': 'approved' if p.is_approved else 'pending',
-                'product_name': p.product.name,
-                'ean': p.product.ean,
-                'price': float(p.price),
-                'store_name': p.store.name,
-                'date_inserted': p.date_inserted,
-            })
-
-        for p in product_data:
-            contributions.append({
-                'id': str(p.id),
-                'type': 'product',
-                'status': 'approved' if p.is_approved else 'pending',
-                'product_name': p.name,
-                'ean': p.ean,
-                'price': None,
-                'store_name': None,
-                'date_inserted': p.created_at,
-            })
-
-        for m in mod_data:
-            contributions.append({
-                'id': str(m.id),
-                'type': 'modification',
-                'status': 'approved' if m.is_approved else ('rejected' if m.is_rejected else 'pending'),
-                'product_name': m.product.name,
-                'ean': m.product.ean,
-                'price': None,
-                'store_name': None,
-                'date_inserted': m.created_at,
-            })
-
-        contributions.sort(key=lambda x: x['date_inserted'], reverse=True)
-
-        serializer = UnifiedContributionSerializer(contributions, many=True)
+        types = request.query_params.get('type')
+        types = [kind.strip() for kind in types.split(',') if kind.strip()] if types else None
+        status_filter = request.query_params.get('status') or None
+        if types and not set(types) <= set(contributions.TYPES):
+            return Response({'detail': f"type deve essere tra: {', '.join(contributions.TYPES)}."}, status=400)
+        if status_filter and status_filter not in contributions.STATUSES:
+            return Response({'detail': f"status deve essere tra: {', '.join(contributions.STATUSES)}."}, status=400)
+
+        def build(after=None):
+            return contributions.feed(request.user, types, status_filter, after)
+
+        paginator = None
+        if KeysetPagination.cursor_query_param in request.query_params:
+            paginator = KeysetPagination(contributions.ORDERING, page_size=20, fields=contributions.ORDERING_FIELDS)
+            rows = paginator.paginate_composed(build, request)
+        else:
+            feed = build()
+            rows = feed if feed is not None else []
+
+        prefix = contributions.PREFIX
+        items = [
+            {'id': str(row['id']), **{name: row[prefix + name] for name in contributions.COLUMNS}}
+            for row in rows
+        ]
+        serializer = UnifiedContributionSerializer(items, many=True)
+        if paginator is not None:
+            return paginator.get_paginated_response(serializer.data)
         return Response(serializer.data)
 
 
-# 🔹 Funzione API - Ricerca prodotti
+# 🔹 Funzione API - Ricerca prodotti (indice invertito ordinato per rilevanza, ?limit= e ?offset=)
+
+SEARCH_MAX_LIMIT = 50
 
 @api_view(['GET'])
+@cache_response('search', lambda request, **kwargs: [versions.PRODUCTS, category_tree.VERSION_NAME])
 def search_products(request):
     query = request.GET.get('q', '')
     if query:
-        products = Product.objects.filter(
-            Q(name__icontains=query) | Q(ean__icontains=query)
-        )[:5]  # massimo 5 risultati
-        serializer = ProductSerializer(products, many=True)
+        try:
+            limit = min(max(int(request.GET.get('limit', 5)), 1), SEARCH_MAX_LIMIT)  # 5 risultati di default
+            offset = max(int(request.GET.get('offset', 0)), 0)
+        except ValueError:
+            return Response({'detail': 'limit e offset devono essere numeri interi.'}, status=400)
+
+        ids = product_search.search(query, limit=limit, offset=offset)
+        serializer_class, serializer_kwargs = _product_serializer_for(request, ProductListSerializer)
+        products = _only_serialized(Product.objects.filter(pk__in=ids), serializer_class(**serializer_kwargs))
+        by_id = {product.pk: product for product in products}
+        serializer = serializer_class([by_id[pk] for pk in ids if pk in by_id], many=True, **serializer_kwargs)
         return Response(serializer.data)
     return Response([])
 
 
+# 🔹 Funzione API - Dove comprare una lista della spesa
+#    Body: {"items": [{"ean" | "product", "quantity"}], "lat", "lng", "radius", "max_stores", "price_types"}
+#    Risponde con il negozio singolo più conveniente e la migliore combinazione di al massimo max_stores negozi.
+
+BASKET_MAX_STORES_NEARBY = 1000
+
+@api_view(['POST'])
+@permission_classes([permissions.AllowAny])
+def optimize_basket(request):
+    serializer = BasketRequestSerializer(data=request.data)
+    serializer.is_valid(raise_exception=True)
+    data = serializer.validated_data
+
+    # Prodotti: per id o per EAN (con le varianti UPC-A / EAN-13); le righe ripetute si sommano
+    eans = {variant: item['ean'] for item in data['items'] if 'ean' in item for variant in ean_variants(item['ean'])}
+    ids = {item['product'] for item in data['items'] if 'product' in item}
+    products = {
+        product.pk: product
+        for product in Product.objects.filter(Q(pk__in=ids) | Q(ean__in=eans)).only('id', 'ean', 'name')
+    }
+    by_ean = {eans[product.ean]: product.pk for product in products.values() if product.ean in eans}
+    quantities, unknown = {}, []
+    for item in data['items']:
+        product_id = item['product'] if 'product' in item else by_ean.get(item['ean'])
+        if product_id not in products:
+            unknown.append(item.get('ean', item.get('product')))
+            continue
+        quantities[product_id] = quantities.get(product_id, 0) + item['quantity']
+
+    stores = _get_queryset_by_permission(request.user, Store.objects.all(), {'verified': True})
+    distances = {}
+    if 'lat' in data:
+        nearby = store_locator.nearby_stores(stores, data['lat'], data['lng'], data['radius'], BASKET_MAX_STORES_NEARBY)
+        distances = {store.pk: distance for store, distance in nearby}
+        store_ids = list(distances)
+    else:
+        store_ids = stores.values('pk')
+
+    result = basket_optimizer.optimize_basket(
+        quantities, store_ids, data['max_stores'], data.get('price_types'), data['currency']
+    )
+
+    plans = [plan for plan in (result.single_store, result.split) if plan is not None]
+    names = dict(Store.objects.filter(pk__in={pk for plan in plans for pk in plan.store_ids}).values_list('pk', 'name'))
+
+    def product_ref(product_id):
+        product = products[product_id]
+        return {'product': product.pk, 'ean': product.ean, 'name': product.name}
+
+    def plan_data(plan):
+        if plan is None:
+            return None
+        return {
+            'stores': [
+                {'id': pk, 'name': names.get(pk),
+                 'distance_km': round(distances[pk], 3) if pk in distances else None}
+                for pk in plan.store_ids
+            ],
+            'total': str(plan.total),
+            'missing': [product_ref(pk) for pk in plan.missing],
+            'lines': [
+                {**product_ref(line.product_id), 'store': line.store_id, 'price': str(line.price),
+                 'price_type': line.price_type, 'quantity': str(line.quantity), 'subtotal': str(line.subtotal)}
+                for line in plan.lines
+            ],
+        }
+
+    savings = None
+    if result.single_store is not None and len(result.split.missing) == len(result.single_store.missing):
+        savings = str(result.single_store.total - result.split.total)
+    return Response({
+        'currency': data['currency'],
+        'unknown': unknown,
+        'unavailable': [product_ref(pk) for pk in result.unavailable],
+        'single_store': plan_data(result.single_store),
+        'split': plan_data(result.split),
+        'savings': savings,
+    })
+
+
 # 🔹 Funzione API - Recupero prodotti visti recentemente
 
 @api_view(['GET'])
@@ -230,7 +515,14 @@ def recent_product_views(request):
     offset = int(request.GET.get('offset', 0))
     limit = int(request.GET.get('limit', 10))
 
-    logs = ProductViewLog.objects.filter(user=user).select_related('product').order_by('-timestamp')[offset:offset+limit]
+    logs = ProductViewLog.objects.filter(user=user).select_related('product')
+    paginator = None
+    if KeysetPagination.cursor_query_param in request.query_params:
+        # 🔹 Opt-in: ?cursor= (vuoto per la prima pagina), poi il link "next"
+        paginator = KeysetPagination(('-timestamp', '-id'), page_size=limit)
+        logs = paginator.paginate_queryset(logs, request)
+    else:
+        logs = logs.order_by('-timestamp', '-id')[offset:offset+limit]
 
     results = [
         {
@@ -243,5 +535,14 @@ def recent_product_views(request):
         for log in logs
     ]
 
+    if paginator is not None:
+        return paginator.get_paginated_response(results)
     return Response(results)
 
+
+# 🔹 Statistiche della cache delle risposte (hit/miss per endpoint), solo staff
+
+@api_view(['GET'])
+@permission_classes([permissions.IsAdminUser])
+def response_cache_stats(request):
+    return Response(response_cache.stats())
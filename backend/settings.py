@@ -117,7 +117,7 @@ REST_FRAMEWORK = {
     "DEFAULT_AUTHENTICATION_CLASSES": (
         "rest_framework_simplejwt.authentication.JWTAuthentication",
     ),
-    "DEFAULT_PAGINATION_CLASS": "rest_framework.pagination.PageNumberPagination",
+    "DEFAULT_PAGINATION_CLASS": "api.pagination.OptInKeysetPagination",  # ?cursor= per la paginazione keyset
     "PAGE_SIZE": 10,
 }
 
@@ -162,6 +162,32 @@ else:
     print("⚠️ FIREBASE_SERVICE_ACCOUNT_JSON non impostato, Firebase non inizializzato")
 
 
+# -------------------------------------------------------------------
+# ✅ Cache (URL da ENV: db://tabella, locmem://nome, file:///percorso, redis://host:6379/0)
+#    "default": albero categorie; "responses": cache delle risposte API.
+#    Le versioni che invalidano entrambe stanno nel database (DataVersion), quindi una
+#    modifica fatta da un worker o da un comando di import vale subito per tutti i processi
+#    con qualsiasi backend. "default" è condivisa nel database (render.yaml esegue
+#    createcachetable); "responses" resta in memoria del processo, ogni worker la riempie
+#    per conto suo: con Redis (pacchetto redis) diventa condivisa.
+# -------------------------------------------------------------------
+def _cache_from_url(url, name):
+    if url.startswith(("redis://", "rediss://", "unix://")):
+        return {"BACKEND": "django.core.cache.backends.redis.RedisCache", "LOCATION": url}
+    if url.startswith("file://"):
+        return {"BACKEND": "django.core.cache.backends.filebased.FileBasedCache", "LOCATION": url[len("file://"):]}
+    if url.startswith("db://"):
+        return {"BACKEND": "django.core.cache.backends.db.DatabaseCache", "LOCATION": url[len("db://"):] or name}
+    return {"BACKEND": "django.core.cache.backends.locmem.LocMemCache", "LOCATION": url.split("://", 1)[-1] or name}
+
+
+CACHE_URL = os.getenv("CACHE_URL", "db://api_cache")
+CACHES = {
+    "default": _cache_from_url(CACHE_URL, "default"),
+    "responses": _cache_from_url(os.getenv("RESPONSE_CACHE_URL", "locmem://responses"), "responses"),
+}
+RESPONSE_CACHE_TIMEOUT = int(os.getenv("RESPONSE_CACHE_TIMEOUT", "300"))  # secondi
+
 # -------------------------------------------------------------------
 # ✅ Default PK
 # -------------------------------------------------------------------
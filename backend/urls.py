@@ -2,7 +2,6 @@ from django.contrib import admin
 from django.urls import path, include
 from django.http import HttpResponse
 from api.admin_views import unapproved_items
-from backend.settings import debug_flag
 
 from django.conf import settings
 from django.http import JsonResponse